@@ -1,3 +1,33 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import CalculoJob, ImportacaoJEBR, IndiceJEBR, Servidor
+
+
+@admin.register(CalculoJob)
+class CalculoJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'progresso_atual', 'progresso_total', 'data_criacao', 'data_conclusao')
+    list_filter = ('tipo', 'status')
+    readonly_fields = ('chave', 'parametros', 'resultado', 'data_criacao', 'data_inicio_execucao', 'data_conclusao')
+
+
+@admin.register(Servidor)
+class ServidorAdmin(admin.ModelAdmin):
+    list_display = ('matricula', 'nome', 'data_sincronizacao')
+    search_fields = ('matricula', 'nome')
+    readonly_fields = ('dados', 'data_sincronizacao')
+
+
+@admin.register(IndiceJEBR)
+class IndiceJEBRAdmin(admin.ModelAdmin):
+    list_display = ('data_referencia', 'valor_indice', 'variacao_mensal', 'variacao_anual', 'fator_acumulado', 'oficial')
+    list_filter = ('oficial', 'ativo')
+    date_hierarchy = 'data_referencia'
+
+
+@admin.register(ImportacaoJEBR)
+class ImportacaoJEBRAdmin(admin.ModelAdmin):
+    list_display = ('id', 'data_importacao', 'arquivo_fonte', 'sucesso', 'registros_criados',
+                    'registros_atualizados', 'registros_ignorados', 'registros_erro', 'tempo_execucao')
+    list_filter = ('sucesso',)
+    readonly_fields = ('detalhes_importacao',)
@@ -0,0 +1,244 @@
+"""
+Result archive for vencimento consultations.
+
+Every successful calculation is archived for external analysis. The archive
+is pluggable through settings.RESULT_ARCHIVE['BACKEND'] and, by default,
+writes to a directory outside the code tree:
+
+    <DIRECTORY>/payloads/ab/abcdef....json.gz   professor payloads, stored once per content hash
+    <DIRECTORY>/consultas/2025-09-10.jsonl.gz   one compact line per consultation
+
+Writes happen on a background thread so the response never waits on disk I/O,
+and a retention policy removes old files and caps the total size.
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Add utils directory to path for import
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.join(current_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from vencimento_metrics import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def dumps_compact(value: Any) -> bytes:
+    """Compact JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+class ResultArchive:
+    """Base class for archive backends"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def store(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist one consultation document and return information about it"""
+        raise NotImplementedError
+
+    def enforce_retention(self) -> int:
+        """Apply the retention policy; returns the number of files removed"""
+        return 0
+
+
+class NullArchive(ResultArchive):
+    """Backend that discards everything (archive disabled)"""
+
+    def store(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        return {'consulta_id': document.get('consulta_id'), 'stored': False}
+
+
+class FileSystemArchive(ResultArchive):
+    """
+    Content-addressed payload store plus daily JSON Lines consultation logs.
+
+    Options: DIRECTORY, COMPRESSION ('gzip' or None), RETENTION_DAYS, MAX_BYTES
+    """
+
+    def __init__(self, DIRECTORY, COMPRESSION='gzip', RETENTION_DAYS=180, MAX_BYTES=2 * 1024 ** 3, **options):
+        super().__init__(**options)
+        self.directory = Path(DIRECTORY)
+        self.compression = COMPRESSION
+        self.retention_days = RETENTION_DAYS
+        self.max_bytes = MAX_BYTES
+        self._append_lock = threading.Lock()
+
+    @property
+    def _suffix(self) -> str:
+        return '.gz' if self.compression == 'gzip' else ''
+
+    def _write_atomic(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as archive_file:
+                archive_file.write(gzip.compress(data) if self.compression == 'gzip' else data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def store_payload(self, payload: Any) -> str:
+        """Store a payload once per content hash and return the hash"""
+        data = dumps_compact(payload)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.directory / 'payloads' / digest[:2] / f"{digest}.json{self._suffix}"
+        if path.exists():
+            # Already archived: refresh its age so retention keeps it
+            os.utime(path)
+        else:
+            self._write_atomic(path, data)
+        return digest
+
+    def store(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        document = dict(document)
+        payload = document.pop('professor_complete_data', None)
+        if payload is not None:
+            document['payload_sha256'] = self.store_payload(payload)
+
+        line = dumps_compact(document) + b'\n'
+        day = document.get('consultation_info', {}).get('timestamp', '')[:10] or datetime.now().strftime('%Y-%m-%d')
+        path = self.directory / 'consultas' / f"{day}.jsonl{self._suffix}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._append_lock:
+            # Concatenated gzip members are a valid gzip stream
+            with open(path, 'ab') as archive_file:
+                archive_file.write(gzip.compress(line) if self.compression == 'gzip' else line)
+
+        return {
+            'consulta_id': document.get('consulta_id'),
+            'payload_sha256': document.get('payload_sha256'),
+            'path': str(path),
+            'stored': True
+        }
+
+    def enforce_retention(self) -> int:
+        if not self.directory.exists():
+            return 0
+        files = []
+        for path in self.directory.rglob('*'):
+            if path.is_file() and not path.name.endswith('.tmp'):
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        removed = 0
+        limite = time.time() - self.retention_days * 86400 if self.retention_days else None
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            expired = limite is not None and mtime < limite
+            over_size = self.max_bytes is not None and total > self.max_bytes
+            if not (expired or over_size):
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+class DeferredArchiveWriter:
+    """Single background thread that drains a bounded queue of documents"""
+
+    def __init__(self, archive: ResultArchive, max_queue: int = 256, retention_interval: float = 3600):
+        self.archive = archive
+        self.retention_interval = retention_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='result-archive', daemon=True)
+        self._last_retention = 0.0
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, document: Dict[str, Any]):
+        try:
+            self._queue.put(document, timeout=1)
+        except queue.Full:
+            # Writer is far behind: store inline rather than lose the consultation
+            self._store(document)
+
+    def flush(self):
+        """Block until every queued document has been written"""
+        self._queue.join()
+
+    def _store(self, document: Dict[str, Any]):
+        try:
+            with stage('archive_write'):
+                self.archive.store(document)
+        except Exception:
+            logger.exception("Error archiving consultation %s", document.get('consulta_id'))
+
+    def _run(self):
+        while True:
+            document = self._queue.get()
+            try:
+                self._store(document)
+                if time.monotonic() - self._last_retention > self.retention_interval:
+                    self._last_retention = time.monotonic()
+                    self.archive.enforce_retention()
+            except Exception:
+                logger.exception("Error applying archive retention")
+            finally:
+                self._queue.task_done()
+
+
+_archive: Optional[ResultArchive] = None
+_writer: Optional[DeferredArchiveWriter] = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> ResultArchive:
+    """Archive backend configured in settings.RESULT_ARCHIVE"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                config = dict(getattr(settings, 'RESULT_ARCHIVE', {}))
+                backend = config.pop('BACKEND', 'Descompressao.archive.FileSystemArchive')
+                config.pop('ASYNC', None)
+                _archive = import_string(backend)(**config)
+    return _archive
+
+
+def archive_document(document: Dict[str, Any], archive: Optional[ResultArchive] = None):
+    """
+    Archive a consultation, deferred to the writer thread unless ASYNC is False.
+    An explicit `archive` is written synchronously instead of the configured one.
+    """
+    global _writer
+    if archive is not None or not getattr(settings, 'RESULT_ARCHIVE', {}).get('ASYNC', True):
+        with stage('archive_write'):
+            (archive or get_archive()).store(document)
+        return
+    if _writer is None:
+        archive = get_archive()
+        with _archive_lock:
+            if _writer is None:
+                _writer = DeferredArchiveWriter(archive)
+    _writer.submit(document)
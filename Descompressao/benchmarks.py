@@ -0,0 +1,308 @@
+"""
+Benchmarks dos caminhos críticos do cálculo de vencimentos.
+
+Cada caso é um servidor sintético gerado por fichas_fake.GeradorServidores
+com um tempo de carreira (anos de fichas) e um número de verbas por ano,
+consultado sobre a carreira inteira. Para cada caso são medidos:
+
+    extract      VencimentoServiceFixed._extract_vencimento_data_safe
+    process      VencimentoServiceFixed._process_vencimento_data
+    pagamentos   FichasAPI_Manager.processar_pagamentos_para_calculo
+    archive      views.save_raw_data_to_json (síncrono, em diretório temporário)
+    render       vencimento_resultados.html (cache de relatórios desativado)
+
+Cada benchmark registra o tempo de relógio e de CPU de algumas repetições e
+o pico de memória alocada por uma chamada (tracemalloc). Uma execução é
+guardada em JSON por commit em settings.VENCIMENTO_BENCHMARK_DIR, e compare()
+aponta os benchmarks cujo tempo mínimo cresceu além de um limite em relação
+a uma execução de referência: a indicada ou a do commit ancestral mais
+próximo (latest_baseline). Usado pelo comando benchmark_vencimento.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+# Adiciona o diretório utils ao path para os imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.join(current_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from fichas_api import FichasAPI_Manager, extrair_pagamentos_periodo
+from fichas_fake import GeradorServidores, carregar_modelo
+from services import VencimentoServiceFixed
+
+from .archive import FileSystemArchive, ResultArchive
+
+DEFAULT_YEARS = (1, 5, 10, 20, 40)
+DEFAULT_VERBAS = (10, 50, 100, 200)
+BENCHMARKS = ('extract', 'process', 'pagamentos', 'archive', 'render')
+
+# Tempos mínimos abaixo disto são dominados por ruído e nunca são apontados
+MIN_COMPARABLE_SECONDS = 0.0005
+
+
+def benchmark_dir() -> Path:
+    return Path(getattr(settings, 'VENCIMENTO_BENCHMARK_DIR', Path(settings.BASE_DIR) / '.benchmarks'))
+
+
+def current_commit() -> str:
+    """Hash curto de HEAD, com sufixo -dirty se há arquivos versionados alterados; 'unknown' fora do git"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def measure(func: Callable[[], Any], repeat: int = 5) -> Dict[str, float]:
+    """Mede `repeat` chamadas depois de uma de aquecimento e o pico de alocação de mais uma"""
+    func()
+    wall, cpu = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func()
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'min': min(wall),
+        'median': statistics.median(wall),
+        'cpu': statistics.median(cpu),
+        'peak_bytes': peak
+    }
+
+
+class _Case:
+    """Entradas de todos os benchmarks para um servidor sintético"""
+
+    def __init__(self, generator: GeradorServidores, years: int, verbas: int, archive: ResultArchive):
+        from .views import _report_context
+
+        self.years = years
+        self.verbas = verbas
+        ano_final = date.today().year - 1
+        self.data_inicio = date(ano_final - years + 1, 1, 1)
+        self.data_fim = date(ano_final, 12, 31)
+        self.matricula = f"{years:04d}{verbas:04d}-01"
+        self.result_archive = archive
+        self.professor = generator.gerar(self.matricula, anos=years, verbas_por_ano=verbas, ano_final=ano_final)
+
+        self.service = VencimentoServiceFixed()
+        self.api_manager = self.service.api_manager
+        self.result = self.service._build_vencimento_result(
+            {'servidor': self.professor}, self.matricula, self.data_inicio, self.data_fim
+        )
+        self.records = self.result.get('raw_data') or []
+        self.pagamentos = extrair_pagamentos_periodo(
+            {'servidor': self.professor}, self.data_inicio, self.data_fim
+        ) or []
+        self.context = (
+            _report_context(self.result, self.matricula, self.data_inicio, self.data_fim)
+            if self.result['success'] else None
+        )
+
+    @property
+    def key(self) -> str:
+        return f"{self.years}x{self.verbas}"
+
+    def extract(self):
+        return self.service._extract_vencimento_data_safe(self.professor, self.data_inicio, self.data_fim)
+
+    def process(self):
+        return self.service._process_vencimento_data(
+            self.records, self.professor.get('SERVIDOR_NOME'), self.matricula, self.data_inicio, self.data_fim
+        )
+
+    def pagamentos_para_calculo(self):
+        return self.api_manager.processar_pagamentos_para_calculo(self.pagamentos)
+
+    def archive(self):
+        from .views import save_raw_data_to_json
+
+        return save_raw_data_to_json(
+            self.result['data'], self.professor, self.result['metadata'],
+            self.matricula, self.data_inicio, self.data_fim, archive=self.result_archive
+        )
+
+    def render(self):
+        return render_to_string('vencimento_resultados.html', self.context)
+
+
+@contextlib.contextmanager
+def _quiet():
+    previous = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(previous)
+
+
+def run(years: Iterable[int] = DEFAULT_YEARS, verbas: Iterable[int] = DEFAULT_VERBAS,
+        benchmarks: Iterable[str] = BENCHMARKS, repeat: int = 5, modelo: Optional[str] = None,
+        progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Executa os benchmarks em todos os casos (anos, verbas). O arquivo de
+    consultas é um FileSystemArchive da execução em diretório temporário,
+    gravado de forma síncrona, e o cache de relatórios é um backend dummy,
+    então toda chamada faz o trabalho completo. Logs até INFO ficam
+    desativados durante as medições.
+    """
+    generator = GeradorServidores(carregar_modelo(modelo))
+    benchmarks = [name for name in BENCHMARKS if name in set(benchmarks)]
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix='htcalculus-bench-') as archive_dir, override_settings(
+        CACHES={**settings.CACHES, 'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        VENCIMENTO_REPORT_CACHE='benchmark'
+    ):
+        archive = FileSystemArchive(DIRECTORY=archive_dir, RETENTION_DAYS=None, MAX_BYTES=None)
+        for case_years in years:
+            for case_verbas in verbas:
+                with _quiet():
+                    case = _Case(generator, case_years, case_verbas, archive)
+                functions = {
+                    'extract': case.extract,
+                    'process': case.process,
+                    'pagamentos': case.pagamentos_para_calculo,
+                    'archive': case.archive,
+                    'render': case.render,
+                }
+                entry = {
+                    'years': case_years,
+                    'verbas': case_verbas,
+                    'records': len(case.records),
+                    'pagamentos': len(case.pagamentos),
+                    'benchmarks': {}
+                }
+                for name in benchmarks:
+                    if name in ('archive', 'render') and case.context is None:
+                        continue
+                    with _quiet():
+                        entry['benchmarks'][name] = measure(functions[name], repeat)
+                results[case.key] = entry
+                if progress:
+                    progress(case.key)
+
+    return {
+        'commit': current_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def save(run_result: Dict[str, Any], directory: Optional[Path] = None) -> Path:
+    """Guarda a execução como <commit>.json (uma execução posterior do mesmo commit a substitui)"""
+    directory = Path(directory or benchmark_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{run_result['commit']}.json"
+    path.write_text(json.dumps(run_result, indent=2), encoding='utf-8')
+    return path
+
+
+def load(reference: str, directory: Optional[Path] = None) -> Tuple[Path, Dict[str, Any]]:
+    """Execução guardada de um commit (prefixo do hash) ou caminho de um arquivo de resultados"""
+    path = Path(reference)
+    if not path.is_file():
+        directory = Path(directory or benchmark_dir())
+        matches = sorted(directory.glob(f"{reference}*.json"))
+        if not matches:
+            raise FileNotFoundError(f"Nenhuma execução guardada para {reference} em {directory}")
+        path = matches[0]
+    return path, json.loads(path.read_text(encoding='utf-8'))
+
+
+def _ancestors(limit: int = 500) -> List[str]:
+    """Hashes completos de HEAD e de seus ancestrais, do mais próximo ao mais distante; [] fora do git"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-list', f'--max-count={limit}', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+    except (OSError, subprocess.CalledProcessError):
+        return []
+
+
+def latest_baseline(commit: str, directory: Optional[Path] = None) -> Optional[Path]:
+    """
+    Execução guardada do commit ancestral mais próximo de HEAD (o próprio HEAD
+    quando a execução atual é -dirty). Execuções -dirty e de commits fora da
+    história de HEAD (outros branches) nunca são referência; None se não houver
+    nenhuma ou fora do git, e então a referência deve ser dada explicitamente.
+    """
+    directory = Path(directory or benchmark_dir())
+    if not directory.exists():
+        return None
+    stored = {
+        path.stem: path for path in directory.glob('*.json')
+        if path.stem != commit and not path.stem.endswith('-dirty')
+    }
+    for ancestor in _ancestors():
+        for stem, path in stored.items():
+            if ancestor.startswith(stem):
+                return path
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Razão atual/referência do tempo mínimo e do pico de alocação de cada
+    benchmark presente nas duas execuções; 'regression' marca uma razão de
+    tempo acima de 1 + threshold.
+    """
+    rows = []
+    for key, entry in current['results'].items():
+        base_entry = baseline.get('results', {}).get(key)
+        if not base_entry:
+            continue
+        for name, stats in entry['benchmarks'].items():
+            base = base_entry['benchmarks'].get(name)
+            if not base:
+                continue
+            ratio = stats['min'] / base['min'] if base['min'] else 1.0
+            memory_ratio = stats['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 1.0
+            comparable = max(stats['min'], base['min']) >= MIN_COMPARABLE_SECONDS
+            rows.append({
+                'case': key,
+                'benchmark': name,
+                'baseline': base['min'],
+                'current': stats['min'],
+                'ratio': ratio,
+                'memory_ratio': memory_ratio,
+                'regression': comparable and ratio > 1 + threshold
+            })
+    return rows
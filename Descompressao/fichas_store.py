@@ -0,0 +1,256 @@
+"""
+Local, indexed store of the fichas financeiras returned by the Fichas API.
+
+Each busca_matricula payload is normalized into Servidor, FichaFinanceira
+(one per year) and FichaFinanceiraItem (one per verba, with the twelve
+monthly values) rows. Ingestion is an upsert built on bulk_create and
+bulk_update; years whose items did not change are skipped by content hash.
+
+Reads rebuild the payload shape the calculation service already understands
+from a single query on the (matricula, ano, cod_verba) index, so repeated
+consultations and cross-servidor reports do not need the API.
+
+Closed years never change, so once a servidor is stored only its open years
+(the year it was last synced in, and any year since) have to be fetched
+again; a partial payload with just those years is merged with ingest(anos=...).
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import FichaFinanceira, FichaFinanceiraItem, Servidor
+
+MONTH_FIELDS = FichaFinanceiraItem.MESES
+VALUE_FIELDS = MONTH_FIELDS + ['dec_terceiro', 'total']
+ITEM_UPDATE_FIELDS = ['cod_verba', 'nome_verba'] + VALUE_FIELDS
+
+# API key of each value field
+API_KEYS = {field: f"FICHA_FINANCEIRA_ITEM_{field.upper()}" for field in VALUE_FIELDS}
+
+
+def _to_decimal(valor) -> Decimal:
+    try:
+        return Decimal(str(valor)).quantize(Decimal('0.01')) if valor else Decimal('0')
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def _to_int(valor) -> Optional[int]:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _hash_itens(itens: List[Dict[str, Any]]) -> str:
+    serializado = json.dumps(itens, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+class FichasStore:
+    """Upserts API payloads into the database and answers period queries from it"""
+
+    def __init__(self, max_age_current_year: float = 900, recent_years: int = 1, incremental: bool = True):
+        """
+        Args:
+            max_age_current_year: Seconds a stored payload may be served for
+                periods that reach the year it was synced in (closed years never change)
+            recent_years: Years before the sync year that are still refetched on an
+                incremental sync (late corrections); 1 means only the sync year itself
+            incremental: When False open_years always asks for the full history
+        """
+        self.max_age_current_year = max_age_current_year
+        self.recent_years = recent_years
+        self.incremental = incremental
+
+    def ingest(self, matricula: str, response: Dict[str, Any], anos: Optional[Iterable[int]] = None) -> Servidor:
+        """
+        Upsert one busca_matricula response. With `anos`, the response only
+        covers those years: the other stored years are kept as they are.
+        """
+        professor = response['servidor']
+        fichas = {
+            ficha['FICHA_FINANCEIRA_ANO_REFERENCIA']: ficha.get('fichasFinanceirasItens') or []
+            for ficha in professor.get('fichasFinanceiras', [])
+            if ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')
+        }
+        dados = {key: value for key, value in professor.items() if key != 'fichasFinanceiras'}
+        if anos is not None:
+            anos = set(anos)
+            fichas = {ano: itens for ano, itens in fichas.items() if ano in anos}
+
+        with transaction.atomic():
+            servidor, _ = Servidor.objects.update_or_create(
+                matricula=matricula,
+                defaults={
+                    'nome': professor.get('SERVIDOR_NOME') or '',
+                    'dados': dados,
+                    'data_sincronizacao': timezone.now()
+                }
+            )
+
+            atuais = servidor.fichas.all() if anos is None else servidor.fichas.filter(ano__in=anos)
+            existentes = {ficha.ano: ficha for ficha in atuais}
+            atuais.exclude(ano__in=list(fichas)).delete()
+
+            hashes = {ano: _hash_itens(itens) for ano, itens in fichas.items()}
+            novas = [
+                FichaFinanceira(servidor=servidor, ano=ano, hash_conteudo=hashes[ano])
+                for ano in fichas if ano not in existentes
+            ]
+            FichaFinanceira.objects.bulk_create(novas)
+            alteradas = [
+                ficha for ano, ficha in existentes.items()
+                if ano in fichas and ficha.hash_conteudo != hashes[ano]
+            ]
+            for ficha in alteradas:
+                ficha.hash_conteudo = hashes[ficha.ano]
+                ficha.data_atualizacao = timezone.now()
+            FichaFinanceira.objects.bulk_update(alteradas, ['hash_conteudo', 'data_atualizacao'])
+
+            self._upsert_itens(matricula, novas + alteradas, fichas)
+        return servidor
+
+    def _upsert_itens(self, matricula: str, fichas: List[FichaFinanceira],
+                      itens_por_ano: Dict[int, List[Dict[str, Any]]]):
+        if not fichas:
+            return
+        # Items are identified by their position in the ficha
+        existentes = {
+            (item.ficha_id, item.ordem): item
+            for item in FichaFinanceiraItem.objects.filter(ficha__in=fichas)
+        }
+        criar = []
+        atualizar = []
+        manter = set()
+        for ficha in fichas:
+            for ordem, dados in enumerate(itens_por_ano[ficha.ano]):
+                valores = {
+                    'cod_verba': _to_int(dados.get('FICHA_FINANCEIRA_ITEM_COD_VERBA')),
+                    'nome_verba': dados.get('FICHA_FINANCEIRA_ITEM_NOME_VERBA') or '',
+                }
+                for field, key in API_KEYS.items():
+                    valores[field] = _to_decimal(dados.get(key))
+
+                item = existentes.get((ficha.pk, ordem))
+                if item is None:
+                    criar.append(FichaFinanceiraItem(
+                        ficha=ficha, matricula=matricula, ano=ficha.ano, ordem=ordem, **valores
+                    ))
+                else:
+                    manter.add(item.pk)
+                    for field, valor in valores.items():
+                        setattr(item, field, valor)
+                    atualizar.append(item)
+
+        removidos = [item.pk for item in existentes.values() if item.pk not in manter]
+        FichaFinanceiraItem.objects.filter(pk__in=removidos).delete()
+        FichaFinanceiraItem.objects.bulk_create(criar, batch_size=500)
+        FichaFinanceiraItem.objects.bulk_update(atualizar, ITEM_UPDATE_FIELDS, batch_size=500)
+
+    def open_years(self, matricula: str) -> Optional[List[int]]:
+        """
+        Years that must be fetched again before the stored payload can be
+        served: [] while it is fresh, None when the servidor was never stored
+        (or incremental sync is off) and the full history is needed.
+        """
+        if not self.incremental:
+            return None
+        servidor = Servidor.objects.filter(matricula=matricula).only('data_sincronizacao').first()
+        if servidor is None:
+            return None
+        if timezone.now() - servidor.data_sincronizacao <= timedelta(seconds=self.max_age_current_year):
+            return []
+        ano_aberto = timezone.localtime(servidor.data_sincronizacao).year
+        return list(range(ano_aberto - self.recent_years + 1, timezone.localdate().year + 1))
+
+    def _expired(self, servidor: Servidor, ano_fim: int) -> bool:
+        # Years that were still open when the payload was synced may have changed since
+        ano_aberto = timezone.localtime(servidor.data_sincronizacao).year
+        idade = timezone.now() - servidor.data_sincronizacao
+        return ano_fim >= ano_aberto and idade > timedelta(seconds=self.max_age_current_year)
+
+    def version(self, matricula: str, ano_inicio: int, ano_fim: int) -> Optional[Tuple[str, Any]]:
+        """
+        (hash, last sync) of the stored data behind a period: the hash covers the
+        servidor fields and the content hash of each year. None when load() would not
+        serve the period, so a cached result can be validated without loading
+        the fichas or recalculating.
+        """
+        servidor = Servidor.objects.filter(matricula=matricula).only('dados', 'data_sincronizacao').first()
+        if servidor is None or self._expired(servidor, ano_fim):
+            return None
+        hashes = list(
+            servidor.fichas.filter(ano__gte=ano_inicio, ano__lte=ano_fim)
+            .order_by('ano').values_list('ano', 'hash_conteudo')
+        )
+        serializado = json.dumps([servidor.dados, hashes], sort_keys=True, default=str)
+        return hashlib.sha256(serializado.encode('utf-8')).hexdigest(), servidor.data_sincronizacao
+
+    def load(self, matricula: str, ano_inicio: int, ano_fim: int) -> Optional[Dict[str, Any]]:
+        """
+        Stored payload of the servidor restricted to the given years, in the
+        busca_matricula response shape; None when it must come from the API.
+        """
+        servidor = Servidor.objects.filter(matricula=matricula).first()
+        if servidor is None or self._expired(servidor, ano_fim):
+            return None
+
+        # Same order as the API: most recent year first, items in their original position
+        linhas = FichaFinanceiraItem.objects.filter(
+            matricula=matricula,
+            ano__gte=ano_inicio,
+            ano__lte=ano_fim
+        ).order_by('-ano', 'ordem').values_list('ano', 'cod_verba', 'nome_verba', *VALUE_FIELDS)
+
+        fichas = []
+        for ano, cod_verba, nome_verba, *valores in linhas:
+            if not fichas or fichas[-1]['FICHA_FINANCEIRA_ANO_REFERENCIA'] != ano:
+                fichas.append({'FICHA_FINANCEIRA_ANO_REFERENCIA': ano, 'fichasFinanceirasItens': []})
+            item = {
+                'FICHA_FINANCEIRA_ITEM_COD_VERBA': cod_verba,
+                'FICHA_FINANCEIRA_ITEM_NOME_VERBA': nome_verba,
+            }
+            for field, valor in zip(VALUE_FIELDS, valores):
+                item[API_KEYS[field]] = float(valor)
+            fichas[-1]['fichasFinanceirasItens'].append(item)
+
+        professor = dict(servidor.dados or {})
+        professor['fichasFinanceiras'] = fichas
+        return {'servidor': professor}
+
+    @staticmethod
+    def annual_totals(cod_verbas: Iterable[int], ano_inicio: int, ano_fim: int,
+                      matriculas: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Yearly totals per servidor for the given verba codes, aggregated in SQL"""
+        linhas = FichaFinanceiraItem.objects.filter(
+            cod_verba__in=list(cod_verbas),
+            ano__gte=ano_inicio,
+            ano__lte=ano_fim
+        )
+        if matriculas is not None:
+            linhas = linhas.filter(matricula__in=list(matriculas))
+        return list(
+            linhas.values('matricula', 'ano')
+            .annotate(**{f"total_{field}": Sum(field) for field in MONTH_FIELDS})
+            .order_by('matricula', 'ano')
+        )
+
+
+def get_fichas_store() -> Optional[FichasStore]:
+    """Store configured in settings, or None when FICHAS_LOCAL_STORE is off"""
+    if not getattr(settings, 'FICHAS_LOCAL_STORE', True):
+        return None
+    return FichasStore(
+        getattr(settings, 'FICHAS_LOCAL_STORE_MAX_AGE', 900),
+        getattr(settings, 'FICHAS_LOCAL_STORE_RECENT_YEARS', 1),
+        getattr(settings, 'FICHAS_INCREMENTAL_SYNC', True)
+    )
@@ -1,7 +1,58 @@
 from django import forms
 from datetime import date, datetime
+import csv
 import re
 
+
+def normalizar_matricula(matricula):
+    """Validate and normalize matricula format (00000000-00)"""
+    matricula = (matricula or '').strip()
+    
+    if not matricula:
+        raise forms.ValidationError('Matrícula é obrigatória.')
+    
+    # Remove any spaces or special characters except dash
+    matricula = re.sub(r'[^\d-]', '', matricula)
+    
+    # Check if it's in the correct format (8 digits - 2 digits)
+    if re.match(r'^\d{8}-\d{2}$', matricula):
+        return matricula
+    
+    # Try to format if it's just numbers
+    numbers_only = re.sub(r'[^\d]', '', matricula)
+    
+    if len(numbers_only) == 10:
+        # Format as 00000000-00
+        formatted = f"{numbers_only[:8]}-{numbers_only[8:]}"
+        return formatted
+    elif len(numbers_only) == 8:
+        # Assume it needs -00 at the end
+        formatted = f"{numbers_only}-00"
+        return formatted
+    elif len(numbers_only) < 8:
+        # Pad with leading zeros
+        padded = numbers_only.zfill(8)
+        formatted = f"{padded}-00"
+        return formatted
+    else:
+        raise forms.ValidationError(
+            'Formato de matrícula inválido. Use o formato: 00000000-00'
+        )
+
+
+def validar_periodo(data_inicio, data_fim):
+    """Validate a (data_inicio, data_fim) period"""
+    if data_inicio > data_fim:
+        raise forms.ValidationError('A data de início deve ser anterior à data de fim.')
+    
+    if data_fim > date.today():
+        raise forms.ValidationError('A data de fim não pode ser no futuro.')
+        
+    # Check if period is not too large (more than 10 years)
+    if (data_fim - data_inicio).days > 365 * 10:
+        raise forms.ValidationError('O período não pode ser maior que 10 anos.')
+
+
 class VencimentoForm(forms.Form):
     """Form for vencimento data calculation"""
     
@@ -38,40 +89,116 @@ class VencimentoForm(forms.Form):
         help_text='Data final do período para busca de vencimentos'
     )
     
+    force_refresh = forms.BooleanField(
+        label='Forçar atualização dos dados',
+        required=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        }),
+        help_text='Ignora o cache local e busca novamente os dados na API de Fichas'
+    )
+    
     def clean_matricula(self):
         """Validate and normalize matricula format"""
-        matricula = self.cleaned_data.get('matricula', '').strip()
-        
-        if not matricula:
-            raise forms.ValidationError('Matrícula é obrigatória.')
+        return normalizar_matricula(self.cleaned_data.get('matricula', ''))
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        data_inicio = cleaned_data.get('data_inicio')
+        data_fim = cleaned_data.get('data_fim')
         
-        # Remove any spaces or special characters except dash
-        matricula = re.sub(r'[^\d-]', '', matricula)
+        if data_inicio and data_fim:
+            validar_periodo(data_inicio, data_fim)
         
-        # Check if it's in the correct format (8 digits - 2 digits)
-        if re.match(r'^\d{8}-\d{2}$', matricula):
-            return matricula
+        return cleaned_data
+
+class VencimentoBatchForm(forms.Form):
+    """Form for calculating vencimento data for many matrículas at once"""
+    
+    MAX_ITENS = 1000
+    
+    matriculas = forms.CharField(
+        label='Matrículas',
+        required=False,
+        widget=forms.Textarea(attrs={
+            'rows': 8,
+            'placeholder': '00292553-03\n00123456-01;2005-01-01;2009-12-31',
+            'class': 'form-control'
+        }),
+        help_text='Uma matrícula por linha. Opcionalmente: matrícula;data_início;data_fim'
+    )
+    
+    arquivo_csv = forms.FileField(
+        label='Arquivo CSV',
+        required=False,
+        widget=forms.ClearableFileInput(attrs={
+            'accept': '.csv,text/csv',
+            'class': 'form-control'
+        }),
+        help_text='Colunas: matrícula[, data_início, data_fim] (separador , ou ;)'
+    )
+    
+    data_inicio = forms.DateField(
+        label='Data de Início do Período',
+        required=False,
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control'
+        }),
+        help_text='Período usado nas linhas que não informam datas próprias'
+    )
+    
+    data_fim = forms.DateField(
+        label='Data de Fim do Período',
+        required=False,
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control'
+        }),
+        help_text='Período usado nas linhas que não informam datas próprias'
+    )
+    
+    force_refresh = forms.BooleanField(
+        label='Forçar atualização dos dados',
+        required=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        }),
+        help_text='Ignora o cache local e busca novamente os dados na API de Fichas'
+    )
+    
+    @staticmethod
+    def _parse_data(valor):
+        valor = valor.strip()
+        for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+            try:
+                return datetime.strptime(valor, formato).date()
+            except ValueError:
+                continue
+        raise forms.ValidationError(f'Data inválida: {valor}')
+    
+    def _linhas(self):
+        """Yield (line number, columns) from the pasted text and the CSV file"""
+        texto = self.cleaned_data.get('matriculas') or ''
+        linhas = texto.splitlines()
         
-        # Try to format if it's just numbers
-        numbers_only = re.sub(r'[^\d]', '', matricula)
+        arquivo = self.cleaned_data.get('arquivo_csv')
+        if arquivo:
+            try:
+                linhas += arquivo.read().decode('utf-8-sig').splitlines()
+            except UnicodeDecodeError:
+                raise forms.ValidationError('O arquivo CSV deve estar codificado em UTF-8.')
         
-        if len(numbers_only) == 10:
-            # Format as 00000000-00
-            formatted = f"{numbers_only[:8]}-{numbers_only[8:]}"
-            return formatted
-        elif len(numbers_only) == 8:
-            # Assume it needs -00 at the end
-            formatted = f"{numbers_only}-00"
-            return formatted
-        elif len(numbers_only) < 8:
-            # Pad with leading zeros
-            padded = numbers_only.zfill(8)
-            formatted = f"{padded}-00"
-            return formatted
-        else:
-            raise forms.ValidationError(
-                'Formato de matrícula inválido. Use o formato: 00000000-00'
-            )
+        for numero, linha in enumerate(linhas, 1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            delimitador = ';' if ';' in linha else ','
+            colunas = next(csv.reader([linha], delimiter=delimitador))
+            # Skip header rows such as "matricula;data_inicio;data_fim"
+            if not re.search(r'\d', colunas[0]):
+                continue
+            yield numero, colunas
     
     def clean(self):
         cleaned_data = super().clean()
@@ -79,14 +206,67 @@ class VencimentoForm(forms.Form):
         data_fim = cleaned_data.get('data_fim')
         
         if data_inicio and data_fim:
-            if data_inicio > data_fim:
-                raise forms.ValidationError('A data de início deve ser anterior à data de fim.')
+            validar_periodo(data_inicio, data_fim)
+        
+        itens = []
+        erros = []
+        vistos = set()
+        for numero, colunas in self._linhas():
+            try:
+                matricula = normalizar_matricula(colunas[0])
+                if len(colunas) >= 3 and colunas[1].strip() and colunas[2].strip():
+                    inicio = self._parse_data(colunas[1])
+                    fim = self._parse_data(colunas[2])
+                elif data_inicio and data_fim:
+                    inicio, fim = data_inicio, data_fim
+                else:
+                    raise forms.ValidationError('Informe o período na linha ou no formulário.')
+                validar_periodo(inicio, fim)
+            except forms.ValidationError as e:
+                erros.append(f'Linha {numero}: {" ".join(e.messages)}')
+                continue
             
-            if data_fim > date.today():
-                raise forms.ValidationError('A data de fim não pode ser no futuro.')
-                
-            # Check if period is not too large (more than 10 years)
-            if (data_fim - data_inicio).days > 365 * 10:
-                raise forms.ValidationError('O período não pode ser maior que 10 anos.')
+            chave = (matricula, inicio, fim)
+            if chave not in vistos:
+                vistos.add(chave)
+                itens.append(chave)
         
-        return cleaned_data
\ No newline at end of file
+        if erros:
+            raise forms.ValidationError(erros[:20])
+        if not itens:
+            raise forms.ValidationError('Informe ao menos uma matrícula.')
+        if len(itens) > self.MAX_ITENS:
+            raise forms.ValidationError(f'No máximo {self.MAX_ITENS} matrículas por lote.')
+        
+        cleaned_data['itens'] = itens
+        return cleaned_data
+
+class VencimentoRegistrosForm(VencimentoForm):
+    """Query parameters of the paginated vencimento records API"""
+    
+    CAMPOS = ('year', 'month', 'valor', 'nome_verba', 'cod_verba', 'date')
+    CAMPOS_PADRAO = ('year', 'month', 'valor', 'nome_verba', 'cod_verba')
+    MAX_LIMIT = 1000
+    
+    cursor = forms.IntegerField(required=False, min_value=0)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=MAX_LIMIT)
+    fields = forms.CharField(required=False)
+    ano = forms.IntegerField(required=False, min_value=1900, max_value=2100)
+    mes = forms.IntegerField(required=False, min_value=1, max_value=12)
+    
+    def clean_cursor(self):
+        return self.cleaned_data.get('cursor') or 0
+    
+    def clean_limit(self):
+        return self.cleaned_data.get('limit') or 100
+    
+    def clean_fields(self):
+        """Comma-separated record fields to return (all but 'date' by default)"""
+        texto = self.cleaned_data.get('fields') or ''
+        campos = [campo.strip() for campo in texto.split(',') if campo.strip()]
+        invalidos = [campo for campo in campos if campo not in self.CAMPOS]
+        if invalidos:
+            raise forms.ValidationError(
+                f'Campos inválidos: {", ".join(invalidos)}. Use: {", ".join(self.CAMPOS)}'
+            )
+        return list(dict.fromkeys(campos)) or list(self.CAMPOS_PADRAO)
@@ -0,0 +1,370 @@
+"""
+Import of the JEBR monetary correction index, and monetary correction with it.
+
+The JEBR table published at ImportacaoJEBR.url_fonte is downloaded by hand
+and imported from a local file (.xlsx/.xlsm, .csv, or .xls when xlrd is
+installed). The sheet is read as a stream and written in batches with
+bulk_create(update_conflicts=True) on data_referencia, so re-importing a
+month updates it in place. By default only months newer than the last
+successful import are written.
+
+After every import fator_acumulado, variacao_mensal and variacao_anual are
+recomputed for the whole series in one NumPy pass. Corrections then use an
+in-process month -> factor array: correcting a value from one month to
+another is the ratio of two array entries, with no query per installment.
+"""
+
+import csv
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ImportacaoJEBR, IndiceJEBR
+
+# Add utils directory to path for import
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.join(current_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from planilha_xlsx import iter_linhas
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+logger = logging.getLogger(__name__)
+
+MESES_ABREVIADOS = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+DATE_FORMATS = ['%m/%Y', '%d/%m/%Y', '%Y-%m-%d', '%Y-%m', '%m-%Y']
+EXCEL_EPOCH = date(1899, 12, 30)
+EXCEL_SERIAL_MIN = (date(1930, 1, 1) - EXCEL_EPOCH).days
+EXCEL_SERIAL_MAX = (date(2200, 1, 1) - EXCEL_EPOCH).days
+
+
+def parse_data_referencia(valor: Any) -> Optional[date]:
+    """First day of the month a cell refers to, or None if it is not a date"""
+    if isinstance(valor, datetime):
+        return valor.date().replace(day=1)
+    if isinstance(valor, date):
+        return valor.replace(day=1)
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        # Excel date serial number; small numbers (e.g. a year header like 2020) are not dates
+        if EXCEL_SERIAL_MIN <= valor < EXCEL_SERIAL_MAX:
+            return (EXCEL_EPOCH + timedelta(days=int(valor))).replace(day=1)
+        return None
+    if not isinstance(valor, str):
+        return None
+
+    texto = valor.strip().lower()
+    for formato in DATE_FORMATS:
+        try:
+            return datetime.strptime(texto, formato).date().replace(day=1)
+        except ValueError:
+            continue
+    # "jan/2020", "jan/20"
+    partes = texto.replace('-', '/').split('/')
+    if len(partes) == 2 and partes[0][:3] in MESES_ABREVIADOS and partes[1].isdigit():
+        ano = int(partes[1])
+        ano += 2000 if ano < 50 else 1900 if ano < 100 else 0
+        return date(ano, MESES_ABREVIADOS.index(partes[0][:3]) + 1, 1)
+    return None
+
+
+def parse_indice(valor: Any) -> Decimal:
+    """Index value from a numeric cell or a Brazilian formatted string ("1.234,5678")"""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return Decimal(repr(valor))
+    texto = str(valor).strip()
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return Decimal(texto)
+
+
+def iter_planilha(caminho: str) -> Iterator[Tuple[int, List[Any]]]:
+    """Rows of the spreadsheet as (row number, values), streamed when the format allows"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in ('.xlsx', '.xlsm'):
+        yield from iter_linhas(caminho)
+    elif extensao in ('.csv', '.txt'):
+        with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            delimitador = ';' if amostra.count(';') >= amostra.count(',') else ','
+            for numero, linha in enumerate(csv.reader(arquivo, delimiter=delimitador), 1):
+                yield numero, linha
+    elif extensao == '.xls':
+        if xlrd is None:
+            raise ValueError('Arquivos .xls exigem o pacote xlrd; salve a planilha como .xlsx ou .csv')
+        livro = xlrd.open_workbook(caminho, on_demand=True)
+        planilha = livro.sheet_by_index(0)
+        for numero in range(planilha.nrows):
+            linha = []
+            for celula in planilha.row(numero):
+                if celula.ctype == xlrd.XL_CELL_DATE:
+                    linha.append(xlrd.xldate_as_datetime(celula.value, livro.datemode))
+                else:
+                    linha.append(celula.value)
+            yield numero + 1, linha
+        livro.release_resources()
+    else:
+        raise ValueError(f"Formato de planilha não suportado: {extensao}")
+
+
+def ultima_data_importada() -> Optional[date]:
+    """Most recent month written by a successful import"""
+    return ImportacaoJEBR.objects.filter(
+        sucesso=True,
+        data_final_importada__isnull=False
+    ).order_by('-data_final_importada').values_list('data_final_importada', flat=True).first()
+
+
+def _gravar_lote(lote: List[IndiceJEBR], importacao: ImportacaoJEBR):
+    datas = [indice.data_referencia for indice in lote]
+    existentes = set(IndiceJEBR.objects.filter(data_referencia__in=datas).values_list('data_referencia', flat=True))
+    IndiceJEBR.objects.bulk_create(
+        lote,
+        update_conflicts=True,
+        unique_fields=['data_referencia'],
+        update_fields=['valor_indice', 'data_importacao', 'ativo', 'oficial', 'data_atualizacao']
+    )
+    importacao.registros_atualizados += len(existentes)
+    importacao.registros_criados += len(lote) - len(existentes)
+
+
+def importar_jebr(caminho: str, url_fonte: Optional[str] = None, completo: bool = False,
+                  coluna_data: int = 0, coluna_indice: int = 1, tamanho_lote: int = 500) -> ImportacaoJEBR:
+    """
+    Import a JEBR spreadsheet and record the run in ImportacaoJEBR.
+
+    Rows without a date in coluna_data (titles, headers, notes) are skipped
+    silently; dated rows with an invalid index count as errors, and months
+    already covered by the last successful import count as ignored unless
+    completo=True.
+    """
+    inicio = time.monotonic()
+    importacao = ImportacaoJEBR(arquivo_fonte=os.path.basename(caminho))
+    if url_fonte:
+        importacao.url_fonte = url_fonte
+    importacao.save()
+
+    limite = None if completo else ultima_data_importada()
+    agora = timezone.now()
+    vistos = set()
+    erros = []
+    lote: List[IndiceJEBR] = []
+    lotes = 0
+
+    try:
+        with transaction.atomic():
+            for numero, linha in iter_planilha(caminho):
+                data_referencia = parse_data_referencia(linha[coluna_data]) if len(linha) > coluna_data else None
+                if data_referencia is None:
+                    continue
+                importacao.registros_processados += 1
+
+                if (limite and data_referencia <= limite) or data_referencia in vistos:
+                    importacao.registros_ignorados += 1
+                    continue
+                try:
+                    valor = parse_indice(linha[coluna_indice])
+                    if not valor.is_finite() or valor <= 0:
+                        raise InvalidOperation(valor)
+                except (IndexError, InvalidOperation, TypeError, ValueError):
+                    importacao.registros_erro += 1
+                    if len(erros) < 50:
+                        erros.append({'linha': numero, 'valor': str(linha[coluna_indice:coluna_indice + 1])})
+                    continue
+
+                vistos.add(data_referencia)
+                lote.append(IndiceJEBR(
+                    data_referencia=data_referencia,
+                    valor_indice=valor,
+                    data_importacao=agora,
+                    ativo=True,
+                    oficial=True
+                ))
+                if len(lote) >= tamanho_lote:
+                    _gravar_lote(lote, importacao)
+                    lotes += 1
+                    lote = []
+
+            if lote:
+                _gravar_lote(lote, importacao)
+                lotes += 1
+
+        if vistos:
+            importacao.data_inicial_importada = min(vistos)
+            importacao.data_final_importada = max(vistos)
+        importacao.sucesso = True
+    except Exception as e:
+        logger.exception("Error importing JEBR from %s", caminho)
+        importacao.sucesso = False
+        importacao.mensagem_erro = str(e)
+        importacao.registros_criados = importacao.registros_atualizados = 0
+
+    if importacao.sucesso and (importacao.registros_criados or importacao.registros_atualizados):
+        recalcular_fatores()
+
+    importacao.tempo_execucao = timedelta(seconds=time.monotonic() - inicio)
+    importacao.detalhes_importacao = {
+        'formato': os.path.splitext(caminho)[1].lower(),
+        'importacao_completa': completo,
+        'importado_apos': limite.isoformat() if limite else None,
+        'coluna_data': coluna_data,
+        'coluna_indice': coluna_indice,
+        'lotes': lotes,
+        'erros': erros
+    }
+    importacao.save()
+    return importacao
+
+
+def _indice_mes(data_referencia: date) -> int:
+    return data_referencia.year * 12 + data_referencia.month - 1
+
+
+def _to_decimal(valores: np.ndarray, casas: int) -> List[Optional[Decimal]]:
+    formato = f"{{:.{casas}f}}"
+    return [None if np.isnan(valor) else Decimal(formato.format(valor)) for valor in valores.tolist()]
+
+
+def recalcular_fatores() -> int:
+    """
+    Recompute the derived columns of the whole series in one vectorized pass:
+    fator_acumulado (index / index of the first month), variacao_mensal and
+    variacao_anual (percent change over 1 and 12 months; empty across gaps).
+    Returns the number of months updated.
+    """
+    indices = list(IndiceJEBR.objects.filter(ativo=True).order_by('data_referencia'))
+    if not indices:
+        return 0
+
+    meses = np.array([_indice_mes(indice.data_referencia) for indice in indices])
+    valores = np.array([float(indice.valor_indice) for indice in indices])
+
+    # Dense monthly series so that t-1 and t-12 are plain offsets (gaps stay NaN)
+    serie = np.full(meses[-1] - meses[0] + 1, np.nan)
+    posicoes = meses - meses[0]
+    serie[posicoes] = valores
+
+    anterior = np.full_like(serie, np.nan)
+    anterior[1:] = serie[:-1]
+    ano_anterior = np.full_like(serie, np.nan)
+    ano_anterior[12:] = serie[:-12]
+
+    fator = valores / valores[0]
+    variacao_mensal = (serie / anterior - 1.0)[posicoes] * 100.0
+    variacao_anual = (serie / ano_anterior - 1.0)[posicoes] * 100.0
+
+    for indice, fator_mes, mensal, anual in zip(indices, _to_decimal(fator, 10),
+                                                _to_decimal(variacao_mensal, 6),
+                                                _to_decimal(variacao_anual, 6)):
+        indice.fator_acumulado = fator_mes
+        indice.variacao_mensal = mensal
+        indice.variacao_anual = anual
+    IndiceJEBR.objects.bulk_update(
+        indices, ['fator_acumulado', 'variacao_mensal', 'variacao_anual'], batch_size=500
+    )
+    invalidar_fatores()
+    return len(indices)
+
+
+class FatoresJEBR:
+    """Month -> fator_acumulado array for O(1) monetary correction"""
+
+    def __init__(self, meses: np.ndarray, fatores: np.ndarray):
+        self.primeiro_mes = int(meses[0]) if len(meses) else 0
+        self.fatores = np.full(int(meses[-1]) - self.primeiro_mes + 1 if len(meses) else 0, np.nan)
+        self.fatores[meses - self.primeiro_mes] = fatores
+
+    @classmethod
+    def carregar(cls) -> 'FatoresJEBR':
+        linhas = list(
+            IndiceJEBR.objects.filter(ativo=True, fator_acumulado__isnull=False)
+            .order_by('data_referencia')
+            .values_list('data_referencia', 'fator_acumulado')
+        )
+        meses = np.array([_indice_mes(data_referencia) for data_referencia, _ in linhas], dtype=np.int64)
+        fatores = np.array([float(fator) for _, fator in linhas])
+        return cls(meses, fatores)
+
+    @property
+    def ultimo_mes(self) -> Optional[date]:
+        if not len(self.fatores):
+            return None
+        mes = self.primeiro_mes + len(self.fatores) - 1
+        return date(mes // 12, mes % 12 + 1, 1)
+
+    def cobertos(self, meses) -> np.ndarray:
+        """Boolean mask of the month numbers (year * 12 + month - 1) that have a factor"""
+        posicoes = np.asarray(meses, dtype=np.int64) - self.primeiro_mes
+        dentro = (posicoes >= 0) & (posicoes < len(self.fatores))
+        cobertos = np.zeros(posicoes.shape, dtype=bool)
+        cobertos[dentro] = ~np.isnan(self.fatores[posicoes[dentro]])
+        return cobertos
+
+    def _posicoes(self, meses: np.ndarray) -> np.ndarray:
+        if not self.cobertos(meses).all():
+            raise ValueError('Mês sem índice JEBR importado')
+        return np.asarray(meses) - self.primeiro_mes
+
+    def fator(self, data_referencia: date) -> float:
+        return float(self.fatores[self._posicoes(_indice_mes(data_referencia))])
+
+    def corrigir(self, valor: float, de: date, para: date) -> float:
+        """Value of `de` updated to the month of `para`"""
+        return valor * self.fator(para) / self.fator(de)
+
+    def corrigir_serie(self, valores, meses_de, para: date) -> np.ndarray:
+        """
+        Vectorized correction of many installments to one target month.
+        meses_de: dates, or month numbers (year * 12 + month - 1)
+        """
+        meses = np.array([
+            _indice_mes(mes) if isinstance(mes, date) else mes for mes in meses_de
+        ], dtype=np.int64)
+        fatores_de = self.fatores[self._posicoes(meses)]
+        return np.asarray(valores, dtype=np.float64) * (self.fator(para) / fatores_de)
+
+
+# Workers check for a newer successful import at most this often (seconds)
+FATORES_REVALIDACAO = 300
+
+_fatores: Optional[FatoresJEBR] = None
+_fatores_versao: Optional[int] = None
+_fatores_verificados_em = 0.0
+_fatores_lock = threading.Lock()
+
+
+def get_fatores() -> FatoresJEBR:
+    """
+    Factor array of this process, loaded on first use and reloaded when an
+    import (possibly run by another process) has finished since.
+    """
+    global _fatores, _fatores_versao, _fatores_verificados_em
+    if _fatores is None or time.monotonic() - _fatores_verificados_em > FATORES_REVALIDACAO:
+        with _fatores_lock:
+            if _fatores is None or time.monotonic() - _fatores_verificados_em > FATORES_REVALIDACAO:
+                versao = ImportacaoJEBR.objects.filter(sucesso=True).order_by('-pk').values_list('pk', flat=True).first()
+                if _fatores is None or versao != _fatores_versao:
+                    _fatores = FatoresJEBR.carregar()
+                    _fatores_versao = versao
+                _fatores_verificados_em = time.monotonic()
+    return _fatores
+
+
+def invalidar_fatores():
+    """Drop the cached factors (reloaded on the next correction)"""
+    global _fatores
+    _fatores = None
@@ -0,0 +1,295 @@
+"""
+Local background job queue for vencimento calculations.
+
+Jobs are CalculoJob rows in the regular Django database, so no external
+broker is needed. They run on a thread pool inside the web process (or on
+the `processar_jobs` management command), and clients poll their status
+instead of holding a web worker for the whole API fetch.
+
+Workers refresh `atualizado_em` as they make progress. An active job whose
+heartbeat is older than settings.VENCIMENTO_JOB_STALE_AFTER was left behind by
+a worker that died (typically a restart of the web process). Such jobs are put
+back in the queue when the first in-process worker of a new process starts,
+when their status is polled, and when the same job is submitted again
+(instead of returning the dead one).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .fichas_store import get_fichas_store
+from .models import CalculoJob
+from .structured_logging import reset_request_id, set_request_id
+
+# Add utils directory to path for import
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.join(current_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from services import VencimentoServiceFixed
+from vencimento_records import as_dict
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'VENCIMENTO_JOB_WORKERS', 2),
+                    thread_name_prefix='vencimento-job'
+                )
+                # Jobs orphaned by the previous process are picked up by the new pool
+                _executor.submit(_requeue_orphans)
+    return _executor
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'VENCIMENTO_JOB_STALE_AFTER', 900))
+
+
+def _dispatch(job_id: int):
+    """Run the job on the in-process pool once the current transaction commits"""
+    if getattr(settings, 'VENCIMENTO_JOBS_IN_PROCESS', True):
+        transaction.on_commit(lambda: _get_executor().submit(run_job, job_id))
+
+
+def _requeue(job_id: int, limite) -> bool:
+    """Put an active job without heartbeat since `limite` back in the queue"""
+    return CalculoJob.objects.filter(
+        pk=job_id, status__in=CalculoJob.STATUS_ATIVOS, atualizado_em__lt=limite
+    ).update(
+        status=CalculoJob.STATUS_PENDENTE,
+        data_inicio_execucao=None,
+        progresso_atual=0,
+        atualizado_em=timezone.now()
+    ) == 1
+
+
+def recover_stale_job(job: CalculoJob) -> CalculoJob:
+    """Requeue (and dispatch again) an active job whose worker stopped reporting"""
+    if job.status not in CalculoJob.STATUS_ATIVOS:
+        return job
+    limite = timezone.now() - _stale_after()
+    if job.atualizado_em >= limite:
+        return job
+    if _requeue(job.pk, limite):
+        logger.warning("Job %s had no activity since %s; requeued", job.pk, job.atualizado_em)
+        # A duplicate dispatch is harmless: run_job claims the job atomically
+        _dispatch(job.pk)
+    job.refresh_from_db()
+    return job
+
+
+def _requeue_orphans():
+    """
+    First task of the in-process pool: requeue and run the active jobs left
+    without heartbeat by a previous process
+    """
+    close_old_connections()
+    try:
+        limite = timezone.now() - _stale_after()
+        orfaos = CalculoJob.objects.filter(
+            status__in=CalculoJob.STATUS_ATIVOS, atualizado_em__lt=limite
+        ).values_list('pk', flat=True)
+        for job_id in list(orfaos):
+            if _requeue(job_id, limite):
+                logger.warning("Job %s was orphaned by a previous process; requeued", job_id)
+                _executor.submit(run_job, job_id)
+    except Exception:
+        logger.exception("Error requeuing orphaned jobs")
+    finally:
+        connection.close()
+
+
+def _to_json(value: Any) -> Any:
+    """Round-trip through DjangoJSONEncoder so dates become strings"""
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def _job_key(tipo: str, parametros: Dict[str, Any]) -> str:
+    # force_refresh does not change the result, so it is not part of the key
+    dados = {k: v for k, v in parametros.items() if k != 'force_refresh'}
+    serializado = json.dumps([tipo, dados], cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def submit_job(tipo: str, parametros: Dict[str, Any], total: int = 1) -> Tuple[CalculoJob, bool]:
+    """
+    Queue a job, or return the active job with the same parameters (requeued
+    first if its worker died). Returns (job, created).
+    """
+    parametros = _to_json(parametros)
+    chave = _job_key(tipo, parametros)
+
+    existing = CalculoJob.objects.filter(chave=chave, status__in=CalculoJob.STATUS_ATIVOS).first()
+    if existing:
+        return recover_stale_job(existing), False
+
+    try:
+        with transaction.atomic():
+            job = CalculoJob.objects.create(
+                tipo=tipo,
+                chave=chave,
+                parametros=parametros,
+                progresso_total=total
+            )
+    except IntegrityError:
+        # Another request queued the same job concurrently
+        return CalculoJob.objects.get(chave=chave, status__in=CalculoJob.STATUS_ATIVOS), False
+
+    _dispatch(job.pk)
+    return job, True
+
+
+def submit_vencimento_job(matricula: str, data_inicio: date, data_fim: date,
+                          force_refresh: bool = False) -> Tuple[CalculoJob, bool]:
+    return submit_job(CalculoJob.TIPO_VENCIMENTO, {
+        'matricula': matricula,
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'force_refresh': force_refresh
+    })
+
+
+def submit_batch_job(itens: List[Tuple[str, date, date]], force_refresh: bool = False) -> Tuple[CalculoJob, bool]:
+    return submit_job(CalculoJob.TIPO_LOTE, {
+        'itens': [list(item) for item in itens],
+        'force_refresh': force_refresh
+    }, total=len(itens))
+
+
+def _claim(job_id: int) -> bool:
+    """Atomically move a pending job to running; False if another worker took it"""
+    return CalculoJob.objects.filter(pk=job_id, status=CalculoJob.STATUS_PENDENTE).update(
+        status=CalculoJob.STATUS_EXECUTANDO,
+        data_inicio_execucao=timezone.now(),
+        atualizado_em=timezone.now()
+    ) == 1
+
+
+def _result_entry(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep what clients need, dropping the full API payload"""
+    return {
+        'matricula': result['matricula'],
+        'success': result['success'],
+        'message': result['message'],
+        'metadata': result.get('metadata'),
+        'data': as_dict(result.get('data'))
+    }
+
+
+def _run_vencimento(job: CalculoJob) -> Dict[str, Any]:
+    parametros = job.parametros
+    result = VencimentoServiceFixed(store=get_fichas_store()).calculate_vencimento_data(
+        parametros['matricula'],
+        date.fromisoformat(parametros['data_inicio']),
+        date.fromisoformat(parametros['data_fim']),
+        force_refresh=parametros.get('force_refresh', False)
+    )
+    result['matricula'] = parametros['matricula']
+    CalculoJob.objects.filter(pk=job.pk).update(progresso_atual=1, atualizado_em=timezone.now())
+    return _result_entry(result)
+
+
+def _run_batch(job: CalculoJob) -> Dict[str, Any]:
+    parametros = job.parametros
+    itens = [
+        (matricula, date.fromisoformat(inicio), date.fromisoformat(fim))
+        for matricula, inicio, fim in parametros['itens']
+    ]
+    vencimento_service = VencimentoServiceFixed(store=get_fichas_store())
+    resultados = []
+    results = vencimento_service.iter_batch_vencimento_data(
+        itens,
+        max_workers=getattr(settings, 'VENCIMENTO_BATCH_MAX_WORKERS', 8),
+        force_refresh=parametros.get('force_refresh', False)
+    )
+    for concluidos, result in enumerate(results, 1):
+        resultados.append(_result_entry(result))
+        CalculoJob.objects.filter(pk=job.pk).update(progresso_atual=concluidos, atualizado_em=timezone.now())
+
+    return {
+        'consolidado': vencimento_service.consolidate_batch_results(resultados),
+        'resultados': resultados
+    }
+
+
+RUNNERS = {
+    CalculoJob.TIPO_VENCIMENTO: _run_vencimento,
+    CalculoJob.TIPO_LOTE: _run_batch,
+}
+
+
+def run_job(job_id: int):
+    """Execute one job; safe to call from any worker thread or process"""
+    close_old_connections()
+    # Log records of the job carry its id (the worker thread has no request)
+    token = set_request_id(f'job-{job_id}')
+    try:
+        if not _claim(job_id):
+            return
+        job = CalculoJob.objects.get(pk=job_id)
+        try:
+            resultado = RUNNERS[job.tipo](job)
+            CalculoJob.objects.filter(pk=job_id).update(
+                status=CalculoJob.STATUS_CONCLUIDO,
+                resultado=_to_json(resultado),
+                data_conclusao=timezone.now(),
+                atualizado_em=timezone.now()
+            )
+        except Exception as e:
+            logger.exception("Error in job %s", job_id)
+            CalculoJob.objects.filter(pk=job_id).update(
+                status=CalculoJob.STATUS_ERRO,
+                mensagem_erro=str(e),
+                data_conclusao=timezone.now(),
+                atualizado_em=timezone.now()
+            )
+    finally:
+        reset_request_id(token)
+        # Worker threads open their own connection; release it
+        connection.close()
+
+
+def requeue_stale_jobs(max_age: timedelta = timedelta(hours=1)) -> int:
+    """Put back jobs left running by a worker that died (no heartbeat for max_age)"""
+    limite = timezone.now() - max_age
+    return CalculoJob.objects.filter(
+        status=CalculoJob.STATUS_EXECUTANDO,
+        atualizado_em__lt=limite
+    ).update(status=CalculoJob.STATUS_PENDENTE, data_inicio_execucao=None, atualizado_em=timezone.now())
+
+
+def job_status(job: CalculoJob) -> Dict[str, Any]:
+    """Status payload for the polling endpoint"""
+    return {
+        'id': job.pk,
+        'tipo': job.tipo,
+        'status': job.status,
+        'progresso_atual': job.progresso_atual,
+        'progresso_total': job.progresso_total,
+        'percentual': job.percentual,
+        'mensagem_erro': job.mensagem_erro,
+        'data_criacao': job.data_criacao,
+        'data_inicio_execucao': job.data_inicio_execucao,
+        'data_conclusao': job.data_conclusao
+    }
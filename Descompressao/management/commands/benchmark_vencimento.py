@@ -0,0 +1,106 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Descompressao import benchmarks
+
+
+def _lista_inteiros(valor):
+    try:
+        return [int(parte) for parte in valor.split(',') if parte.strip()]
+    except ValueError:
+        raise CommandError(f"Lista de inteiros inválida: {valor}")
+
+
+class Command(BaseCommand):
+    help = ('Mede extração, agregação, pagamentos para cálculo, arquivamento e renderização do relatório '
+            'em servidores sintéticos de vários tamanhos, guarda o resultado por commit e compara com uma '
+            'execução anterior')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anos', default=','.join(map(str, benchmarks.DEFAULT_YEARS)),
+                            help='Anos de carreira dos servidores sintéticos (lista separada por vírgulas)')
+        parser.add_argument('--verbas', default=','.join(map(str, benchmarks.DEFAULT_VERBAS)),
+                            help='Verbas por ano dos servidores sintéticos (lista separada por vírgulas)')
+        parser.add_argument('--benchmarks', default=','.join(benchmarks.BENCHMARKS),
+                            help=f"Benchmarks executados, entre: {', '.join(benchmarks.BENCHMARKS)}")
+        parser.add_argument('--repeticoes', type=int, default=5, help='Repetições medidas de cada benchmark')
+        parser.add_argument('--modelo', default=None,
+                            help='vencimento_data_*.json usado como modelo (padrão: o primeiro salvo no app)')
+        parser.add_argument('--comparar', default=None,
+                            help='Commit (prefixo) ou arquivo de resultados usado como referência '
+                                 '(padrão: a execução guardada do commit ancestral mais próximo de HEAD)')
+        parser.add_argument('--limite', type=float, default=0.2,
+                            help='Aumento relativo do tempo mínimo considerado regressão (0.2 = 20%%)')
+        parser.add_argument('--nao-salvar', action='store_true', help='Não guarda o resultado desta execução')
+        parser.add_argument('--diretorio', default=None,
+                            help='Diretório dos resultados (padrão: settings.VENCIMENTO_BENCHMARK_DIR)')
+
+    def handle(self, *args, **options):
+        nomes = [nome.strip() for nome in options['benchmarks'].split(',') if nome.strip()]
+        desconhecidos = set(nomes) - set(benchmarks.BENCHMARKS)
+        if desconhecidos:
+            raise CommandError(f"Benchmarks desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+        try:
+            resultado = benchmarks.run(
+                years=_lista_inteiros(options['anos']),
+                verbas=_lista_inteiros(options['verbas']),
+                benchmarks=nomes,
+                repeat=options['repeticoes'],
+                modelo=options['modelo'],
+                progress=lambda caso: self.stdout.write(f"  caso {caso} medido")
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self._tabela(resultado)
+        if not options['nao_salvar']:
+            caminho = benchmarks.save(resultado, options['diretorio'])
+            self.stdout.write(f"Resultado do commit {resultado['commit']} guardado em {caminho}")
+
+        if options['comparar']:
+            try:
+                caminho_base, base = benchmarks.load(options['comparar'], options['diretorio'])
+            except FileNotFoundError as e:
+                raise CommandError(str(e))
+        else:
+            caminho_base = benchmarks.latest_baseline(resultado['commit'], options['diretorio'])
+            if caminho_base is None:
+                self.stdout.write("Nenhuma execução guardada de um commit ancestral para comparar; "
+                                  "indique a referência com --comparar.")
+                return
+            caminho_base, base = benchmarks.load(str(caminho_base))
+
+        self._comparacao(resultado, base, caminho_base, options['limite'])
+
+    def _tabela(self, resultado):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Commit {resultado['commit']} (Python {resultado['python']}, {resultado['repeat']} repetições)"
+        ))
+        self.stdout.write(
+            f"{'caso':>8} {'registros':>9} {'benchmark':>11} {'mín (ms)':>10} {'mediana (ms)':>13} "
+            f"{'CPU (ms)':>10} {'pico (KiB)':>11}"
+        )
+        for caso, entrada in resultado['results'].items():
+            for nome, medida in entrada['benchmarks'].items():
+                self.stdout.write(
+                    f"{caso:>8} {entrada['records']:>9} {nome:>11} {medida['min'] * 1000:>10.2f} "
+                    f"{medida['median'] * 1000:>13.2f} {medida['cpu'] * 1000:>10.2f} "
+                    f"{medida['peak_bytes'] / 1024:>11.1f}"
+                )
+
+    def _comparacao(self, resultado, base, caminho_base, limite):
+        linhas = benchmarks.compare(resultado, base, limite)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Comparação com {base.get('commit')} ({caminho_base})"))
+        regressoes = [linha for linha in linhas if linha['regression']]
+        for linha in linhas:
+            texto = (
+                f"{linha['case']:>8} {linha['benchmark']:>11} {linha['baseline'] * 1000:>10.2f} -> "
+                f"{linha['current'] * 1000:>10.2f} ms ({linha['ratio']:.2f}x tempo, "
+                f"{linha['memory_ratio']:.2f}x memória)"
+            )
+            self.stdout.write(self.style.ERROR(texto) if linha['regression'] else texto)
+        if regressoes:
+            raise CommandError(
+                f"{len(regressoes)} benchmark(s) mais de {limite:.0%} mais lento(s) que {base.get('commit')}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Nenhuma regressão acima de {limite:.0%}."))
@@ -0,0 +1,160 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class _Resultados:
+    """Latências (s) e falhas de um tipo de requisição, compartilhadas entre as threads"""
+
+    def __init__(self):
+        self.latencias = []
+        self.erros = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, latencia, erro=None):
+        with self._lock:
+            self.latencias.append(latencia)
+            if erro:
+                self.erros[erro] = self.erros.get(erro, 0) + 1
+
+
+class Command(BaseCommand):
+    help = ('Teste de carga da aplicação: envia consultas de vencimento e tarefas em lote concorrentes '
+            'e informa latências p50/p95/p99 e vazão')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/vencimento/',
+                            help='URL do formulário de vencimento da aplicação em teste')
+        parser.add_argument('--requisicoes', type=int, default=50, help='Consultas (POST do formulário) enviadas')
+        parser.add_argument('--concorrencia', type=int, default=8, help='Requisições simultâneas')
+        parser.add_argument('--lotes', type=int, default=0, help='Tarefas em lote (jobs/lote/) enviadas')
+        parser.add_argument('--tamanho-lote', type=int, default=10, help='Matrículas por tarefa em lote')
+        parser.add_argument('--matriculas', type=int, default=20,
+                            help='Matrículas sintéticas distintas usadas (com a API falsa, qualquer uma existe)')
+        parser.add_argument('--inicio', default='2015-01-01', help='Data de início do período consultado')
+        parser.add_argument('--fim', default='2019-12-31', help='Data de fim do período consultado')
+        parser.add_argument('--force-refresh', action='store_true', help='Ignora os caches da aplicação')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Timeout de cada requisição (s)')
+        parser.add_argument('--timeout-lote', type=float, default=600.0,
+                            help='Tempo máximo de espera pela conclusão de cada tarefa em lote (s)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.base_url = options['url'] if options['url'].endswith('/') else options['url'] + '/'
+        self.matriculas = [f"{indice:08d}-01" for indice in range(1, max(options['matriculas'], 1) + 1)]
+        self._local = threading.local()
+
+        try:
+            requests.get(self.base_url, timeout=options['timeout']).raise_for_status()
+        except requests.RequestException as e:
+            raise CommandError(f"Aplicação indisponível em {self.base_url}: {e}")
+
+        consultas = _Resultados()
+        lotes = _Resultados()
+        self.stdout.write(
+            f"Enviando {options['requisicoes']} consulta(s) e {options['lotes']} lote(s) "
+            f"com concorrência {options['concorrencia']}..."
+        )
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concorrencia'], thread_name_prefix='carga') as executor:
+            tarefas = [executor.submit(self._consulta, indice, consultas) for indice in range(options['requisicoes'])]
+            tarefas += [executor.submit(self._lote, indice, lotes) for indice in range(options['lotes'])]
+            for tarefa in tarefas:
+                tarefa.result()
+        duracao = time.perf_counter() - inicio
+
+        self._relatorio('Consultas (POST do formulário)', consultas, duracao)
+        self._relatorio('Tarefas em lote (envio até conclusão)', lotes, duracao)
+        self.stdout.write(f"Duração total: {duracao:.2f}s")
+
+    def _sessao(self):
+        """Sessão HTTP da thread, já com o cookie csrftoken da aplicação"""
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = requests.Session()
+            sessao.get(self.base_url, timeout=self.options['timeout']).raise_for_status()
+            self._local.sessao = sessao
+        return sessao
+
+    def _post(self, url, dados):
+        sessao = self._sessao()
+        dados = dict(dados, csrfmiddlewaretoken=sessao.cookies.get('csrftoken', ''))
+        if self.options['force_refresh']:
+            dados['force_refresh'] = 'on'
+        return sessao.post(url, data=dados, headers={'Referer': self.base_url}, timeout=self.options['timeout'])
+
+    def _consulta(self, indice, resultados):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            resposta = self._post(self.base_url, {
+                'matricula': self.matriculas[indice % len(self.matriculas)],
+                'data_inicio': self.options['inicio'],
+                'data_fim': self.options['fim']
+            })
+            if resposta.status_code != 200:
+                erro = f"HTTP {resposta.status_code}"
+            elif 'alert-danger' in resposta.text:
+                # O formulário volta com status 200 quando a consulta falha
+                erro = 'consulta com erro'
+        except requests.RequestException as e:
+            erro = type(e).__name__
+        resultados.registrar(time.perf_counter() - inicio, erro)
+
+    def _lote(self, indice, resultados):
+        tamanho = self.options['tamanho_lote']
+        matriculas = [self.matriculas[(indice * tamanho + posicao) % len(self.matriculas)] for posicao in range(tamanho)]
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            resposta = self._post(urljoin(self.base_url, 'jobs/lote/'), {
+                'matriculas': '\n'.join(matriculas),
+                'data_inicio': self.options['inicio'],
+                'data_fim': self.options['fim']
+            })
+            if resposta.status_code not in (200, 202):
+                erro = f"HTTP {resposta.status_code}"
+            else:
+                erro = self._aguardar_tarefa(urljoin(self.base_url, resposta.json()['status_url']))
+        except (requests.RequestException, ValueError, KeyError) as e:
+            erro = type(e).__name__
+        resultados.registrar(time.perf_counter() - inicio, erro)
+
+    def _aguardar_tarefa(self, status_url):
+        """None quando a tarefa conclui; senão, a descrição da falha"""
+        limite = time.monotonic() + self.options['timeout_lote']
+        intervalo = 0.2
+        while time.monotonic() < limite:
+            status = self._sessao().get(status_url, timeout=self.options['timeout']).json().get('status')
+            if status == 'concluido':
+                return None
+            if status == 'erro':
+                return 'tarefa com erro'
+            time.sleep(intervalo)
+            intervalo = min(intervalo * 1.5, 2.0)
+        return 'tarefa não concluída no prazo'
+
+    def _relatorio(self, titulo, resultados, duracao):
+        latencias = resultados.latencias
+        if not latencias:
+            return
+        falhas = sum(resultados.erros.values())
+        self.stdout.write(self.style.MIGRATE_HEADING(titulo))
+        self.stdout.write(f"  Requisições: {len(latencias)} ({falhas} com falha)")
+        for erro, quantidade in sorted(resultados.erros.items()):
+            self.stdout.write(f"    {erro}: {quantidade}")
+        if len(latencias) > 1:
+            percentis = statistics.quantiles(latencias, n=100, method='inclusive')
+            p50, p95, p99 = percentis[49], percentis[94], percentis[98]
+        else:
+            p50 = p95 = p99 = latencias[0]
+        self.stdout.write(
+            f"  Latência (ms): p50 {p50 * 1000:.1f} | p95 {p95 * 1000:.1f} | p99 {p99 * 1000:.1f} | "
+            f"máx {max(latencias) * 1000:.1f}"
+        )
+        self.stdout.write(f"  Vazão: {len(latencias) / duracao:.2f} req/s")
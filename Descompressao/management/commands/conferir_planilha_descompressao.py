@@ -0,0 +1,32 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+utils_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from calculo_descompressao import conferir_planilha
+
+
+class Command(BaseCommand):
+    help = 'Confere o cálculo de descompressão em Python contra os valores salvos na planilha .xlsm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', nargs='?', default=None,
+                            help="Planilha de descompressão (padrão: api_config['planilha_descompressao'])")
+        parser.add_argument('--tolerancia', type=float, default=1e-6, help='Diferença máxima aceita por célula')
+
+    def handle(self, *args, **options):
+        resultado = conferir_planilha(options['arquivo'], tolerancia=options['tolerancia'])
+        for divergencia in resultado['divergencias']:
+            self.stdout.write(
+                f"{divergencia['aba']}!{divergencia['celula']}: calculado {divergencia['calculado']!r}, "
+                f"planilha {divergencia['planilha']!r}"
+            )
+        if resultado['divergencias']:
+            raise CommandError(
+                f"{len(resultado['divergencias'])} de {resultado['celulas_conferidas']} células divergem da planilha"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{resultado['celulas_conferidas']} células conferidas, nenhuma divergência."))
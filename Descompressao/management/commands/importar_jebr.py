@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Descompressao.jebr import importar_jebr
+
+
+class Command(BaseCommand):
+    help = 'Importa a planilha do índice JEBR a partir de um arquivo local (.xlsx, .csv ou .xls)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Planilha JEBR baixada de ImportacaoJEBR.url_fonte')
+        parser.add_argument('--completo', action='store_true',
+                            help='Reimporta todos os meses, não só os posteriores à última importação')
+        parser.add_argument('--url-fonte', default=None, help='URL de onde a planilha foi baixada')
+        parser.add_argument('--coluna-data', type=int, default=0, help='Coluna (a partir de 0) com o mês de referência')
+        parser.add_argument('--coluna-indice', type=int, default=1, help='Coluna (a partir de 0) com o valor do índice')
+        parser.add_argument('--lote', type=int, default=500, help='Registros gravados por comando bulk_create')
+
+    def handle(self, *args, **options):
+        importacao = importar_jebr(
+            options['arquivo'],
+            url_fonte=options['url_fonte'],
+            completo=options['completo'],
+            coluna_data=options['coluna_data'],
+            coluna_indice=options['coluna_indice'],
+            tamanho_lote=options['lote']
+        )
+        if not importacao.sucesso:
+            raise CommandError(f"Importação #{importacao.pk} falhou: {importacao.mensagem_erro}")
+
+        self.stdout.write(
+            f"{importacao.registros_processados} meses lidos: {importacao.registros_criados} criados, "
+            f"{importacao.registros_atualizados} atualizados, {importacao.registros_ignorados} ignorados, "
+            f"{importacao.registros_erro} com erro ({importacao.tempo_execucao.total_seconds():.2f}s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Importação #{importacao.pk} concluída."))
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from Descompressao.jobs import requeue_stale_jobs, run_job
+from Descompressao.models import CalculoJob
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas de cálculo pendentes (fila local baseada no banco de dados)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Número de tarefas executadas em paralelo')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas à fila')
+        parser.add_argument('--once', action='store_true', help='Processa as tarefas pendentes e encerra')
+        parser.add_argument('--timeout-minutos', type=int, default=60,
+                            help='Tarefas executando sem atividade há mais tempo que isso voltam para a fila')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stdout.write(f"Processando tarefas com {workers} worker(s)...")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vencimento-job') as executor:
+            while True:
+                reenfileiradas = requeue_stale_jobs(timedelta(minutes=options['timeout_minutos']))
+                if reenfileiradas:
+                    self.stdout.write(f"{reenfileiradas} tarefa(s) interrompida(s) voltaram para a fila")
+
+                pendentes = list(
+                    CalculoJob.objects.filter(status=CalculoJob.STATUS_PENDENTE)
+                    .order_by('data_criacao')
+                    .values_list('pk', flat=True)[:workers]
+                )
+                if pendentes:
+                    # run_job claims each job atomically, so other workers never run it twice
+                    wait([executor.submit(run_job, job_id) for job_id in pendentes])
+                    self.stdout.write(f"{len(pendentes)} tarefa(s) processada(s)")
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS("Fila processada."))
@@ -0,0 +1,69 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Add utils directory to path for import
+app_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+utils_dir = os.path.join(app_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from fichas_fake import ConfiguracaoFake, ServidorFichasFake, carregar_modelo
+
+
+class Command(BaseCommand):
+    help = 'Sobe uma API de Fichas Financeiras falsa local, para desenvolvimento e testes de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Endereço em que o servidor escuta')
+        parser.add_argument('--porta', type=int, default=8765, help='Porta em que o servidor escuta')
+        parser.add_argument('--modelo', default=None,
+                            help='vencimento_data_*.json usado como modelo (padrão: o primeiro salvo no app)')
+        parser.add_argument('--latencia-ms', type=float, default=0.0, help='Latência média de cada resposta')
+        parser.add_argument('--variacao-ms', type=float, default=0.0, help='Variação aleatória (±) da latência')
+        parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração das consultas respondidas com 503')
+        parser.add_argument('--taxa-401', type=float, default=0.0,
+                            help='Fração das consultas que expiram o token (401)')
+        parser.add_argument('--anos', type=int, default=18, help='Anos de fichas financeiras por servidor')
+        parser.add_argument('--verbas', type=int, default=33, help='Verbas (itens) por ficha anual')
+        parser.add_argument('--ano-final', type=int, default=None, help='Ano da ficha mais recente (padrão: ano corrente)')
+        parser.add_argument('--campo-ano', default='ano',
+                            help="Campo de ano aceito em busca_matricula (api_config['busca_matricula_campo_ano'])")
+        parser.add_argument('--semente', type=int, default=None, help='Semente dos sorteios de latência e erros')
+        parser.add_argument('--verbose', action='store_true', help='Registra cada requisição recebida')
+
+    def handle(self, *args, **options):
+        configuracao = ConfiguracaoFake(
+            latencia_ms=options['latencia_ms'],
+            variacao_ms=options['variacao_ms'],
+            taxa_erro=options['taxa_erro'],
+            taxa_401=options['taxa_401'],
+            anos=options['anos'],
+            verbas_por_ano=options['verbas'],
+            ano_final=options['ano_final'],
+            campo_ano=options['campo_ano'],
+            semente=options['semente']
+        )
+        try:
+            modelo = carregar_modelo(options['modelo'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        servidor = ServidorFichasFake((options['host'], options['porta']), configuracao,
+                                      modelo=modelo, verbose=options['verbose'])
+        host, porta = servidor.server_address[:2]
+        self.stdout.write(f"API de Fichas falsa em {servidor.url}")
+        self.stdout.write(
+            "Use em fichas_api_config.api_config: "
+            f"{{'host': '{host}:{porta}', 'scheme': 'http', 'email': 'teste@local', 'password': 'teste', "
+            f"'busca_matricula_campo_ano': '{configuracao.campo_ano}'}}"
+        )
+        self.stdout.write(f"Estatísticas em {servidor.url}/_estatisticas (Ctrl+C encerra)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+        self.stdout.write(self.style.SUCCESS(f"Servidor encerrado: {servidor.estatisticas()}"))
@@ -0,0 +1,100 @@
+"""
+Request instrumentation.
+
+RequestIdMiddleware gives every request an id (the incoming X-Request-ID
+header when it is a safe value, a new one otherwise). Log records emitted
+while the request is handled carry it, and it is returned in X-Request-ID.
+
+VencimentoMetricsMiddleware collects the stage timings of each request
+(vencimento_metrics.stage), records the request duration per view and, when
+settings.VENCIMENTO_SERVER_TIMING is True, reports the stages to the browser
+in a Server-Timing header (visible in the developer tools' network panel).
+
+Both are sync and async capable, so under ASGI the async views (and their
+concurrent Fichas API calls) run without being adapted to a thread.
+"""
+
+import os
+import sys
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Add utils directory to path for import
+current_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.join(current_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+from vencimento_metrics import REGISTRY, finish_request, server_timing_header, start_request
+
+from .structured_logging import get_request_id, reset_request_id, set_request_id
+
+
+class _SyncAndAsyncMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class RequestIdMiddleware(_SyncAndAsyncMiddleware):
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = set_request_id(request.headers.get('X-Request-ID'))
+        try:
+            request.request_id = get_request_id()
+            response = self.get_response(request)
+        finally:
+            reset_request_id(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = set_request_id(request.headers.get('X-Request-ID'))
+        try:
+            request.request_id = get_request_id()
+            response = await self.get_response(request)
+        finally:
+            reset_request_id(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+class VencimentoMetricsMiddleware(_SyncAndAsyncMiddleware):
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = finish_request(token)
+        return self._record(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        token = start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = finish_request(token)
+        return self._record(request, response, timings, time.perf_counter() - start)
+
+    def _record(self, request, response, timings, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'other'
+        REGISTRY.observe('vencimento_request_seconds', elapsed, view=view)
+
+        if getattr(settings, 'VENCIMENTO_SERVER_TIMING', False):
+            # Streamed responses are still being produced: only the stages run so far are known
+            timings.append(('total', elapsed))
+            response['Server-Timing'] = server_timing_header(timings)
+        return response
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descompressao', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalculoJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('vencimento', 'Vencimento'), ('lote', 'Lote de vencimentos')], max_length=20)),
+                ('chave', models.CharField(help_text='Hash dos parâmetros, usado para deduplicação', max_length=64)),
+                ('parametros', models.JSONField(help_text='Parâmetros do cálculo')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('progresso_atual', models.PositiveIntegerField(default=0)),
+                ('progresso_total', models.PositiveIntegerField(default=0)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('mensagem_erro', models.TextField(blank=True, null=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_inicio_execucao', models.DateTimeField(blank=True, null=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Cálculo',
+                'verbose_name_plural': 'Tarefas de Cálculo',
+                'db_table': 'calculo_job',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='calculojob',
+            index=models.Index(fields=['status', 'data_criacao'], name='calculo_job_status_30851f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calculojob',
+            index=models.Index(fields=['chave'], name='calculo_job_chave_e9bc24_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='calculojob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pendente', 'executando'])), fields=('chave',), name='calculo_job_chave_ativa_unica'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:58
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descompressao', '0002_calculojob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Servidor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matricula', models.CharField(max_length=20, unique=True)),
+                ('nome', models.CharField(blank=True, default='', max_length=255)),
+                ('dados', models.JSONField(blank=True, help_text='Dados do servidor retornados pela API, sem as fichas', null=True)),
+                ('data_sincronizacao', models.DateTimeField(help_text='Última vez que as fichas foram obtidas da API')),
+            ],
+            options={
+                'verbose_name': 'Servidor',
+                'verbose_name_plural': 'Servidores',
+                'db_table': 'servidor',
+                'ordering': ['matricula'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FichaFinanceira',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('hash_conteudo', models.CharField(help_text='Hash dos itens, evita regravar fichas inalteradas', max_length=64)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('servidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fichas', to='Descompressao.servidor')),
+            ],
+            options={
+                'verbose_name': 'Ficha Financeira',
+                'verbose_name_plural': 'Fichas Financeiras',
+                'db_table': 'ficha_financeira',
+                'ordering': ['servidor', 'ano'],
+                'constraints': [models.UniqueConstraint(fields=('servidor', 'ano'), name='ficha_financeira_servidor_ano_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FichaFinanceiraItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matricula', models.CharField(max_length=20)),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('ordem', models.PositiveIntegerField(help_text='Posição do item na ficha retornada pela API')),
+                ('cod_verba', models.IntegerField(blank=True, null=True)),
+                ('nome_verba', models.CharField(blank=True, default='', max_length=255)),
+                ('jan', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('fev', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('mar', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('abr', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('mai', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('jun', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('jul', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('ago', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('set', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('out', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('nov', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('dez', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('dec_terceiro', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('ficha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='Descompressao.fichafinanceira')),
+            ],
+            options={
+                'verbose_name': 'Item de Ficha Financeira',
+                'verbose_name_plural': 'Itens de Fichas Financeiras',
+                'db_table': 'ficha_financeira_item',
+                'ordering': ['matricula', 'ano', 'ordem'],
+                'indexes': [models.Index(fields=['matricula', 'ano', 'cod_verba'], name='ficha_item_mat_ano_verba_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ficha', 'ordem'), name='ficha_financeira_item_ordem_unica')],
+            },
+        ),
+    ]
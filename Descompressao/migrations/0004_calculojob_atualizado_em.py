@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descompressao', '0003_servidor_fichafinanceira_fichafinanceiraitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculojob',
+            name='atualizado_em',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Última atividade do worker (heartbeat)'),
+        ),
+    ]
@@ -3,3 +3,210 @@ from django.utils import timezone
 from decimal import Decimal
 
 # Create your models here.
+
+
+class IndiceJEBR(models.Model):
+    """Valor mensal do índice JEBR usado na atualização monetária"""
+    
+    # Tabela criada antes de DEFAULT_AUTO_FIELD = BigAutoField (migração 0001)
+    id = models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')
+    data_referencia = models.DateField(unique=True, help_text='Data de referência do índice JEBR')
+    valor_indice = models.DecimalField(max_digits=20, decimal_places=10, help_text='Valor do índice JEBR com alta precisão')
+    variacao_mensal = models.DecimalField(max_digits=10, decimal_places=6, blank=True, null=True, help_text='Variação percentual em relação ao mês anterior')
+    variacao_anual = models.DecimalField(max_digits=10, decimal_places=6, blank=True, null=True, help_text='Variação percentual em relação ao mesmo mês do ano anterior')
+    fator_acumulado = models.DecimalField(max_digits=20, decimal_places=10, blank=True, null=True, help_text='Fator acumulado desde a data base (útil para cálculos)')
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+    data_importacao = models.DateTimeField(blank=True, null=True, help_text='Data da última importação deste registro')
+    ativo = models.BooleanField(default=True, help_text='Registro ativo')
+    oficial = models.BooleanField(default=True, help_text='Se é um valor oficial (True) ou estimado (False)')
+    
+    class Meta:
+        db_table = 'indice_jebr'
+        verbose_name = 'Índice JEBR'
+        verbose_name_plural = 'Índices JEBR'
+        ordering = ['-data_referencia']
+        indexes = [
+            models.Index(fields=['data_referencia']),
+            models.Index(fields=['-data_referencia']),
+            models.Index(fields=['data_importacao']),
+        ]
+    
+    def __str__(self):
+        return f"JEBR {self.data_referencia.strftime('%m/%Y')}: {self.valor_indice}"
+
+
+class ImportacaoJEBR(models.Model):
+    """Registro de cada importação da planilha JEBR"""
+    
+    # Tabela criada antes de DEFAULT_AUTO_FIELD = BigAutoField (migração 0001)
+    id = models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')
+    data_importacao = models.DateTimeField(auto_now_add=True)
+    arquivo_fonte = models.CharField(max_length=500, help_text='Nome do arquivo Excel importado')
+    url_fonte = models.URLField(default='https://gilbertomelo.com.br/fam/jebr_n_xls.php', blank=True, null=True)
+    registros_processados = models.PositiveIntegerField(default=0)
+    registros_criados = models.PositiveIntegerField(default=0)
+    registros_atualizados = models.PositiveIntegerField(default=0)
+    registros_erro = models.PositiveIntegerField(default=0)
+    registros_ignorados = models.PositiveIntegerField(default=0)
+    data_inicial_importada = models.DateField(blank=True, null=True)
+    data_final_importada = models.DateField(blank=True, null=True)
+    sucesso = models.BooleanField(default=False)
+    mensagem_erro = models.TextField(blank=True, null=True)
+    tempo_execucao = models.DurationField(blank=True, null=True)
+    detalhes_importacao = models.JSONField(blank=True, null=True, help_text='Detalhes técnicos da importação')
+    
+    class Meta:
+        db_table = 'importacao_jebr'
+        verbose_name = 'Importação JEBR'
+        verbose_name_plural = 'Importações JEBR'
+        ordering = ['-data_importacao']
+    
+    def __str__(self):
+        situacao = 'sucesso' if self.sucesso else 'falha'
+        return f"Importação JEBR #{self.pk} ({situacao})"
+
+
+class CalculoJob(models.Model):
+    """Cálculo executado em segundo plano pela fila local de tarefas"""
+    
+    TIPO_VENCIMENTO = 'vencimento'
+    TIPO_LOTE = 'lote'
+    TIPO_CHOICES = [
+        (TIPO_VENCIMENTO, 'Vencimento'),
+        (TIPO_LOTE, 'Lote de vencimentos'),
+    ]
+    
+    STATUS_PENDENTE = 'pendente'
+    STATUS_EXECUTANDO = 'executando'
+    STATUS_CONCLUIDO = 'concluido'
+    STATUS_ERRO = 'erro'
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, 'Pendente'),
+        (STATUS_EXECUTANDO, 'Executando'),
+        (STATUS_CONCLUIDO, 'Concluído'),
+        (STATUS_ERRO, 'Erro'),
+    ]
+    STATUS_ATIVOS = (STATUS_PENDENTE, STATUS_EXECUTANDO)
+    
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    chave = models.CharField(max_length=64, help_text='Hash dos parâmetros, usado para deduplicação')
+    parametros = models.JSONField(help_text='Parâmetros do cálculo')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    progresso_atual = models.PositiveIntegerField(default=0)
+    progresso_total = models.PositiveIntegerField(default=0)
+    resultado = models.JSONField(blank=True, null=True)
+    mensagem_erro = models.TextField(blank=True, null=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio_execucao = models.DateTimeField(blank=True, null=True)
+    data_conclusao = models.DateTimeField(blank=True, null=True)
+    atualizado_em = models.DateTimeField(default=timezone.now, help_text='Última atividade do worker (heartbeat)')
+    
+    class Meta:
+        db_table = 'calculo_job'
+        verbose_name = 'Tarefa de Cálculo'
+        verbose_name_plural = 'Tarefas de Cálculo'
+        ordering = ['-data_criacao']
+        indexes = [
+            models.Index(fields=['status', 'data_criacao']),
+            models.Index(fields=['chave']),
+        ]
+        constraints = [
+            # Only one active job per set of parameters
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=models.Q(status__in=['pendente', 'executando']),
+                name='calculo_job_chave_ativa_unica'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def percentual(self):
+        if not self.progresso_total:
+            return 100.0 if self.status == self.STATUS_CONCLUIDO else 0.0
+        return round(100.0 * self.progresso_atual / self.progresso_total, 1)
+
+
+class Servidor(models.Model):
+    """Servidor consultado na API de Fichas Financeiras"""
+    
+    matricula = models.CharField(max_length=20, unique=True)
+    nome = models.CharField(max_length=255, blank=True, default='')
+    dados = models.JSONField(blank=True, null=True, help_text='Dados do servidor retornados pela API, sem as fichas')
+    data_sincronizacao = models.DateTimeField(help_text='Última vez que as fichas foram obtidas da API')
+    
+    class Meta:
+        db_table = 'servidor'
+        verbose_name = 'Servidor'
+        verbose_name_plural = 'Servidores'
+        ordering = ['matricula']
+    
+    def __str__(self):
+        return f"{self.matricula} - {self.nome}"
+
+
+class FichaFinanceira(models.Model):
+    """Ficha financeira anual de um servidor"""
+    
+    servidor = models.ForeignKey(Servidor, on_delete=models.CASCADE, related_name='fichas')
+    ano = models.PositiveSmallIntegerField()
+    hash_conteudo = models.CharField(max_length=64, help_text='Hash dos itens, evita regravar fichas inalteradas')
+    data_atualizacao = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ficha_financeira'
+        verbose_name = 'Ficha Financeira'
+        verbose_name_plural = 'Fichas Financeiras'
+        ordering = ['servidor', 'ano']
+        constraints = [
+            models.UniqueConstraint(fields=['servidor', 'ano'], name='ficha_financeira_servidor_ano_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.servidor.matricula} - {self.ano}"
+
+
+class FichaFinanceiraItem(models.Model):
+    """Verba de uma ficha financeira, com os valores de cada mês"""
+    
+    MESES = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+    
+    ficha = models.ForeignKey(FichaFinanceira, on_delete=models.CASCADE, related_name='itens')
+    # Matrícula e ano repetidos do servidor/ficha para o índice composto
+    matricula = models.CharField(max_length=20)
+    ano = models.PositiveSmallIntegerField()
+    ordem = models.PositiveIntegerField(help_text='Posição do item na ficha retornada pela API')
+    cod_verba = models.IntegerField(blank=True, null=True)
+    nome_verba = models.CharField(max_length=255, blank=True, default='')
+    jan = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    fev = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    mar = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    abr = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    mai = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    jun = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    jul = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    ago = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    set = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    out = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    nov = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    dez = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    dec_terceiro = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    
+    class Meta:
+        db_table = 'ficha_financeira_item'
+        verbose_name = 'Item de Ficha Financeira'
+        verbose_name_plural = 'Itens de Fichas Financeiras'
+        ordering = ['matricula', 'ano', 'ordem']
+        indexes = [
+            models.Index(fields=['matricula', 'ano', 'cod_verba'], name='ficha_item_mat_ano_verba_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['ficha', 'ordem'], name='ficha_financeira_item_ordem_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.matricula} - {self.ano} - {self.cod_verba} {self.nome_verba}"
@@ -0,0 +1,178 @@
+"""
+Structured, non-blocking logging.
+
+Application code logs through the standard logging module. settings.LOGGING
+routes the records to QueueLogHandler, which only puts them on a bounded
+queue: a QueueListener thread formats them as JSON lines and writes them, so
+request threads never wait on (or serialize behind) stdout or a log file.
+
+On the way the records get:
+
+    request_id   RequestIdFilter, from the context of the request or job
+                 (RequestIdMiddleware sets it from X-Request-ID or a new id)
+    sampling     SamplingFilter keeps 1 in N records of each high-volume
+                 message (DEBUG/INFO); warnings and errors always pass
+    redaction    JsonFormatter masks tokens, passwords and CPFs in the message
+                 and in structured fields (logger.info(..., extra={...}))
+"""
+
+import atexit
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+_request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
+SENSITIVE_FIELDS = frozenset({'token', 'password', 'senha', 'cpf', 'authorization', 'x-auth-token', 'x_auth_token'})
+REDACTED = '[REDACTED]'
+
+_SENSITIVE_VALUE = re.compile(
+    r'(?i)\b(token|password|senha|x-auth-token|authorization)'
+    r'(["\']?\s*[:=]\s*["\']?(?:(?:bearer|basic|token)\s+)?)([^\s"\',}]+)'
+)
+_CPF = re.compile(r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b')
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def set_request_id(request_id: Optional[str] = None):
+    """
+    Set the request id of the current context (a new one when not given or
+    not a safe header value); returns the token for reset_request_id
+    """
+    if not request_id or not _REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def redact(text: str) -> str:
+    """Mask credentials and CPFs in free text"""
+    return _CPF.sub('***.***.***-**', _SENSITIVE_VALUE.sub(rf'\1\2{REDACTED}', text))
+
+
+def _redact_value(key: str, value: Any) -> Any:
+    if key.lower() in SENSITIVE_FIELDS:
+        return REDACTED
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return {k: _redact_value(str(k), v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact_value('', item) for item in value]
+    return value
+
+
+class RequestIdFilter(logging.Filter):
+    """Add record.request_id (or '-') from the current request or job context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            record.request_id = _request_id.get() or '-'
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep one in `every` records of each message template at or below
+    `max_level`; the count of dropped records is attached to the next one kept.
+    """
+
+    def __init__(self, every: int = 10, max_level: str = 'INFO', name: str = ''):
+        super().__init__(name)
+        self.every = max(int(every), 1)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self._counts: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > self.max_level:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        if count:
+            record.sampled = {'every': self.every, 'dropped': self.every - 1}
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request id, message, extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': redact(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = _redact_value(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Hand records to a background QueueListener that writes JSON lines to
+    `filename` (or `stream`, stderr by default). When the queue is full the
+    record is dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, filename: Optional[str] = None, stream: Any = None, maxsize: int = 10000,
+                 formatter: Optional[logging.Formatter] = None):
+        super().__init__(queue.Queue(maxsize))
+        if filename:
+            target = logging.FileHandler(filename, encoding='utf-8')
+        else:
+            target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(formatter or JsonFormatter())
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the arguments into the message and render the traceback now (the
+        objects may change before the listener runs), keeping the extra fields
+        for the JSON formatter.
+        """
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
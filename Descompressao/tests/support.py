@@ -0,0 +1,105 @@
+"""
+Shared fixtures of the Descompressao tests.
+
+The Fichas API is the offline stand-in of fichas_fake, started on a free port
+by the first test module that needs it (start_fake_api in setUpModule) and
+stopped after the last one, and api_config points at it while it runs. Every
+test of FichasFakeMixin gets its own token manager and response cache in place
+of the process-wide ones, so request counts are not affected by other tests or
+by a shared cache configured on a development server.
+"""
+
+import base64
+import json
+import os
+import sys
+import threading
+from datetime import date
+from unittest import mock
+
+# Add utils directory to path for import
+current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+utils_dir = os.path.join(current_dir, 'utils')
+if utils_dir not in sys.path:
+    sys.path.insert(0, utils_dir)
+
+import fichas_api
+from fichas_api import _solicitar_token
+from fichas_api_config import api_config
+from fichas_auth import FichasTokenManager
+from fichas_cache import FichasCache, MemoryLRUCache
+from fichas_fake import ConfiguracaoFake, iniciar_em_thread
+from services import VencimentoServiceFixed
+
+MATRICULA = '00123456-01'
+ANO_ATUAL = date.today().year
+ANOS_CARREIRA = 5
+# Last complete year: the forms reject periods that end in the future
+DATA_INICIO = date(ANO_ATUAL - 2, 1, 1)
+DATA_FIM = date(ANO_ATUAL - 1, 12, 31)
+
+fake = None
+_config_patch = None
+_users = 0
+_lock = threading.Lock()
+
+
+def start_fake_api():
+    """Start the fake API (once for every module using it) and point api_config at it"""
+    global fake, _config_patch, _users
+    with _lock:
+        _users += 1
+        if fake is not None:
+            return
+        fake = iniciar_em_thread(configuracao=ConfiguracaoFake(anos=ANOS_CARREIRA, verbas_por_ano=20))
+        host, porta = fake.server_address[:2]
+        _config_patch = mock.patch.dict(api_config, {
+            'host': f'{host}:{porta}',
+            'scheme': 'http',
+            'email': 'teste@local',
+            'password': 'teste',
+            'busca_matricula_campo_ano': 'ano',
+            'max_retries': 0,
+        })
+        _config_patch.start()
+
+
+def stop_fake_api():
+    global fake, _config_patch, _users
+    with _lock:
+        _users -= 1
+        if _users or fake is None:
+            return
+        _config_patch.stop()
+        fake.shutdown()
+        fake.server_close()
+        fake = _config_patch = None
+
+
+def requisicoes(caminho='/servidor/busca/matricula'):
+    """Requests the fake API has answered on `caminho` so far"""
+    return fake.estatisticas().get(f'requisicoes {caminho}', 0)
+
+
+def token_jwt(expira_em: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': expira_em}).encode()).decode().rstrip('=')
+    return f"cabecalho.{payload}.assinatura"
+
+
+class FichasFakeMixin:
+    """Fresh token manager and response cache for the managers built inside services and views"""
+
+    def setUp(self):
+        super().setUp()
+        self.fake = fake
+        fake.configuracao.latencia_ms = 0
+        fake.configuracao.taxa_401 = 0
+        fake.configuracao.taxa_erro = 0
+        self.token_manager = FichasTokenManager(_solicitar_token)
+        self.cache = FichasCache(MemoryLRUCache())
+        patcher = mock.patch.multiple(fichas_api, shared_token_manager=self.token_manager, shared_cache=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def service(self, store=None):
+        return VencimentoServiceFixed(store=store)
@@ -0,0 +1,90 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from Descompressao.archive import DeferredArchiveWriter, FileSystemArchive, NullArchive
+
+
+def documento(consulta_id, payload, dia='2025-09-10'):
+    return {
+        'consulta_id': consulta_id,
+        'consultation_info': {'matricula': '00123456-01', 'timestamp': f'{dia} 10:00:00'},
+        'vencimento_records': [{'year': 2024, 'month': 1, 'valor': 10.5}],
+        'professor_complete_data': payload,
+    }
+
+
+class FileSystemArchiveTests(SimpleTestCase):
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        self.archive = FileSystemArchive(DIRECTORY=self.pasta, RETENTION_DAYS=30, MAX_BYTES=None)
+
+    def payloads(self):
+        return sorted((self.pasta / 'payloads').rglob('*.json.gz'))
+
+    def test_payloads_are_stored_once_per_content(self):
+        servidor = {'SERVIDOR_NOME': 'Fulano', 'fichasFinanceiras': [{'ano': 2024}]}
+        primeiro = self.archive.store(documento('a', servidor))
+        segundo = self.archive.store(documento('b', dict(servidor)))
+        terceiro = self.archive.store(documento('c', {**servidor, 'SERVIDOR_NOME': 'Beltrano'}))
+
+        self.assertEqual(primeiro['payload_sha256'], segundo['payload_sha256'])
+        self.assertNotEqual(primeiro['payload_sha256'], terceiro['payload_sha256'])
+        self.assertEqual(len(self.payloads()), 2)
+        with gzip.open(self.payloads()[0]) as arquivo:
+            self.assertIn(json.loads(arquivo.read()), [servidor, {**servidor, 'SERVIDOR_NOME': 'Beltrano'}])
+
+        # One compact line per consultation, in the daily log, without the payload itself
+        with gzip.open(primeiro['path']) as arquivo:
+            linhas = [json.loads(linha) for linha in arquivo.read().splitlines()]
+        self.assertEqual([linha['consulta_id'] for linha in linhas], ['a', 'b', 'c'])
+        self.assertTrue(all('professor_complete_data' not in linha for linha in linhas))
+        self.assertEqual(linhas[1]['payload_sha256'], primeiro['payload_sha256'])
+        self.assertTrue(primeiro['path'].endswith('consultas/2025-09-10.jsonl.gz'))
+
+    def test_retention_removes_old_files_and_keeps_rearchived_payloads(self):
+        self.archive.store(documento('antigo', {'servidor': 1}, dia='2025-01-01'))
+        self.archive.store(documento('reusado', {'servidor': 2}, dia='2025-01-01'))
+        antigo = time.time() - 40 * 86400
+        for caminho in self.pasta.rglob('*.gz'):
+            os.utime(caminho, (antigo, antigo))
+        # Archiving the same payload again refreshes its age
+        self.archive.store(documento('novo', {'servidor': 2}, dia='2025-02-15'))
+
+        self.assertEqual(self.archive.enforce_retention(), 2)
+        restantes = sorted(str(caminho.relative_to(self.pasta)) for caminho in self.pasta.rglob('*.gz'))
+        self.assertEqual(len(restantes), 2)
+        self.assertIn('consultas/2025-02-15.jsonl.gz', restantes)
+        self.assertEqual(len(self.payloads()), 1)
+
+    def test_size_cap_removes_the_oldest_files_first(self):
+        archive = FileSystemArchive(DIRECTORY=self.pasta, COMPRESSION=None, RETENTION_DAYS=None, MAX_BYTES=600)
+        for indice in range(4):
+            info = archive.store(documento(f'c{indice}', {'dados': str(indice) * 200}, dia=f'2025-01-0{indice + 1}'))
+            digest = info['payload_sha256']
+            instante = time.time() - (4 - indice) * 60
+            for caminho in (info['path'], self.pasta / 'payloads' / digest[:2] / f'{digest}.json'):
+                os.utime(caminho, (instante, instante))
+
+        self.assertGreater(archive.enforce_retention(), 0)
+        arquivos = [caminho for caminho in self.pasta.rglob('*') if caminho.is_file()]
+        self.assertLessEqual(sum(caminho.stat().st_size for caminho in arquivos), 600)
+        self.assertIn(self.pasta / 'consultas' / '2025-01-04.jsonl', arquivos)
+        self.assertNotIn(self.pasta / 'consultas' / '2025-01-01.jsonl', arquivos)
+
+    def test_deferred_writer_and_null_archive(self):
+        escritor = DeferredArchiveWriter(self.archive)
+        for indice in range(5):
+            escritor.submit(documento(f'd{indice}', {'servidor': indice}))
+        escritor.flush()
+        self.assertEqual(len(self.payloads()), 5)
+
+        self.assertEqual(NullArchive().store(documento('x', {})), {'consulta_id': 'x', 'stored': False})
@@ -0,0 +1,46 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from Descompressao import benchmarks
+
+HISTORIA = ['c' * 40, 'b' * 40, 'a' * 40]
+
+
+class LatestBaselineTests(SimpleTestCase):
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        patcher = mock.patch.object(benchmarks, '_ancestors', return_value=HISTORIA)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def guardar(self, commit):
+        caminho = self.pasta / f'{commit}.json'
+        caminho.write_text(json.dumps({'commit': commit, 'results': {}}), encoding='utf-8')
+        return caminho
+
+    def test_nearest_ancestor_wins_over_the_newest_file(self):
+        mais_antigo = self.guardar('aaaaaaa')
+        proximo = self.guardar('bbbbbbb')
+        # Written last, but not in the history of HEAD
+        self.guardar('ddddddd')
+        self.guardar('bbbbbbb-dirty')
+        self.assertEqual(benchmarks.latest_baseline('ccccccc', self.pasta), proximo)
+        proximo.unlink()
+        self.assertEqual(benchmarks.latest_baseline('ccccccc', self.pasta), mais_antigo)
+
+    def test_dirty_run_compares_with_its_own_commit(self):
+        head = self.guardar('ccccccc')
+        self.assertEqual(benchmarks.latest_baseline('ccccccc-dirty', self.pasta), head)
+        self.assertIsNone(benchmarks.latest_baseline('ccccccc', self.pasta))
+
+    def test_no_baseline_outside_git(self):
+        self.guardar('aaaaaaa')
+        with mock.patch.object(benchmarks, '_ancestors', return_value=[]):
+            self.assertIsNone(benchmarks.latest_baseline('ccccccc', self.pasta))
@@ -0,0 +1,86 @@
+from datetime import date
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from . import support  # noqa: F401
+from calculo_descompressao import calcular_descompressao, conferir_planilha, get_tabelas, mes_numero, montar_entradas
+from fichas_table import FichasTable
+
+NOV_2003, DEZ_2003, JAN_2004 = (mes_numero(date(2003, 11, 1)), mes_numero(date(2003, 12, 1)),
+                                mes_numero(date(2004, 1, 1)))
+
+
+def ficha(ano, codigo, valores):
+    return {
+        'FICHA_FINANCEIRA_ANO_REFERENCIA': ano,
+        'fichasFinanceirasItens': [{
+            'FICHA_FINANCEIRA_ITEM_COD_VERBA': codigo,
+            'FICHA_FINANCEIRA_ITEM_NOME_VERBA': '',
+            **{f'FICHA_FINANCEIRA_ITEM_{mes}': valores.get(mes, 0.0) for mes in (
+                'JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ'
+            )},
+        }],
+    }
+
+
+class PlanilhaDescompressaoTests(SimpleTestCase):
+
+    def test_engine_matches_every_formula_cell_of_the_workbook(self):
+        conferencia = conferir_planilha()
+        self.assertGreater(conferencia['celulas_conferidas'], 0)
+        self.assertEqual(conferencia['divergencias'], [])
+
+    def test_venc_devido_is_the_correct_table_at_the_paid_level(self):
+        # EvolSalarial: Ref 3 of 11/2003 is 243.08 and Ref 4 of 12/2003 is 245.52;
+        # 250.00 in 01/2004 is no reference. EvolSalarialCorreta from Ref 1 = 240:
+        # Ref 3 = 264.60 and Ref 4 = 277.83
+        table = FichasTable.from_fichas([
+            ficha(2003, 101, {'NOV': 243.08, 'DEZ': 245.52}),
+            ficha(2003, 150, {'NOV': 60.77}),
+            ficha(2004, 101, {'JAN': 250.0}),
+        ])
+        meses, entradas, niveis = montar_entradas(table, date(2003, 11, 1), date(2004, 1, 31), *get_tabelas())
+        self.assertEqual(meses.tolist(), [NOV_2003, DEZ_2003, JAN_2004])
+        self.assertEqual(niveis.tolist(), [3, 4, 0])
+        np.testing.assert_allclose(entradas['venc_pago'], [243.08, 245.52, 250.0])
+        np.testing.assert_allclose(entradas['venc_devido'], [264.6, 277.83, 250.0])
+        np.testing.assert_allclose(entradas['gam_pago'], [60.77, 0.0, 0.0])
+
+    def test_fixed_case_with_nonzero_inputs(self):
+        # Inputs of rows 10 to 12 of ModeloDescNovo (C, D, G, J, L, N, P, S, U) and the
+        # values of their formula cells evaluated from the workbook formulas, J2 = 5%
+        entradas = {
+            'venc_pago': [243.08, 245.52, 250.0],
+            'venc_devido': [264.6, 277.83, 250.0],
+            'gam_pago': [60.77, 0.0, 50.0],
+            'titulacao_pct': [0.1, 0.1, 0.1],
+            'gcet_pct': [0.2, 0.0, 0.2],
+            'adic_pct': [0.05, 0.1, 0.05],
+            'ferias_pct': [1 / 3, 0.5, 1 / 3],
+            'indice': [1.5, 1.4, 1.3],
+            'juros_pct': [12.0, 10.0, 8.0],
+        }
+        esperado = {
+            'venc_diferenca': [21.52, 32.31, 0.0],                  # E = D - C
+            'gam_pct': [0.25, 0.0, 0.2],                            # F = IFERROR(G / C, 0)
+            'gam_devido': [66.15, 0.0, 50.0],                       # H = D * F
+            'gam_diferenca': [5.38, 0.0, 0.0],                      # I = H - G
+            'titulacao_diferenca': [2.152, 3.231, 0.0],             # K = E * J
+            'gcet_diferenca': [4.304, 0.0, 0.0],                    # M = E * L
+            'adic_diferenca': [1.076, 3.231, 0.0],                  # O = E * N
+            'ferias_diferenca': [21.52 / 3, 32.31, 0.0],            # Q = IF(MONTH(A) = 12, E + I, E * P)
+            'diferenca_total': [41.605333333, 71.082, 0.0],         # R
+            'valor_corrigido': [62.408, 99.5148, 0.0],              # T = R * S
+            'juros': [7.48896, 9.95148, 0.0],                       # V = T * U / 100
+            'principal_juros': [69.89696, 109.46628, 0.0],          # W = T + V
+        }
+        resultado = calcular_descompressao(np.array([NOV_2003, DEZ_2003, JAN_2004]), entradas)
+        for nome, valores in esperado.items():
+            with self.subTest(coluna=nome):
+                np.testing.assert_allclose(resultado.colunas[nome], valores, rtol=0, atol=1e-6)
+        self.assertAlmostEqual(resultado.total_corrigido, 161.9228, places=6)      # T92
+        self.assertAlmostEqual(resultado.total_juros, 17.44044, places=6)          # V92
+        self.assertAlmostEqual(resultado.total_atualizado, 179.36324, places=6)    # W92
+        self.assertAlmostEqual(resultado.honorarios, 8.968162, places=6)           # W93
+        self.assertAlmostEqual(resultado.total_devido, 188.331402, places=6)       # W94
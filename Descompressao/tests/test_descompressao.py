@@ -0,0 +1,71 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from Descompressao import jebr
+from Descompressao.models import IndiceJEBR
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, start_fake_api, stop_fake_api
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class DescompressaoTests(FichasFakeMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        jebr.invalidar_fatores()
+        self.addCleanup(jebr.invalidar_fatores)
+
+    def importar(self, inicio: date, quantidade: int):
+        IndiceJEBR.objects.bulk_create([
+            IndiceJEBR(
+                data_referencia=date(inicio.year + (inicio.month - 1 + i) // 12, (inicio.month - 1 + i) % 12 + 1, 1),
+                valor_indice=Decimal(100 + i)
+            )
+            for i in range(quantidade)
+        ])
+        jebr.recalcular_fatores()
+
+    def test_correction_index_comes_from_the_jebr_factors(self):
+        service = self.service()
+        sem_indice = service.calculate_descompressao_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertTrue(sem_indice['success'])
+        self.assertIsNone(sem_indice['metadata']['atualizado_ate'])
+        self.assertTrue(all(registro['indice'] == 1.0 for registro in sem_indice['data']))
+        self.assertEqual(len(sem_indice['metadata']['meses_sem_indice']), 24)
+        self.assertIn('24 meses sem índice JEBR', sem_indice['message'])
+
+        inicio = date(DATA_INICIO.year, 1, 1)
+        self.importar(inicio, 36)
+        corrigido = service.calculate_descompressao_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertEqual(corrigido['metadata']['atualizado_ate'], f'12/{inicio.year + 2}')
+        self.assertEqual(corrigido['metadata']['meses_sem_indice'], [])
+        self.assertAlmostEqual(corrigido['data'][0]['indice'], 135 / 100)
+        self.assertAlmostEqual(corrigido['data'][-1]['indice'], 135 / 123)
+
+    def test_months_without_index_are_corrected_one_by_one_and_flagged(self):
+        # The series starts three months after the period
+        self.importar(date(DATA_INICIO.year, 4, 1), 33)
+        resultado = self.service().calculate_descompressao_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertTrue(resultado['success'])
+        self.assertEqual(resultado['metadata']['meses_sem_indice'],
+                         [f'{mes:02d}/{DATA_INICIO.year}' for mes in (1, 2, 3)])
+        self.assertIn('3 meses sem índice JEBR', resultado['message'])
+        self.assertEqual([registro['indice'] for registro in resultado['data'][:3]], [1.0, 1.0, 1.0])
+        self.assertAlmostEqual(resultado['data'][3]['indice'], 132 / 100)
+        self.assertAlmostEqual(resultado['data'][-1]['indice'], 132 / 120)
+
+    def test_explicit_indices_are_not_flagged(self):
+        resultado = self.service().calculate_descompressao_data(
+            MATRICULA, DATA_INICIO, DATA_FIM, indices=[1.5] * 24
+        )
+        self.assertTrue(resultado['success'])
+        self.assertEqual(resultado['metadata']['meses_sem_indice'], [])
+        self.assertTrue(all(registro['indice'] == 1.5 for registro in resultado['data']))
@@ -0,0 +1,67 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from .support import (
+    DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api
+)
+from fichas_api import FichasAPI_Manager
+from fichas_async import FichasAPIAsync
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class FichasAPIAsyncTests(FichasFakeMixin, SimpleTestCase):
+
+    def api(self, **opcoes):
+        return FichasAPIAsync(token_manager=self.token_manager, cache=self.cache, **opcoes)
+
+    async def test_401_logs_in_again_and_retries_once(self):
+        await asyncio.to_thread(self.token_manager.get_token)
+        self.fake.revogar_tokens()
+        buscas = requisicoes()
+        async with self.api() as api:
+            self.assertIsNotNone(await api.busca_matricula(MATRICULA))
+        self.assertEqual(requisicoes() - buscas, 2)
+        self.assertEqual(self.token_manager.logins, 2)
+
+    async def test_second_401_is_not_retried(self):
+        self.fake.configuracao.taxa_401 = 1.0
+        buscas = requisicoes()
+        with self.assertLogs('fichas_async', 'ERROR'):
+            async with self.api() as api:
+                self.assertIsNone(await api.busca_matricula(MATRICULA))
+        self.assertEqual(requisicoes() - buscas, 2)
+
+    async def test_concurrent_identical_lookups_share_one_request(self):
+        self.fake.configuracao.latencia_ms = 200
+        buscas = requisicoes()
+        async with self.api() as api:
+            resultados = await asyncio.gather(*(api.busca_matricula(MATRICULA) for _ in range(6)))
+        self.assertEqual(requisicoes() - buscas, 1)
+        self.assertTrue(all(resultado is resultados[0] for resultado in resultados))
+        self.assertEqual(self.cache.stats()['coalesced'], 5)
+
+    async def test_batch_lookup_is_bounded_and_deduplicated(self):
+        self.fake.configuracao.latencia_ms = 50
+        matriculas = [f'0012345{indice}-01' for indice in range(4)]
+        buscas = requisicoes()
+        async with self.api(max_concurrency=2) as api:
+            resultados = await api.busca_matriculas(matriculas + matriculas[:2])
+        self.assertEqual(list(resultados), matriculas)
+        self.assertTrue(all(resultado['servidor'] for resultado in resultados.values()))
+        self.assertEqual(requisicoes() - buscas, 4)
+
+    async def test_year_lookup_matches_the_sync_client(self):
+        anos = range(DATA_INICIO.year, DATA_FIM.year + 1)
+        async with self.api() as api:
+            assincrono = await api.busca_matricula_anos(MATRICULA, anos)
+        self.cache.clear()
+        sincrono = await asyncio.to_thread(FichasAPI_Manager().busca_matricula_anos, MATRICULA, anos)
+        self.assertEqual(assincrono, sincrono)
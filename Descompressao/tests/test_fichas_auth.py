@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from .support import (
+    MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api, token_jwt
+)
+from fichas_api import FichasAPI_Manager
+from fichas_auth import FichasTokenManager
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class TokenTests(FichasFakeMixin, SimpleTestCase):
+
+    def test_token_is_reused_across_lookups(self):
+        logins = requisicoes('/login')
+        manager = FichasAPI_Manager()
+        self.assertIsNotNone(manager.busca_matricula(MATRICULA))
+        self.assertIsNotNone(manager.busca_cpf('12345678901'))
+        self.assertIsNotNone(FichasAPI_Manager().busca_matricula('00123456-02'))
+        self.assertEqual(requisicoes('/login') - logins, 1)
+        self.assertEqual(self.token_manager.logins, 1)
+
+    def test_token_is_renewed_when_it_expires(self):
+        tokens = iter([token_jwt(time.time() + 10), token_jwt(time.time() + 3600)])
+        manager = FichasTokenManager(lambda: next(tokens), refresh_margin=60)
+        primeiro = manager.get_token()
+        segundo = manager.get_token()
+        self.assertNotEqual(primeiro, segundo)
+        self.assertEqual(manager.get_token(), segundo)
+        self.assertEqual(manager.logins, 2)
+
+    def test_concurrent_callers_share_one_login(self):
+        liberar = threading.Event()
+
+        def login():
+            liberar.wait(5)
+            return token_jwt(time.time() + 3600)
+
+        manager = FichasTokenManager(login)
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        liberar.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(manager.logins, 1)
+        self.assertEqual(len(set(tokens)), 1)
+
+    def test_401_logs_in_again_and_retries_once(self):
+        manager = FichasAPI_Manager()
+        manager.get_auth_token()
+        self.fake.revogar_tokens()
+        buscas = requisicoes()
+        self.assertIsNotNone(manager.busca_matricula(MATRICULA))
+        self.assertEqual(requisicoes() - buscas, 2)
+        self.assertEqual(self.token_manager.logins, 2)
+
+    def test_second_401_is_not_retried(self):
+        self.fake.configuracao.taxa_401 = 1.0
+        buscas = requisicoes()
+        with self.assertLogs('fichas_api', 'ERROR'):
+            self.assertIsNone(FichasAPI_Manager().busca_matricula(MATRICULA))
+        self.assertEqual(requisicoes() - buscas, 2)
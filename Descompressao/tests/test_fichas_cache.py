@@ -0,0 +1,209 @@
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from .support import (
+    ANO_ATUAL, DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api
+)
+from fichas_api import FichasAPI_Manager
+from fichas_cache import DjangoCacheBackend, FichasCache, FileCacheBackend, MemoryLRUCache, build_backend
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class FichasCacheTests(FichasFakeMixin, SimpleTestCase):
+
+    def test_cached_response_is_served_until_invalidated(self):
+        manager = FichasAPI_Manager()
+        buscas = requisicoes()
+        primeiro = manager.busca_matricula(MATRICULA)
+        self.assertIs(manager.busca_matricula(MATRICULA), primeiro)
+        self.assertEqual(requisicoes() - buscas, 1)
+        manager.invalidar_cache(matricula=MATRICULA)
+        manager.busca_matricula(MATRICULA)
+        self.assertEqual(requisicoes() - buscas, 2)
+
+    def test_invalidation_covers_the_year_and_verba_lookups(self):
+        manager = FichasAPI_Manager()
+        anos = range(DATA_INICIO.year, DATA_FIM.year + 1)
+        manager.busca_matricula_anos(MATRICULA, anos)
+        manager.busca_matricula_anos(MATRICULA, anos, verbas=[1])
+        outro = manager.busca_matricula_anos('00123456-02', anos)
+        buscas = requisicoes()
+        manager.busca_matricula_anos(MATRICULA, anos)
+        self.assertEqual(requisicoes(), buscas)
+
+        manager.invalidar_cache(matricula=MATRICULA)
+        manager.busca_matricula_anos(MATRICULA, anos)
+        manager.busca_matricula_anos(MATRICULA, anos, verbas=[1])
+        # One request per year, for each of the two lookups
+        self.assertEqual(requisicoes() - buscas, 2 * len(anos))
+        # Other matrículas keep their entries
+        self.assertIs(manager.busca_matricula_anos('00123456-02', anos)['servidor']['fichasFinanceiras'][0],
+                      outro['servidor']['fichasFinanceiras'][0])
+
+    def test_waiters_receive_the_error_of_the_shared_fetch(self):
+        cache = FichasCache(None)
+        liberar = threading.Event()
+        chamadas = []
+
+        def falha():
+            chamadas.append(1)
+            liberar.wait(5)
+            raise RuntimeError('API fora do ar')
+
+        erros = []
+
+        def consultar():
+            try:
+                cache.get_or_fetch('chave', falha)
+            except RuntimeError as erro:
+                erros.append(erro)
+
+        threads = [threading.Thread(target=consultar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while cache.coalesced < 3:
+            time.sleep(0.01)
+        liberar.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(len(erros), 4)
+
+    async def test_blocking_backends_are_called_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        chamadas = []
+
+        class BackendLento(MemoryLRUCache):
+            blocking = True
+
+            def get(self, key):
+                chamadas.append(threading.get_ident())
+                return super().get(key)
+
+            def set(self, key, value, ttl):
+                chamadas.append(threading.get_ident())
+                super().set(key, value, ttl)
+
+        cache = FichasCache(BackendLento())
+
+        async def fetch():
+            self.assertEqual(threading.get_ident(), loop_thread)
+            return {'servidor': {}}
+
+        self.assertEqual(await cache.aget_or_fetch(FichasCache.key_matricula(MATRICULA), fetch), {'servidor': {}})
+        self.assertEqual(await cache.aget_or_fetch(FichasCache.key_matricula(MATRICULA), fetch), {'servidor': {}})
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertTrue(chamadas)
+        self.assertNotIn(loop_thread, chamadas)
+
+    def test_ttl_depends_on_the_current_year(self):
+        cache = FichasCache(None, ttl_current=10, ttl_closed=1000)
+        fechado = {'servidor': {'fichasFinanceiras': [{'FICHA_FINANCEIRA_ANO_REFERENCIA': ANO_ATUAL - 1}]}}
+        aberto = {'servidor': {'fichasFinanceiras': [{'FICHA_FINANCEIRA_ANO_REFERENCIA': ANO_ATUAL}]}}
+        self.assertEqual(cache.ttl_for(fechado), 1000)
+        self.assertEqual(cache.ttl_for(aberto), 10)
+
+    def test_memory_backend_expires_and_evicts_least_recently_used(self):
+        backend = MemoryLRUCache(max_bytes=250)
+        backend.set('expirado', {'valor': 1}, ttl=-1)
+        self.assertIsNone(backend.get('expirado'))
+
+        for chave in ('a', 'b', 'c'):
+            backend.set(chave, {'dados': 'x' * 60}, ttl=60)
+        backend.get('a')
+        backend.set('d', {'dados': 'x' * 60}, ttl=60)
+        self.assertIsNone(backend.get('b'))
+        self.assertIsNotNone(backend.get('a'))
+        self.assertEqual(backend.evictions, 1)
+        self.assertLessEqual(backend.current_bytes, backend.max_bytes)
+
+
+class FileCacheBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        raiz = tempfile.TemporaryDirectory()
+        self.addCleanup(raiz.cleanup)
+        self.raiz = raiz.name
+        self.diretorio = os.path.join(self.raiz, 'fichas')
+
+    def test_default_backend_is_per_process(self):
+        self.assertIsInstance(build_backend({}), MemoryLRUCache)
+
+    def test_file_backend_defaults_to_the_user_cache_dir(self):
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.raiz}):
+            backend = build_backend({'cache_backend': 'file'})
+        self.assertEqual(backend.directory, os.path.join(self.raiz, 'htcalculus', 'fichas'))
+
+    def test_entries_are_private_json_files(self):
+        backend = FileCacheBackend(self.diretorio)
+        valor = {'servidor': {'SERVIDOR_NOME': 'José', 'fichasFinanceiras': [{'ANO': 2005}]}}
+        backend.set('matricula:1', valor, ttl=60)
+        self.assertEqual(backend.get('matricula:1'), valor)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.diretorio).st_mode), 0o700)
+        [arquivo] = os.listdir(self.diretorio)
+        caminho = os.path.join(self.diretorio, arquivo)
+        self.assertEqual(stat.S_IMODE(os.stat(caminho).st_mode), 0o600)
+        with open(caminho, encoding='utf-8') as cache_file:
+            self.assertEqual(json.load(cache_file)['value'], valor)
+
+        backend.set('expirado', {'valor': 1}, ttl=-1)
+        self.assertIsNone(backend.get('expirado'))
+
+    def test_unreadable_entries_are_misses(self):
+        backend = FileCacheBackend(self.diretorio)
+        backend.set('matricula:1', {'servidor': {}}, ttl=60)
+        with open(backend._path('matricula:1'), 'wb') as cache_file:
+            cache_file.write(b'\x80\x05\x95pickle')
+        self.assertIsNone(backend.get('matricula:1'))
+
+    def test_directory_must_be_private_to_the_user(self):
+        os.makedirs(self.diretorio, mode=0o777)
+        os.chmod(self.diretorio, 0o777)
+        FileCacheBackend(self.diretorio)
+        self.assertEqual(stat.S_IMODE(os.stat(self.diretorio).st_mode), 0o700)
+
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                FileCacheBackend(self.diretorio)
+
+
+class DjangoCacheBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def test_clear_only_drops_its_own_entries(self):
+        caches['default'].set('vencimento:relatorio:abc', '<html>')
+        backend = DjangoCacheBackend('default')
+        backend.set('matricula:1', {'servidor': {}}, ttl=60)
+        self.assertEqual(backend.get('matricula:1'), {'servidor': {}})
+
+        backend.clear()
+        self.assertIsNone(backend.get('matricula:1'))
+        self.assertIsNone(DjangoCacheBackend('default').get('matricula:1'))
+        self.assertEqual(caches['default'].get('vencimento:relatorio:abc'), '<html>')
+
+    def test_lock_is_released_only_by_its_holder(self):
+        backend = DjangoCacheBackend('default')
+        handle = backend.try_lock('matricula:1', ttl=30)
+        self.assertIsNotNone(handle)
+        self.assertIsNone(backend.try_lock('matricula:1', ttl=30))
+        backend.unlock('matricula:1', handle)
+        self.assertIsNotNone(backend.try_lock('matricula:1', ttl=30))
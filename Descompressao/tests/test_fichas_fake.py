@@ -0,0 +1,62 @@
+import json
+
+import requests
+from django.test import SimpleTestCase
+
+from .support import (
+    ANO_ATUAL, ANOS_CARREIRA, MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api
+)
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class FichasFakeTests(FichasFakeMixin, SimpleTestCase):
+
+    def login(self):
+        return requests.post(f'{self.fake.url}/login', json={'email': 'a', 'password': 'b'}).json()['token']
+
+    def busca(self, payload, token=None):
+        return requests.post(f'{self.fake.url}/servidor/busca/matricula', json=payload,
+                             headers={'X-Auth-Token': token or self.login()})
+
+    def test_servidores_are_deterministic_per_matricula(self):
+        primeiro = json.loads(self.fake.corpo_matricula(MATRICULA))['servidor']
+        self.assertEqual(self.fake.gerador.gerar(MATRICULA, anos=ANOS_CARREIRA, verbas_por_ano=20), primeiro)
+        outro = json.loads(self.fake.corpo_matricula('00123456-02'))['servidor']
+        self.assertNotEqual(outro['SERVIDOR_ID'], primeiro['SERVIDOR_ID'])
+        self.assertEqual([ficha['FICHA_FINANCEIRA_ANO_REFERENCIA'] for ficha in primeiro['fichasFinanceiras']],
+                         list(range(ANO_ATUAL, ANO_ATUAL - ANOS_CARREIRA, -1)))
+        self.assertTrue(all(len(ficha['fichasFinanceirasItens']) == 20 for ficha in primeiro['fichasFinanceiras']))
+
+    def test_year_scoped_response_matches_the_full_history(self):
+        completo = self.busca({'matricula': MATRICULA}).json()['servidor']['fichasFinanceiras']
+        for ano in (ANO_ATUAL, ANO_ATUAL - 3):
+            with self.subTest(ano=ano):
+                fichas = self.busca({'matricula': MATRICULA, 'ano': ano}).json()['servidor']['fichasFinanceiras']
+                self.assertEqual(fichas, [ficha for ficha in completo
+                                          if ficha['FICHA_FINANCEIRA_ANO_REFERENCIA'] == ano])
+
+    def test_tokens_and_unknown_servidores(self):
+        self.assertEqual(requests.post(f'{self.fake.url}/login', json={}).status_code, 401)
+        self.assertEqual(self.busca({'matricula': MATRICULA}, token='invalido').status_code, 401)
+        self.assertEqual(self.busca({'matricula': '99999999-01'}).status_code, 404)
+
+        token = self.login()
+        self.fake.revogar_tokens()
+        self.assertEqual(self.busca({'matricula': MATRICULA}, token=token).status_code, 401)
+
+    def test_error_rate_and_statistics(self):
+        self.fake.configuracao.taxa_erro = 1.0
+        buscas = requisicoes()
+        token = self.login()
+        self.assertEqual(self.busca({'matricula': MATRICULA}, token=token).status_code, 503)
+        self.assertEqual(requisicoes() - buscas, 1)
+        estatisticas = requests.get(f'{self.fake.url}/_estatisticas').json()
+        self.assertGreaterEqual(estatisticas['status 503'], 1)
+        self.assertGreater(estatisticas['bytes_enviados'], 0)
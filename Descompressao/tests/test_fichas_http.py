@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .support import MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api
+import fichas_http
+from fichas_api import FichasAPI_Manager
+from fichas_http import api_base_url, build_session, get_session, reset_session
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class SessionTests(FichasFakeMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        reset_session()
+        self.addCleanup(reset_session)
+
+    def test_one_session_per_process(self):
+        sessao = get_session()
+        self.assertIs(get_session(), sessao)
+        reset_session()
+        self.assertIsNot(get_session(), sessao)
+
+    def test_lookups_reuse_one_keep_alive_connection(self):
+        manager = FichasAPI_Manager()
+        for indice in range(3):
+            self.assertIsNotNone(manager.busca_matricula(f'0012345{indice}-01'))
+        pools = get_session().get_adapter(api_base_url()).poolmanager.pools
+        pools = [pools[chave] for chave in pools.keys()]
+        self.assertEqual(sum(pool.num_connections for pool in pools), 1)
+        self.assertEqual(sum(pool.num_requests for pool in pools), 4)  # login + 3 lookups
+
+    def test_pool_and_retry_policy_come_from_api_config(self):
+        sessao = build_session({'pool_connections': 2, 'pool_maxsize': 5, 'max_retries': 4,
+                                'retry_backoff': 0.25, 'verify_ssl': True})
+        adapter = sessao.get_adapter('https://fichas.exemplo')
+        self.assertEqual((adapter._pool_connections, adapter._pool_maxsize), (2, 5))
+        retry = adapter.max_retries
+        self.assertEqual((retry.total, retry.connect, retry.read, retry.status), (4, 4, 4, 4))
+        self.assertEqual(retry.backoff_factor, 0.25)
+        self.assertIn('POST', retry.allowed_methods)
+        self.assertEqual(set(retry.status_forcelist), set(fichas_http.RETRY_STATUS))
+        self.assertIs(sessao.verify, True)
+
+    def test_5xx_is_retried_and_4xx_is_not(self):
+        sessao = build_session({'max_retries': 2, 'retry_backoff': 0})
+        self.addCleanup(sessao.close)
+        token = sessao.post(f'{api_base_url()}/login', json={'email': 'a', 'password': 'b'}).json()['token']
+        url = f'{api_base_url()}/servidor/busca/matricula'
+
+        self.fake.configuracao.taxa_erro = 1.0
+        buscas = requisicoes()
+        resposta = sessao.post(url, json={'matricula': MATRICULA}, headers={'X-Auth-Token': token})
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(requisicoes() - buscas, 3)
+
+        self.fake.configuracao.taxa_erro = 0
+        buscas = requisicoes()
+        resposta = sessao.post(url, json={'matricula': MATRICULA}, headers={'X-Auth-Token': 'invalido'})
+        self.assertEqual(resposta.status_code, 401)
+        self.assertEqual(requisicoes() - buscas, 1)
+
+    def test_timeouts_are_passed_to_every_request(self):
+        with mock.patch.dict(fichas_http.api_config, {'connect_timeout': 2, 'read_timeout': 7}):
+            with mock.patch.object(get_session(), 'post', wraps=get_session().post) as post:
+                FichasAPI_Manager().busca_matricula(MATRICULA)
+        self.assertTrue(post.call_args_list)
+        self.assertTrue(all(chamada.kwargs['timeout'] == (2, 7) for chamada in post.call_args_list))
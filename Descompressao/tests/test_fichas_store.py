@@ -0,0 +1,89 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Descompressao.fichas_store import FichasStore
+from Descompressao.models import FichaFinanceira, FichaFinanceiraItem, Servidor
+from .support import (
+    ANO_ATUAL, ANOS_CARREIRA, DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, requisicoes, start_fake_api,
+    stop_fake_api
+)
+from fichas_api import FichasAPI_Manager
+from fichas_stream import reduzir_resposta
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class FichasStoreTests(FichasFakeMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store = FichasStore()
+        self.resposta = FichasAPI_Manager().busca_matricula(MATRICULA)
+
+    def test_ingest_and_load_round_trip(self):
+        self.store.ingest(MATRICULA, self.resposta)
+        self.assertEqual(FichaFinanceira.objects.filter(servidor__matricula=MATRICULA).count(), ANOS_CARREIRA)
+
+        carregado = self.store.load(MATRICULA, DATA_INICIO.year, DATA_FIM.year)
+        esperado = reduzir_resposta(self.resposta, anos=range(DATA_INICIO.year, DATA_FIM.year + 1))
+        self.assertEqual(
+            [ficha['FICHA_FINANCEIRA_ANO_REFERENCIA'] for ficha in carregado['servidor']['fichasFinanceiras']],
+            [ficha['FICHA_FINANCEIRA_ANO_REFERENCIA'] for ficha in esperado['servidor']['fichasFinanceiras']]
+        )
+        service = self.service()
+        self.assertEqual(
+            service._extract_vencimento_data_safe(carregado['servidor'], DATA_INICIO, DATA_FIM),
+            service._extract_vencimento_data_safe(esperado['servidor'], DATA_INICIO, DATA_FIM)
+        )
+
+    def test_unchanged_years_are_skipped_by_hash(self):
+        self.store.ingest(MATRICULA, self.resposta)
+        with CaptureQueriesContext(connection) as consultas:
+            self.store.ingest(MATRICULA, self.resposta)
+        self.assertFalse([
+            consulta['sql'] for consulta in consultas.captured_queries
+            if 'ficha_financeira_item' in consulta['sql'] and not consulta['sql'].startswith('SELECT')
+        ])
+
+        alterada = json.loads(json.dumps(self.resposta))
+        ficha = alterada['servidor']['fichasFinanceiras'][0]
+        ficha['fichasFinanceirasItens'][0]['FICHA_FINANCEIRA_ITEM_JAN'] = 1234.56
+        antes = dict(FichaFinanceira.objects.values_list('ano', 'hash_conteudo'))
+        self.store.ingest(MATRICULA, alterada)
+        depois = dict(FichaFinanceira.objects.values_list('ano', 'hash_conteudo'))
+        self.assertEqual([ano for ano in antes if antes[ano] != depois[ano]], [ficha['FICHA_FINANCEIRA_ANO_REFERENCIA']])
+        item = FichaFinanceiraItem.objects.get(
+            matricula=MATRICULA, ano=ficha['FICHA_FINANCEIRA_ANO_REFERENCIA'], ordem=0
+        )
+        self.assertEqual(item.jan, Decimal('1234.56'))
+
+    def test_stale_servidor_only_refetches_open_years(self):
+        service = self.service(self.store)
+        primeiro = service.calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertTrue(primeiro['success'])
+
+        buscas = requisicoes()
+        self.assertTrue(service.calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)['success'])
+        self.assertEqual(requisicoes(), buscas)
+
+        Servidor.objects.filter(matricula=MATRICULA).update(
+            data_sincronizacao=timezone.now() - timedelta(days=400)
+        )
+        self.assertEqual(self.store.open_years(MATRICULA), list(range(ANO_ATUAL - 1, ANO_ATUAL + 1)))
+        segundo = service.calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        # One year-scoped request per open year, instead of the full history
+        self.assertEqual(requisicoes() - buscas, 2)
+        self.assertEqual(segundo['raw_data'], primeiro['raw_data'])
+        self.assertEqual(self.store.open_years(MATRICULA), [])
@@ -0,0 +1,46 @@
+import io
+import json
+
+from django.test import SimpleTestCase
+
+from .support import ANO_ATUAL, MATRICULA, FichasFakeMixin, start_fake_api, stop_fake_api
+from fichas_stream import ErroJSON, LeitorJSON, carregar_resposta, reduzir_resposta
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class LeitorJSONTests(FichasFakeMixin, SimpleTestCase):
+
+    def test_matches_json_loads_at_any_block_size(self):
+        corpo = self.fake.corpo_matricula(MATRICULA)
+        esperado = json.loads(corpo)
+        for tamanho in (1, 7, 4096):
+            with self.subTest(tamanho_leitura=tamanho):
+                self.assertEqual(LeitorJSON(io.BytesIO(corpo), tamanho_leitura=tamanho).valor(), esperado)
+
+    def test_scalars_escapes_and_multibyte_characters(self):
+        documento = {
+            'texto': 'ação "citada" \\ barra é\U0001F600', 'vazio': [], 'objeto': {},
+            'numeros': [0, -12, 3.5, 1e-7, 123456789012345678], 'logicos': [True, False, None],
+        }
+        corpo = json.dumps(documento, ensure_ascii=False).encode('utf-8')
+        self.assertEqual(LeitorJSON(io.BytesIO(corpo), tamanho_leitura=1).valor(), documento)
+
+    def test_filtered_stream_matches_reduced_response(self):
+        corpo = self.fake.corpo_matricula(MATRICULA)
+        anos = [ANO_ATUAL - 1, ANO_ATUAL - 3]
+        self.assertEqual(
+            carregar_resposta(io.BytesIO(corpo), anos=anos),
+            reduzir_resposta(json.loads(corpo), anos=anos)
+        )
+
+    def test_truncated_response_raises(self):
+        corpo = self.fake.corpo_matricula(MATRICULA)
+        with self.assertRaises(ErroJSON):
+            carregar_resposta(io.BytesIO(corpo[:len(corpo) // 2]))
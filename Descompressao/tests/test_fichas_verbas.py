@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import support  # noqa: F401
+import fichas_verbas
+from fichas_verbas import ClassificadorVerbas, get_classificador, recarregar_classificador
+
+
+class ClassificadorVerbasTests(SimpleTestCase):
+
+    def test_codes_win_over_names_and_the_first_rule_wins(self):
+        classificador = ClassificadorVerbas([
+            {'categoria': 'vencimentos', 'codigos': [101, '102'], 'padroes': ['VENCIMENTO']},
+            {'categoria': 'gam', 'codigos': [150, 101], 'padroes': ['GAM', 'VENCIMENTO']},
+        ])
+        self.assertEqual(classificador.classificar(101), 'vencimentos')
+        self.assertEqual(classificador.classificar(102), 'vencimentos')
+        self.assertEqual(classificador.classificar('102'), 'vencimentos')
+        self.assertEqual(classificador.classificar(150, 'VENCIMENTO BASE'), 'gam')
+        self.assertEqual(classificador.classificar(999, 'vencimento base'), 'vencimentos')
+        self.assertIsNone(classificador.classificar(999, 'AUXILIO'))
+        self.assertEqual(classificador.resultado_vazio(), {'vencimentos': [], 'gam': []})
+
+    def test_rule_order_decides_not_the_position_in_the_name(self):
+        classificador = ClassificadorVerbas([
+            {'categoria': 'ferias', 'padroes': ['FERIAS']},
+            {'categoria': 'gam', 'padroes': ['GAM']},
+        ])
+        self.assertEqual(classificador.classificar(1, 'GAM SOBRE FERIAS'), 'ferias')
+        self.assertEqual(classificador.classificar(1, 'GAM'), 'gam')
+
+    def test_patterns_are_literal(self):
+        classificador = ClassificadorVerbas([{'categoria': 'gcet', 'padroes': ['G.C.E.T (%)']}])
+        self.assertEqual(classificador.classificar(1, 'g.c.e.t (%) noturno'), 'gcet')
+        self.assertIsNone(classificador.classificar(1, 'GXCXEXT (%)'))
+        self.assertFalse(ClassificadorVerbas([{'categoria': 'gam', 'codigos': [150]}]).tem_padroes)
+
+
+class RegrasReloadTests(SimpleTestCase):
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.caminho = os.path.join(pasta.name, 'regras.json')
+        self.escrever([{'categoria': 'vencimentos', 'codigos': [101]}])
+        patcher = mock.patch.dict(fichas_verbas.api_config,
+                                  {'verbas_regras': self.caminho, 'verbas_regras_intervalo': 30})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(recarregar_classificador)
+
+    def escrever(self, regras, mtime=None):
+        with open(self.caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'categorias': regras}, arquivo)
+        if mtime is not None:
+            os.utime(self.caminho, (mtime, mtime))
+
+    def test_changed_file_is_reloaded_after_the_interval(self):
+        recarregar_classificador()
+        classificador = get_classificador()
+        self.assertEqual(classificador.classificar(101), 'vencimentos')
+
+        self.escrever([{'categoria': 'gam', 'codigos': [101]}], mtime=os.path.getmtime(self.caminho) + 10)
+        # Within the interval the file is not even checked
+        self.assertIs(get_classificador(), classificador)
+
+        with mock.patch.object(fichas_verbas, '_proxima_verificacao', 0.0):
+            recarregado = get_classificador()
+        self.assertIsNot(recarregado, classificador)
+        self.assertEqual(recarregado.classificar(101), 'gam')
+
+    def test_unchanged_file_is_not_recompiled(self):
+        classificador = recarregar_classificador()
+        with mock.patch.object(fichas_verbas, '_proxima_verificacao', 0.0):
+            self.assertIs(get_classificador(), classificador)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from Descompressao import jebr
+from Descompressao.models import ImportacaoJEBR, IndiceJEBR
+
+
+def meses(inicio: date, quantidade: int):
+    return [date(inicio.year + (inicio.month - 1 + i) // 12, (inicio.month - 1 + i) % 12 + 1, 1)
+            for i in range(quantidade)]
+
+
+class JEBRTests(TestCase):
+
+    def setUp(self):
+        jebr.invalidar_fatores()
+        self.addCleanup(jebr.invalidar_fatores)
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = pasta.name
+
+    def planilha(self, nome, linhas):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Tabela JEBR;\nMês;Índice\n')
+            for mes, valor in linhas:
+                arquivo.write(f'{mes.month:02d}/{mes.year};{valor}\n')
+        return caminho
+
+    def test_import_is_incremental(self):
+        linhas = [(mes, f'{100 + i},5') for i, mes in enumerate(meses(date(2020, 1, 1), 24))]
+        caminho = self.planilha('jebr.csv', linhas + [(date(2022, 1, 1), 'abc')])
+
+        importacao = jebr.importar_jebr(caminho)
+        self.assertTrue(importacao.sucesso)
+        self.assertEqual(importacao.registros_criados, 24)
+        self.assertEqual(importacao.registros_erro, 1)
+        self.assertEqual(importacao.data_final_importada, date(2021, 12, 1))
+        self.assertEqual(IndiceJEBR.objects.get(data_referencia=date(2020, 3, 1)).valor_indice, Decimal('102.5'))
+
+        novos = meses(date(2022, 1, 1), 2)
+        caminho = self.planilha('jebr2.csv', linhas + [(mes, '200') for mes in novos])
+        importacao = jebr.importar_jebr(caminho)
+        self.assertEqual((importacao.registros_criados, importacao.registros_ignorados), (2, 24))
+        self.assertEqual(IndiceJEBR.objects.count(), 26)
+
+        importacao = jebr.importar_jebr(caminho, completo=True)
+        self.assertEqual((importacao.registros_criados, importacao.registros_atualizados), (0, 26))
+        self.assertEqual(ImportacaoJEBR.objects.filter(sucesso=True).count(), 3)
+
+    def test_factor_ratios(self):
+        valores = [Decimal('100') * Decimal('1.01') ** i for i in range(13)]
+        linhas = [(mes, f'{valor:.6f}') for mes, valor in zip(meses(date(2020, 1, 1), 13), valores)]
+        jebr.importar_jebr(self.planilha('jebr.csv', linhas))
+
+        janeiro = IndiceJEBR.objects.get(data_referencia=date(2021, 1, 1))
+        self.assertAlmostEqual(float(janeiro.fator_acumulado), 1.01 ** 12, places=6)
+        self.assertAlmostEqual(float(janeiro.variacao_mensal), 1.0, places=4)
+        self.assertAlmostEqual(float(janeiro.variacao_anual), (1.01 ** 12 - 1) * 100, places=4)
+
+        fatores = jebr.get_fatores()
+        self.assertEqual(fatores.ultimo_mes, date(2021, 1, 1))
+        self.assertAlmostEqual(fatores.corrigir(100.0, date(2020, 1, 15), date(2020, 7, 1)), 100 * 1.01 ** 6, places=6)
+        serie = fatores.corrigir_serie([10.0, 10.0], [date(2020, 1, 1), date(2020, 12, 1)], date(2021, 1, 1))
+        self.assertAlmostEqual(serie[0], 10 * 1.01 ** 12, places=6)
+        self.assertAlmostEqual(serie[1], 10 * 1.01, places=6)
+        with self.assertRaises(ValueError):
+            fatores.fator(date(2019, 12, 1))
+        self.assertEqual(
+            fatores.cobertos([2019 * 12 + 11, 2020 * 12, 2021 * 12, 2021 * 12 + 1]).tolist(),
+            [False, True, True, False]
+        )
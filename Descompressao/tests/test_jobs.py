@@ -0,0 +1,108 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, start_fake_api, stop_fake_api
+from Descompressao import jobs
+from Descompressao.models import CalculoJob
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class ImmediateExecutor:
+    """Runs submitted work on the calling thread"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def submit(self, funcao, *args):
+        funcao(*args)
+
+
+# Without the store the batch worker threads never open their own connection to the
+# in-memory test database (SQLite shared-cache tables lock across connections)
+@override_settings(VENCIMENTO_JOBS_IN_PROCESS=False, FICHAS_LOCAL_STORE=False)
+class JobTests(FichasFakeMixin, TransactionTestCase):
+
+    def make_stale(self, job, status=CalculoJob.STATUS_EXECUTANDO):
+        CalculoJob.objects.filter(pk=job.pk).update(
+            status=status, atualizado_em=timezone.now() - timedelta(hours=2)
+        )
+
+    def test_identical_submissions_share_one_job(self):
+        job, criado = jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM)
+        repetido, criado_de_novo = jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM, force_refresh=True)
+        self.assertTrue(criado)
+        self.assertFalse(criado_de_novo)
+        self.assertEqual(repetido.pk, job.pk)
+
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, CalculoJob.STATUS_CONCLUIDO)
+        self.assertEqual((job.progresso_atual, job.progresso_total), (1, 1))
+        self.assertTrue(job.resultado['success'])
+        # A finished job is not reused
+        self.assertTrue(jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM)[1])
+
+    def test_batch_progress(self):
+        itens = [(f'0012345{indice}-01', DATA_INICIO, DATA_FIM) for indice in range(3)]
+        itens.append(('99999999-01', DATA_INICIO, DATA_FIM))
+        job, _ = jobs.submit_batch_job(itens)
+        self.assertEqual(jobs.job_status(job)['percentual'], 0.0)
+
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        status = jobs.job_status(job)
+        self.assertEqual((status['progresso_atual'], status['progresso_total']), (4, 4))
+        self.assertEqual(status['percentual'], 100.0)
+        self.assertEqual(job.resultado['consolidado']['total_sucesso'], 3)
+        self.assertEqual(job.resultado['consolidado']['total_falhas'], 1)
+
+    def test_resubmitting_a_job_without_heartbeat_requeues_it(self):
+        job, _ = jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.make_stale(job)
+        with self.assertLogs('Descompressao.jobs', 'WARNING'):
+            recuperado, criado = jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertFalse(criado)
+        self.assertEqual(recuperado.pk, job.pk)
+        self.assertEqual(recuperado.status, CalculoJob.STATUS_PENDENTE)
+
+    def test_polling_a_job_without_heartbeat_requeues_it(self):
+        job, _ = jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.make_stale(job)
+        with self.assertLogs('Descompressao.jobs', 'WARNING'):
+            resposta = self.client.get(reverse('job_status', args=[job.pk]))
+        self.assertEqual(resposta.json()['status'], CalculoJob.STATUS_PENDENTE)
+
+        # A job that is still reporting progress is left alone
+        CalculoJob.objects.filter(pk=job.pk).update(status=CalculoJob.STATUS_EXECUTANDO)
+        resposta = self.client.get(reverse('job_resultado', args=[job.pk]))
+        self.assertEqual(resposta.status_code, 409)
+        self.assertEqual(resposta.json()['status'], CalculoJob.STATUS_EXECUTANDO)
+
+    def test_first_worker_of_a_process_runs_orphaned_jobs(self):
+        orfao, _ = jobs.submit_vencimento_job(MATRICULA, DATA_INICIO, DATA_FIM)
+        pendente, _ = jobs.submit_vencimento_job('00123456-02', DATA_INICIO, DATA_FIM)
+        recente, _ = jobs.submit_vencimento_job('00123456-03', DATA_INICIO, DATA_FIM)
+        self.make_stale(orfao)
+        self.make_stale(pendente, CalculoJob.STATUS_PENDENTE)
+        CalculoJob.objects.filter(pk=recente.pk).update(status=CalculoJob.STATUS_EXECUTANDO)
+
+        with mock.patch.object(jobs, '_executor', None), \
+                mock.patch.object(jobs, 'ThreadPoolExecutor', ImmediateExecutor), \
+                self.assertLogs('Descompressao.jobs', 'WARNING'):
+            jobs._get_executor()
+
+        status = dict(CalculoJob.objects.values_list('pk', 'status'))
+        self.assertEqual(status[orfao.pk], CalculoJob.STATUS_CONCLUIDO)
+        self.assertEqual(status[pendente.pk], CalculoJob.STATUS_CONCLUIDO)
+        self.assertEqual(status[recente.pk], CalculoJob.STATUS_EXECUTANDO)
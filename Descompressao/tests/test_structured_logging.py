@@ -0,0 +1,135 @@
+import atexit
+import io
+import json
+import logging
+import sys
+
+from django.test import SimpleTestCase
+
+from Descompressao.structured_logging import (
+    REDACTED, JsonFormatter, QueueLogHandler, RequestIdFilter, SamplingFilter, redact, reset_request_id,
+    set_request_id
+)
+
+
+def registro(msg, *args, level=logging.INFO, **extra):
+    record = logging.LogRecord('teste', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class RedactionTests(SimpleTestCase):
+
+    def test_credentials_and_cpfs_in_free_text(self):
+        texto = redact(
+            'login token=abc.def.ghi "password": "s3cr3t" senha=123 x-auth-token: tok '
+            'Authorization: Bearer eyJhbGciOi cpf 123.456.789-01 e 12345678901, matrícula 00123456-01'
+        )
+        for segredo in ('abc.def.ghi', 's3cr3t', '123 ', 'tok ', 'eyJhbGciOi', '123.456.789-01', '12345678901'):
+            self.assertNotIn(segredo, texto)
+        self.assertIn(f'token={REDACTED}', texto)
+        self.assertIn('***.***.***-**', texto)
+        self.assertIn('00123456-01', texto)
+
+    def test_structured_fields(self):
+        linha = json.loads(JsonFormatter().format(registro(
+            'consulta %s', '123.456.789-01',
+            cpf='12345678901', Authorization='Bearer x',
+            servidor={'SERVIDOR_CPF': '123.456.789-01', 'senha': 'x', 'itens': ['token=abc', 3]},
+        )))
+        self.assertEqual(linha['message'], 'consulta ***.***.***-**')
+        self.assertEqual(linha['cpf'], REDACTED)
+        self.assertEqual(linha['Authorization'], REDACTED)
+        self.assertEqual(linha['servidor'], {
+            'SERVIDOR_CPF': '***.***.***-**', 'senha': REDACTED, 'itens': [f'token={REDACTED}', 3]
+        })
+
+    def test_exception_text_is_redacted(self):
+        try:
+            raise ValueError('password=hunter2')
+        except ValueError:
+            record = logging.LogRecord('teste', logging.ERROR, __file__, 1, 'falhou', (), sys.exc_info())
+        linha = json.loads(JsonFormatter().format(record))
+        self.assertIn(f'password={REDACTED}', linha['exception'])
+        self.assertNotIn('hunter2', linha['exception'])
+
+
+class FilterTests(SimpleTestCase):
+
+    def test_request_id_of_the_context(self):
+        filtro = RequestIdFilter()
+        token = set_request_id('req-1')
+        try:
+            record = registro('x')
+            filtro.filter(record)
+            self.assertEqual(record.request_id, 'req-1')
+        finally:
+            reset_request_id(token)
+        record = registro('x')
+        filtro.filter(record)
+        self.assertEqual(record.request_id, '-')
+
+        token = set_request_id('não é seguro\r\n')
+        try:
+            record = registro('x')
+            filtro.filter(record)
+            self.assertRegex(record.request_id, r'^[0-9a-f]{32}$')
+        finally:
+            reset_request_id(token)
+
+    def test_sampling_keeps_one_in_n_and_every_warning(self):
+        filtro = SamplingFilter(every=3, max_level='INFO')
+        mantidos = [filtro.filter(registro('passo %s', i)) for i in range(7)]
+        self.assertEqual(mantidos, [True, False, False, True, False, False, True])
+        self.assertTrue(all(filtro.filter(registro('passo %s', i, level=logging.WARNING)) for i in range(5)))
+        outra = registro('outra mensagem')
+        self.assertTrue(filtro.filter(outra))
+        self.assertFalse(hasattr(outra, 'sampled'))
+
+        segundo = registro('passo')
+        filtro = SamplingFilter(every=2)
+        filtro.filter(registro('passo'))
+        filtro.filter(registro('passo'))
+        self.assertTrue(filtro.filter(segundo))
+        self.assertEqual(segundo.sampled, {'every': 2, 'dropped': 1})
+
+
+class QueueLogHandlerTests(SimpleTestCase):
+
+    def handler(self, **kwargs):
+        saida = io.StringIO()
+        handler = QueueLogHandler(stream=saida, **kwargs)
+        atexit.unregister(handler.listener.stop)
+        return handler, saida
+
+    def test_records_are_written_as_json_lines_by_the_listener(self):
+        handler, saida = self.handler()
+        handler.addFilter(RequestIdFilter())
+        logger = logging.getLogger('Descompressao.tests.fila')
+        logger.addHandler(handler)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, handler)
+
+        argumentos = {'valor': 1}
+        token = set_request_id('req-fila')
+        try:
+            logger.warning('consulta %s token=%s', argumentos, 'segredo', extra={'matricula': '00123456-01'})
+        finally:
+            reset_request_id(token)
+        # Changed after the call: the record was rendered when it was queued
+        argumentos['valor'] = 2
+        handler.listener.stop()
+
+        [linha] = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+        self.assertEqual(linha['level'], 'WARNING')
+        self.assertEqual(linha['logger'], 'Descompressao.tests.fila')
+        self.assertEqual(linha['request_id'], 'req-fila')
+        self.assertEqual(linha['message'], f"consulta {{'valor': 1}} token={REDACTED}")
+        self.assertEqual(linha['matricula'], '00123456-01')
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler, saida = self.handler(maxsize=1)
+        handler.listener.stop()
+        for i in range(3):
+            handler.emit(registro('mensagem %s', i))
+        self.assertEqual(handler.dropped, 2)
@@ -0,0 +1,115 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from Descompressao import archive
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api
+from services import VencimentoServiceFixed
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class VencimentoAPITests(FichasFakeMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.periodo = {
+            'matricula': MATRICULA,
+            'data_inicio': DATA_INICIO.isoformat(),
+            'data_fim': DATA_FIM.isoformat(),
+        }
+
+    def test_summary_has_no_records(self):
+        resposta = self.client.get(reverse('vencimento_api_resumo'), self.periodo)
+        self.assertEqual(resposta.status_code, 200)
+        resumo = resposta.json()
+        self.assertTrue(resumo['success'])
+        self.assertNotIn('registros', resumo)
+        self.assertGreater(resumo['total_registros'], 0)
+        self.assertAlmostEqual(sum(resumo['monthly_summary'].values()), resumo['total_valor'], places=6)
+        self.assertTrue(resumo['registros_url'].startswith(reverse('vencimento_api_registros')))
+
+    def test_records_are_paginated(self):
+        resumo = self.client.get(reverse('vencimento_api_resumo'), self.periodo).json()
+        url = f"{reverse('vencimento_api_registros')}?{'&'.join(f'{k}={v}' for k, v in self.periodo.items())}&limit=7"
+        registros = []
+        paginas = 0
+        while url:
+            pagina = self.client.get(url).json()
+            self.assertLessEqual(len(pagina['registros']), 7)
+            registros.extend(pagina['registros'])
+            url = pagina['next_url']
+            paginas += 1
+        self.assertEqual(len(registros), resumo['total_registros'])
+        self.assertEqual(paginas, -(-resumo['total_registros'] // 7))
+        self.assertEqual(set(registros[0]), {'year', 'month', 'valor', 'nome_verba', 'cod_verba'})
+        datas = [(registro['year'], registro['month']) for registro in registros]
+        self.assertEqual(datas, sorted(datas))
+        self.assertAlmostEqual(sum(registro['valor'] for registro in registros), resumo['total_valor'], places=6)
+
+    def test_records_field_selection_and_filters(self):
+        pagina = self.client.get(reverse('vencimento_api_registros'), {
+            **self.periodo, 'fields': 'valor,date', 'ano': DATA_FIM.year, 'mes': 3
+        }).json()
+        self.assertEqual(pagina['fields'], ['valor', 'date'])
+        self.assertTrue(pagina['registros'])
+        self.assertTrue(all(set(registro) == {'valor', 'date'} for registro in pagina['registros']))
+        self.assertTrue(all(registro['date'] == f'{DATA_FIM.year}-03-01' for registro in pagina['registros']))
+
+        resposta = self.client.get(reverse('vencimento_api_registros'), {**self.periodo, 'fields': 'valor,senha'})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_unknown_servidor(self):
+        resposta = self.client.get(reverse('vencimento_api_resumo'), {**self.periodo, 'matricula': '99999999-01'})
+        self.assertEqual(resposta.status_code, 404)
+
+
+class VencimentoArchiveTests(FichasFakeMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        # Written synchronously, into a fresh archive of this test
+        configuracao = override_settings(RESULT_ARCHIVE={'DIRECTORY': pasta.name, 'ASYNC': False})
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        patcher = mock.patch.object(archive, '_archive', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_archived_payload_is_the_one_the_calculation_used(self):
+        buscas = requisicoes()
+        with mock.patch.object(VencimentoServiceFixed, 'get_professor_data',
+                               side_effect=AssertionError('payload fetched again')):
+            resposta = self.client.post(reverse('vencimento'), {
+                'matricula': MATRICULA, 'data_inicio': DATA_INICIO.isoformat(), 'data_fim': DATA_FIM.isoformat()
+            })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(requisicoes() - buscas, 1)
+
+        [consultas] = (self.pasta / 'consultas').iterdir()
+        with gzip.open(consultas) as arquivo:
+            [documento] = [json.loads(linha) for linha in arquivo.read().splitlines()]
+        [payload] = (self.pasta / 'payloads').rglob('*.json.gz')
+        self.assertTrue(payload.name.startswith(documento['payload_sha256']))
+
+        calculo = self.service(store=None).calculate_vencimento_data(
+            MATRICULA, DATA_INICIO, DATA_FIM, include_payload=True
+        )
+        with gzip.open(payload) as arquivo:
+            self.assertEqual(json.loads(arquivo.read()), calculo['professor_full_data'])
+        sem_payload = self.service().calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertNotIn('professor_full_data', sem_payload)
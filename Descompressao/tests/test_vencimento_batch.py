@@ -0,0 +1,76 @@
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .support import DATA_FIM, DATA_INICIO, FichasFakeMixin, start_fake_api, stop_fake_api
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+# Batch workers run on their own threads; without the store they never touch the test database
+@override_settings(FICHAS_LOCAL_STORE=False)
+class VencimentoBatchTests(FichasFakeMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('vencimento_batch')
+        self.periodo = {'data_inicio': DATA_INICIO.isoformat(), 'data_fim': DATA_FIM.isoformat()}
+
+    def linhas(self, resposta):
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        return [json.loads(linha) for linha in b''.join(resposta.streaming_content).decode().splitlines()]
+
+    def test_invalid_lines_are_reported_with_their_number(self):
+        resposta = self.client.post(self.url, {
+            'matriculas': f'00123456-01\n123456789012\n00123456-02;{DATA_FIM.year + 2}-01-01;{DATA_FIM.year + 2}-12-31',
+            **self.periodo
+        })
+        self.assertEqual(resposta.status_code, 200)
+        erros = resposta.context['form'].non_field_errors()
+        self.assertEqual(len(erros), 2)
+        self.assertTrue(erros[0].startswith('Linha 2:'))
+        self.assertTrue(erros[1].startswith('Linha 3:'))
+
+    def test_lines_without_a_period_are_rejected(self):
+        resposta = self.client.post(self.url, {'matriculas': '00123456-01'})
+        self.assertIn('Linha 1: Informe o período na linha ou no formulário.',
+                      resposta.context['form'].non_field_errors())
+        resposta = self.client.post(self.url, {**self.periodo})
+        self.assertIn('Informe ao menos uma matrícula.', resposta.context['form'].non_field_errors())
+
+    def test_results_stream_per_servidor_with_partial_failures(self):
+        csv = SimpleUploadedFile('lote.csv', (
+            'matricula;data_inicio;data_fim\n'
+            f'00123456-02;{DATA_FIM.year}-01-01;{DATA_FIM.isoformat()}\n'
+            '99999999-01\n'
+        ).encode('utf-8'))
+        resposta = self.client.post(self.url, {
+            'matriculas': '00123456-01\n00123456-01',
+            'arquivo_csv': csv,
+            **self.periodo
+        })
+        self.assertEqual(resposta.status_code, 200)
+        *servidores, consolidado = self.linhas(resposta)
+
+        self.assertEqual(sorted(linha['matricula'] for linha in servidores),
+                         ['00123456-01', '00123456-02', '99999999-01'])
+        por_matricula = {linha['matricula']: linha for linha in servidores}
+        self.assertTrue(por_matricula['00123456-01']['success'])
+        self.assertEqual(por_matricula['00123456-02']['data_inicio'], f'{DATA_FIM.year}-01-01')
+        self.assertFalse(por_matricula['99999999-01']['success'])
+        self.assertIsNone(por_matricula['99999999-01']['data'])
+
+        self.assertEqual(consolidado['tipo'], 'consolidado')
+        self.assertEqual((consolidado['total_servidores'], consolidado['total_sucesso'], consolidado['total_falhas']),
+                         (3, 2, 1))
+        self.assertEqual(consolidado['erros'][0]['matricula'], '99999999-01')
+        self.assertEqual(consolidado['total_registros'],
+                         sum(por_matricula[m]['metadata']['total_registros'] for m in ('00123456-01', '00123456-02')))
@@ -0,0 +1,119 @@
+import csv
+import io
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, start_fake_api, stop_fake_api
+from planilha_xlsx import iter_linhas, planilhas
+from relatorio_export import CABECALHO_VENCIMENTOS, EXCEL_EPOCH
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+# Batch workers run on their own threads; without the store they never touch the test database
+@override_settings(FICHAS_LOCAL_STORE=False)
+class VencimentoExportTests(FichasFakeMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.periodo = {'data_inicio': DATA_INICIO.isoformat(), 'data_fim': DATA_FIM.isoformat()}
+        dados = self.service().calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)['data']
+        self.esperado = [
+            [MATRICULA, dados.professor_name, periodo.mes, registro.cod_verba, registro.nome_verba,
+             round(float(registro.valor), 2)]
+            for periodo in dados.periodos for registro in periodo.registros
+        ]
+        self.assertTrue(self.esperado)
+
+    def abas_xlsx(self, resposta):
+        """{sheet name: rows} of a streamed XLSX response"""
+        self.assertEqual(resposta['Content-Type'],
+                         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        caminho = os.path.join(pasta.name, 'exportacao.xlsx')
+        with open(caminho, 'wb') as arquivo:
+            arquivo.writelines(resposta.streaming_content)
+        with zipfile.ZipFile(caminho) as arquivo:
+            nomes = list(planilhas(arquivo))
+        return {nome: [valores for _, valores in iter_linhas(caminho, nome)] for nome in nomes}
+
+    def linhas_csv(self, resposta):
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        texto = b''.join(resposta.streaming_content).decode('utf-8')
+        self.assertTrue(texto.startswith('﻿'))
+        return list(csv.reader(io.StringIO(texto[1:], newline=''), delimiter=';'))
+
+    def registros_xlsx(self, linhas):
+        """Report rows read back from the sheet: dates are Excel serials and numbers floats"""
+        return [
+            [matricula, nome, EXCEL_EPOCH + timedelta(days=int(mes)), int(codigo), verba, round(valor, 2)]
+            for matricula, nome, mes, codigo, verba, valor in linhas
+        ]
+
+    def registros_csv(self):
+        return [
+            [matricula, nome, mes.strftime('%m/%Y'), str(codigo), verba, f'{valor:.2f}'.replace('.', ',')]
+            for matricula, nome, mes, codigo, verba, valor in self.esperado
+        ]
+
+    def test_single_export_as_xlsx(self):
+        resposta = self.client.get(reverse('vencimento_export'), {'matricula': MATRICULA, **self.periodo})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertRegex(resposta['Content-Disposition'], r'^attachment; filename=".+\.xlsx"$')
+        abas = self.abas_xlsx(resposta)
+        self.assertEqual(list(abas), ['Vencimentos'])
+        self.assertEqual(abas['Vencimentos'][0], CABECALHO_VENCIMENTOS)
+        self.assertEqual(self.registros_xlsx(abas['Vencimentos'][1:]), self.esperado)
+
+    def test_single_export_as_csv(self):
+        resposta = self.client.get(reverse('vencimento_export'),
+                                   {'matricula': MATRICULA, 'formato': 'csv', **self.periodo})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertRegex(resposta['Content-Disposition'], r'^attachment; filename=".+\.csv"$')
+        linhas = self.linhas_csv(resposta)
+        self.assertEqual(linhas[0], CABECALHO_VENCIMENTOS)
+        self.assertEqual(linhas[1:], self.registros_csv())
+
+    def test_invalid_requests(self):
+        url = reverse('vencimento_export')
+        formato = {'matricula': MATRICULA, 'formato': 'pdf', **self.periodo}
+        self.assertEqual(self.client.get(url, formato).status_code, 400)
+        invertido = {'data_inicio': DATA_FIM.isoformat(), 'data_fim': DATA_INICIO.isoformat()}
+        self.assertEqual(self.client.get(url, {'matricula': MATRICULA, **invertido}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'matricula': '99999999-01', **self.periodo}).status_code, 404)
+
+    def test_batch_export_lists_failures_in_the_erros_sheet(self):
+        resposta = self.client.post(reverse('vencimento_batch_export'), {
+            'matriculas': f'{MATRICULA}\n99999999-01', **self.periodo
+        })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertRegex(resposta['Content-Disposition'],
+                         r'^attachment; filename="vencimentos_lote_\d{8}_\d{6}\.xlsx"$')
+        abas = self.abas_xlsx(resposta)
+        self.assertEqual(list(abas), ['Vencimentos', 'Erros'])
+        self.assertEqual(self.registros_xlsx(abas['Vencimentos'][1:]), self.esperado)
+        self.assertEqual(abas['Erros'][0], ['Matrícula', 'Data Início', 'Data Fim', 'Mensagem'])
+        self.assertEqual(len(abas['Erros']), 2)
+        self.assertEqual(abas['Erros'][1][0], '99999999-01')
+
+    def test_batch_export_as_csv(self):
+        resposta = self.client.post(reverse('vencimento_batch_export'), {
+            'matriculas': MATRICULA, 'formato': 'csv', **self.periodo
+        })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertRegex(resposta['Content-Disposition'], r'\.csv"$')
+        linhas = self.linhas_csv(resposta)
+        self.assertEqual(linhas[0], CABECALHO_VENCIMENTOS)
+        self.assertEqual(linhas[1:], self.registros_csv())
@@ -0,0 +1,102 @@
+import re
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, start_fake_api, stop_fake_api
+from vencimento_metrics import REGISTRY, MetricsRegistry, server_timing_header
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+@override_settings(FICHAS_LOCAL_STORE=False)
+class VencimentoMetricsTests(FichasFakeMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+        self.periodo = {
+            'matricula': MATRICULA,
+            'data_inicio': DATA_INICIO.isoformat(),
+            'data_fim': DATA_FIM.isoformat(),
+        }
+
+    def metrics(self):
+        resposta = self.client.get(reverse('metrics'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return resposta.content.decode()
+
+    def test_metrics_of_a_calculation(self):
+        self.assertEqual(self.client.get(reverse('vencimento_api_resumo'), self.periodo).status_code, 200)
+        self.assertEqual(self.client.get(reverse('vencimento_api_resumo'), self.periodo).status_code, 200)
+        texto = self.metrics()
+
+        self.assertIn('# TYPE vencimento_stage_seconds histogram', texto)
+        # One extract stage per calculation
+        self.assertIn('vencimento_stage_seconds_count{stage="extract"} 2', texto)
+        self.assertIn('vencimento_stage_seconds_bucket{stage="extract",le="+Inf"} 2', texto)
+        self.assertIn('vencimento_request_seconds_count{view="vencimento_api_resumo"} 2', texto)
+        self.assertIn('fichas_api_requests_total{endpoint="/servidor/busca/matricula",status="200"} 1', texto)
+        self.assertIn('vencimento_cache_hit_ratio{cache="fichas_api"} 0.5', texto)
+
+    @override_settings(VENCIMENTO_METRICS=False)
+    def test_metrics_can_be_disabled(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    @override_settings(VENCIMENTO_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        resposta = self.client.get(reverse('vencimento_api_resumo'), self.periodo)
+        estagios = dict(
+            re.fullmatch(r'([a-z_]+);dur=[\d.]+(?:;desc="(\d+)x")?', parte).groups()
+            for parte in resposta['Server-Timing'].split(', ')
+        )
+        self.assertIn('fetch', estagios)
+        self.assertIn('aggregate', estagios)
+        self.assertIsNone(estagios['extract'])
+        self.assertEqual(list(estagios)[-1], 'total')
+
+    @override_settings(VENCIMENTO_SERVER_TIMING=False)
+    def test_server_timing_is_opt_in(self):
+        resposta = self.client.get(reverse('vencimento_api_resumo'), self.periodo)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('Server-Timing', resposta)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def test_prometheus_exposition(self):
+        registro = MetricsRegistry(buckets=(0.1, 1.0))
+        registro.inc('fichas_api_requests_total', endpoint='busca', status=200)
+        registro.inc('fichas_api_requests_total', 2, endpoint='busca', status=200)
+        registro.observe('vencimento_stage_seconds', 0.05, stage='fetch')
+        registro.observe('vencimento_stage_seconds', 0.5, stage='fetch')
+        registro.observe('vencimento_stage_seconds', 5.0, stage='fetch')
+        registro.inc('vencimento_cache_requests_total', cache='fichas', result='hit')
+        registro.inc('vencimento_cache_requests_total', 3, cache='fichas', result='miss')
+        registro.inc('fichas_api_requests_total', endpoint='a"b\\c', status='erro')
+
+        linhas = registro.render_prometheus().splitlines()
+        self.assertIn('fichas_api_requests_total{endpoint="busca",status="200"} 3', linhas)
+        self.assertIn('fichas_api_requests_total{endpoint="a\\"b\\\\c",status="erro"} 1', linhas)
+        self.assertIn('vencimento_cache_hit_ratio{cache="fichas"} 0.25', linhas)
+        self.assertEqual([linha for linha in linhas if linha.startswith('vencimento_stage_seconds')], [
+            'vencimento_stage_seconds_bucket{stage="fetch",le="0.1"} 1',
+            'vencimento_stage_seconds_bucket{stage="fetch",le="1.0"} 2',
+            'vencimento_stage_seconds_bucket{stage="fetch",le="+Inf"} 3',
+            'vencimento_stage_seconds_sum{stage="fetch"} 5.55',
+            'vencimento_stage_seconds_count{stage="fetch"} 3',
+        ])
+
+    def test_server_timing_sums_repeated_stages(self):
+        self.assertEqual(
+            server_timing_header([('fetch', 0.010), ('parse', 0.002), ('fetch', 0.020)]),
+            'fetch;dur=30.0;desc="2x", parse;dur=2.0'
+        )
@@ -0,0 +1,87 @@
+from datetime import date
+
+from django.test import SimpleTestCase, override_settings
+
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, start_fake_api, stop_fake_api
+from vencimento_records import ServidorVencimentos, VencimentoPeriodo, VencimentoRecord, VencimentoTotal, as_dict
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+@override_settings(FICHAS_LOCAL_STORE=False)
+class VencimentoRecordTests(FichasFakeMixin, SimpleTestCase):
+
+    def test_record_types_have_no_instance_dict(self):
+        registro = VencimentoRecord(2020, 1, 10.0, 'VENCIMENTO', 101)
+        for objeto in (registro, VencimentoPeriodo(registro.date), VencimentoTotal(),
+                       ServidorVencimentos('Nome', MATRICULA, DATA_INICIO, DATA_FIM)):
+            with self.subTest(tipo=type(objeto).__name__):
+                self.assertFalse(hasattr(objeto, '__dict__'))
+        with self.assertRaises(AttributeError):
+            registro.extra = 1
+
+    def test_records_of_a_month_share_one_date_object(self):
+        resultado = self.service().calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertTrue(resultado['success'])
+        for periodo in resultado['data'].periodos:
+            self.assertTrue(all(registro.date is periodo.mes for registro in periodo.registros))
+        # The periods reference the same record objects as the flat list
+        self.assertCountEqual(map(id, resultado['data'].registros()), map(id, resultado['raw_data']))
+
+    def test_serialization(self):
+        registro = VencimentoRecord(2020, 2, 10.5, 'VENCIMENTO', 101)
+        self.assertEqual(as_dict(registro), {
+            'year': 2020, 'month': 2, 'valor': 10.5, 'nome_verba': 'VENCIMENTO', 'cod_verba': 101,
+            'date': date(2020, 2, 1)
+        })
+        self.assertEqual(as_dict([registro]), [registro.to_dict()])
+        self.assertEqual(as_dict('texto'), 'texto')
+
+        resumo = ServidorVencimentos.from_records([registro], 'Nome', MATRICULA, date(2020, 1, 1), date(2020, 12, 31))
+        dados = as_dict(resumo)
+        self.assertEqual((dados['periodo_inicio'], dados['periodo_fim']), ('01/2020', '12/2020'))
+        self.assertEqual(dados['periodos'][0]['registros'], [registro.to_dict()])
+        self.assertEqual(dados['por_verba'], [
+            {'cod_verba': 101, 'nome_verba': 'VENCIMENTO', 'total': 10.5, 'quantidade': 1, 'media': 10.5}
+        ])
+
+
+@override_settings(FICHAS_LOCAL_STORE=False)
+class VencimentoAggregationTests(FichasFakeMixin, SimpleTestCase):
+
+    def test_single_pass_totals(self):
+        registros = [
+            VencimentoRecord(2020, 2, 100.0, 'VENCIMENTO', 1),
+            VencimentoRecord(2020, 1, 50.0, 'GAM', 2),
+            VencimentoRecord(2021, 1, 25.0, 'VENCIMENTO', 1),
+            VencimentoRecord(2020, 1, 10.0, 'VENCIMENTO', 1),
+        ]
+        resumo = ServidorVencimentos.from_records(registros, 'Nome', MATRICULA, date(2020, 1, 1), date(2021, 12, 31))
+
+        self.assertEqual([periodo.mes for periodo in resumo.periodos],
+                         [date(2020, 1, 1), date(2020, 2, 1), date(2021, 1, 1)])
+        self.assertEqual([periodo.total_vencimentos for periodo in resumo.periodos], [60.0, 100.0, 25.0])
+        self.assertEqual({ano: grupo.total for ano, grupo in resumo.por_ano.items()}, {2020: 160.0, 2021: 25.0})
+        self.assertEqual(resumo.por_verba[1].total, 135.0)
+        self.assertEqual(resumo.por_verba[1].quantidade, 3)
+        self.assertEqual(resumo.total, 185.0)
+        self.assertEqual(resumo.media, 185.0 / 4)
+        # Periods reference the same record objects as the flat list
+        self.assertIs(resumo.periodos[0].registros[0], registros[1])
+
+    def test_period_totals_of_a_calculation(self):
+        resultado = self.service().calculate_vencimento_data(MATRICULA, DATA_INICIO, DATA_FIM)
+        self.assertTrue(resultado['success'])
+        dados = resultado['data']
+        total = sum(record.valor for record in resultado['raw_data'])
+        self.assertAlmostEqual(sum(periodo.total_vencimentos for periodo in dados.periodos), total, places=6)
+        self.assertAlmostEqual(sum(grupo.total for grupo in dados.por_ano.values()), total, places=6)
+        self.assertEqual(set(dados.por_ano), {DATA_INICIO.year, DATA_FIM.year})
+        self.assertEqual(resultado['metadata']['total_registros'], len(resultado['raw_data']))
+        self.assertNotIn('professor_full_data', resultado)
@@ -0,0 +1,65 @@
+import json
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from Descompressao.fichas_store import FichasStore
+from .support import DATA_FIM, DATA_INICIO, MATRICULA, FichasFakeMixin, requisicoes, start_fake_api, stop_fake_api
+from fichas_api import FichasAPI_Manager
+from services import VencimentoServiceFixed
+
+
+def setUpModule():
+    start_fake_api()
+
+
+def tearDownModule():
+    stop_fake_api()
+
+
+class VencimentoReportTests(FichasFakeMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        self.url = reverse('vencimento_relatorio')
+        self.periodo = {
+            'matricula': MATRICULA,
+            'data_inicio': DATA_INICIO.isoformat(),
+            'data_fim': DATA_FIM.isoformat(),
+        }
+
+    def test_revalidation_is_answered_without_recalculating(self):
+        resposta = self.client.get(self.url, self.periodo)
+        self.assertEqual(resposta.status_code, 200)
+        etag = resposta['ETag']
+        self.assertIn('private', resposta['Cache-Control'])
+
+        buscas = requisicoes()
+        with mock.patch.object(VencimentoServiceFixed, 'calculate_vencimento_data',
+                               side_effect=AssertionError('recalculated')):
+            nao_modificado = self.client.get(self.url, self.periodo, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(nao_modificado.status_code, 304)
+            self.assertEqual(nao_modificado['ETag'], etag)
+
+            em_cache = self.client.get(self.url, self.periodo)
+            self.assertEqual(em_cache.status_code, 200)
+            self.assertEqual(em_cache.content, resposta.content)
+        self.assertEqual(requisicoes(), buscas)
+
+    def test_etag_changes_with_the_fichas(self):
+        etag = self.client.get(self.url, self.periodo)['ETag']
+
+        resposta = FichasAPI_Manager().busca_matricula(MATRICULA)
+        alterada = json.loads(json.dumps(resposta))
+        for ficha in alterada['servidor']['fichasFinanceiras']:
+            if ficha['FICHA_FINANCEIRA_ANO_REFERENCIA'] == DATA_FIM.year:
+                for item in ficha['fichasFinanceirasItens']:
+                    item['FICHA_FINANCEIRA_ITEM_JAN'] = (item.get('FICHA_FINANCEIRA_ITEM_JAN') or 0) + 1
+        FichasStore().ingest(MATRICULA, alterada)
+
+        resposta = self.client.get(self.url, self.periodo, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
@@ -1,6 +1,23 @@
 from django.urls import path
-from .views import vencimento_view
+from .views import (
+    vencimento_view, vencimento_async_view, vencimento_report_view, vencimento_batch_view,
+    vencimento_export_view, vencimento_batch_export_view,
+    vencimento_summary_api_view, vencimento_records_api_view, vencimento_servidor_api_view,
+    job_vencimento_submit_view, job_batch_submit_view, job_status_view, job_result_view
+)
 
 urlpatterns = [
     path('', vencimento_view, name='vencimento'),
+    path('async/', vencimento_async_view, name='vencimento_async'),
+    path('relatorio/', vencimento_report_view, name='vencimento_relatorio'),
+    path('lote/', vencimento_batch_view, name='vencimento_batch'),
+    path('exportar/', vencimento_export_view, name='vencimento_export'),
+    path('lote/exportar/', vencimento_batch_export_view, name='vencimento_batch_export'),
+    path('api/resumo/', vencimento_summary_api_view, name='vencimento_api_resumo'),
+    path('api/registros/', vencimento_records_api_view, name='vencimento_api_registros'),
+    path('api/servidor/', vencimento_servidor_api_view, name='vencimento_api_servidor'),
+    path('jobs/vencimento/', job_vencimento_submit_view, name='job_vencimento'),
+    path('jobs/lote/', job_batch_submit_view, name='job_lote'),
+    path('jobs/<int:job_id>/', job_status_view, name='job_status'),
+    path('jobs/<int:job_id>/resultado/', job_result_view, name='job_resultado'),
 ]
\ No newline at end of file
@@ -0,0 +1,390 @@
+"""
+Cálculo de descompressão salarial, portado da planilha
+"Cálculos HT 2.0 - Descompressão.xlsm".
+
+A planilha tem três abas:
+
+    EvolSalarial         vencimento pago em cada mês para cada referência (Ref 1 a Ref 25)
+    EvolSalarialCorreta  a mesma tabela descomprimida: cada referência vale 5% a mais
+                         que a anterior, (B2*0.05)+B2, (C2*0.05)+C2, ...
+    ModeloDescNovo       uma linha por mês com as diferenças devidas (colunas C a W)
+
+As fórmulas de ModeloDescNovo, linha a linha, são aplicadas aqui a todos os
+meses de uma vez, como operações sobre arrays NumPy:
+
+    E = D - C                          diferença de vencimento (devido - pago)
+    F = IFERROR(G / C, 0)              percentual de GAM sobre o vencimento pago
+    H = D * F,  I = H - G              GAM devido e diferença de GAM
+    K = E * J,  M = E * L,  O = E * N  titulação, GCET e adicional por tempo de serviço
+    Q = IF(MONTH(A) = 12, E + I, E * P)   férias e 13° salário
+    R = E + I + K + M + O + Q          (a) diferença total
+    T = R * S                          (c = a x b) valor corrigido pelo índice de atualização
+    V = T * U / 100                    (e = c x d) juros de mora
+    W = T + V                          (f = c + e) principal + juros
+
+e os totais: W92 = SUM(W), honorários de sucumbência W93 = W92 * 5% e total
+devido W94 = W92 + W93.
+
+O nível (coluna B) é a referência de EvolSalarial cujo valor é igual ao
+vencimento pago no mês, MATCH(C, XLOOKUP(A, EvolSalarial...), 0). Na planilha
+a coluna D (vencimento devido) não tem fórmula, é digitada; aqui ela é
+derivada (montar_entradas):
+
+    D = EvolSalarialCorreta[mês A, referência B]   quando B é encontrado
+    D = C                                           quando não é ("-" na planilha)
+
+com EvolSalarialCorreta recalculada a partir da Ref 1 (TabelaSalarial.descomprimida),
+e não lida dos valores salvos. Sem nível identificado o mês não tem diferença
+de vencimento (E = 0).
+"""
+
+import os
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fichas_api_config import api_config
+from fichas_table import FichasTable
+from fichas_verbas import ClassificadorVerbas
+from planilha_xlsx import iter_celulas, iter_linhas, letras_coluna
+
+PLANILHA_PADRAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'Cálculos HT 2.0 - Descompressão.xlsm'
+)
+EXCEL_EPOCH = date(1899, 12, 30)
+PASSO_REFERENCIA = 0.05
+HONORARIOS_SUCUMBENCIA = 0.05
+
+# Colunas de ModeloDescNovo, na ordem da planilha
+COLUNAS = {
+    'venc_pago': 'C', 'venc_devido': 'D', 'venc_diferenca': 'E',
+    'gam_pct': 'F', 'gam_pago': 'G', 'gam_devido': 'H', 'gam_diferenca': 'I',
+    'titulacao_pct': 'J', 'titulacao_diferenca': 'K',
+    'gcet_pct': 'L', 'gcet_diferenca': 'M',
+    'adic_pct': 'N', 'adic_diferenca': 'O',
+    'ferias_pct': 'P', 'ferias_diferenca': 'Q',
+    'diferenca_total': 'R', 'indice': 'S', 'valor_corrigido': 'T',
+    'juros_pct': 'U', 'juros': 'V', 'principal_juros': 'W',
+}
+ENTRADAS = ['venc_pago', 'venc_devido', 'gam_pago', 'titulacao_pct', 'gcet_pct',
+            'adic_pct', 'ferias_pct', 'indice', 'juros_pct']
+
+
+def mes_numero(data: date) -> int:
+    """Mês como inteiro (ano * 12 + mês - 1), usado para indexar os arrays"""
+    return data.year * 12 + data.month - 1
+
+
+def data_do_mes(numero: int) -> date:
+    return date(numero // 12, numero % 12 + 1, 1)
+
+
+def data_excel(serial: float) -> date:
+    return EXCEL_EPOCH + timedelta(days=int(serial))
+
+
+class TabelaSalarial:
+    """Tabela mês x referência (EvolSalarial ou EvolSalarialCorreta)"""
+
+    def __init__(self, meses: np.ndarray, valores: np.ndarray):
+        """
+        Args:
+            meses: número de cada mês (ver mes_numero), em ordem crescente
+            valores: shape (n_meses, n_referencias)
+        """
+        self.meses = np.asarray(meses, dtype=np.int64)
+        self.valores = np.asarray(valores, dtype=np.float64)
+
+    @classmethod
+    def carregar(cls, caminho: str, planilha: str) -> 'TabelaSalarial':
+        """Lê a aba da planilha (coluna A com o mês, B em diante com as referências)"""
+        meses = []
+        linhas = []
+        for numero, valores in iter_linhas(caminho, planilha):
+            if numero == 1 or not valores or not isinstance(valores[0], float):
+                continue
+            meses.append(mes_numero(data_excel(valores[0])))
+            linhas.append([v if isinstance(v, float) else np.nan for v in valores[1:]])
+        largura = max(len(linha) for linha in linhas)
+        matriz = np.full((len(linhas), largura), np.nan)
+        for i, linha in enumerate(linhas):
+            matriz[i, :len(linha)] = linha
+        ordem = np.argsort(meses, kind='stable')
+        return cls(np.array(meses)[ordem], matriz[ordem])
+
+    def linhas(self, meses: np.ndarray) -> np.ndarray:
+        """Linha de cada mês na tabela (XLOOKUP exato), -1 se o mês não existe"""
+        posicoes = np.searchsorted(self.meses, meses)
+        posicoes = np.minimum(posicoes, len(self.meses) - 1)
+        return np.where(self.meses[posicoes] == meses, posicoes, -1)
+
+    def nivel(self, meses: np.ndarray, valores: np.ndarray) -> np.ndarray:
+        """
+        Referência (1 a n) cujo valor no mês é igual ao informado, como
+        MATCH(valor, XLOOKUP(mês, ...), 0); 0 quando não há correspondência.
+        """
+        linhas = self.linhas(meses)
+        tabela = self.valores[np.maximum(linhas, 0)]
+        iguais = np.isclose(tabela, np.asarray(valores)[:, None], rtol=0, atol=0.005)
+        encontrado = iguais.any(axis=1) & (linhas >= 0) & (np.asarray(valores) > 0)
+        return np.where(encontrado, iguais.argmax(axis=1) + 1, 0)
+
+    def valor(self, meses: np.ndarray, niveis: np.ndarray) -> np.ndarray:
+        """Valor da referência em cada mês; NaN se o mês ou o nível não existem"""
+        linhas = self.linhas(meses)
+        valido = (linhas >= 0) & (niveis > 0) & (niveis <= self.valores.shape[1])
+        resultado = np.full(len(linhas), np.nan)
+        resultado[valido] = self.valores[linhas[valido], niveis[valido] - 1]
+        return resultado
+
+    def descomprimida(self, passo: float = PASSO_REFERENCIA) -> 'TabelaSalarial':
+        """
+        EvolSalarialCorreta a partir da Ref 1: cada coluna é (anterior * passo) + anterior,
+        calculada na mesma ordem da planilha para reproduzir o arredondamento do Excel.
+        """
+        valores = np.empty_like(self.valores)
+        valores[:, 0] = self.valores[:, 0]
+        for coluna in range(1, valores.shape[1]):
+            valores[:, coluna] = (valores[:, coluna - 1] * passo) + valores[:, coluna - 1]
+        return TabelaSalarial(self.meses, valores)
+
+
+class ResultadoDescompressao:
+    """Colunas de ModeloDescNovo (arrays, um valor por mês) e os totais"""
+
+    def __init__(self, meses: np.ndarray, colunas: Dict[str, np.ndarray], niveis: np.ndarray,
+                 honorarios: float = HONORARIOS_SUCUMBENCIA):
+        self.meses = meses
+        self.colunas = colunas
+        self.niveis = niveis
+        self.total_corrigido = float(colunas['valor_corrigido'].sum())      # T92
+        self.total_juros = float(colunas['juros'].sum())                    # V92
+        self.total_atualizado = float(colunas['principal_juros'].sum())     # W92
+        self.honorarios = self.total_atualizado * honorarios                # W93
+        self.total_devido = self.total_atualizado + self.honorarios         # W94
+
+    def __len__(self):
+        return len(self.meses)
+
+    def totais(self) -> Dict[str, float]:
+        return {
+            'total_corrigido': self.total_corrigido,
+            'total_juros': self.total_juros,
+            'total_atualizado': self.total_atualizado,
+            'honorarios': self.honorarios,
+            'total_devido': self.total_devido,
+        }
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Uma linha por mês, como em ModeloDescNovo"""
+        colunas = {nome: valores.tolist() for nome, valores in self.colunas.items()}
+        registros = []
+        for i, mes in enumerate(self.meses.tolist()):
+            registro = {'mes': data_do_mes(mes), 'nivel': int(self.niveis[i]) or None}
+            for nome in COLUNAS:
+                registro[nome] = colunas[nome][i]
+            registros.append(registro)
+        return registros
+
+
+def calcular_descompressao(meses: np.ndarray, entradas: Dict[str, np.ndarray],
+                           niveis: Optional[np.ndarray] = None,
+                           honorarios: float = HONORARIOS_SUCUMBENCIA) -> ResultadoDescompressao:
+    """
+    Aplica as fórmulas de ModeloDescNovo a todos os meses.
+
+    Args:
+        meses: número de cada mês (ver mes_numero)
+        entradas: arrays das colunas de entrada (ENTRADAS): C, D, G, J, L, N, P, S e U
+        niveis: coluna B, apenas informativa
+        honorarios: percentual de honorários de sucumbência (J2)
+    """
+    meses = np.asarray(meses, dtype=np.int64)
+    c = {nome: np.asarray(entradas[nome], dtype=np.float64) for nome in ENTRADAS}
+
+    e = c['venc_devido'] - c['venc_pago']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = np.where(c['venc_pago'] != 0, c['gam_pago'] / c['venc_pago'], 0.0)
+    h = c['venc_devido'] * f
+    i = h - c['gam_pago']
+    k = e * c['titulacao_pct']
+    m = e * c['gcet_pct']
+    o = e * c['adic_pct']
+    dezembro = (meses % 12) == 11
+    q = np.where(dezembro, e + i, e * c['ferias_pct'])
+    r = e + i + k + m + o + q
+    t = r * c['indice']
+    v = t * c['juros_pct'] / 100
+    w = t + v
+
+    colunas = dict(c)
+    colunas.update({
+        'venc_diferenca': e, 'gam_pct': f, 'gam_devido': h, 'gam_diferenca': i,
+        'titulacao_diferenca': k, 'gcet_diferenca': m, 'adic_diferenca': o,
+        'ferias_diferenca': q, 'diferenca_total': r, 'valor_corrigido': t,
+        'juros': v, 'principal_juros': w,
+    })
+    if niveis is None:
+        niveis = np.zeros(len(meses), dtype=np.int64)
+    return ResultadoDescompressao(meses, colunas, niveis, honorarios)
+
+
+def montar_entradas(table: FichasTable, data_inicio: date, data_fim: date,
+                    tabela_paga: TabelaSalarial, tabela_correta: TabelaSalarial,
+                    indices: Optional[np.ndarray] = None, juros_pct: Optional[np.ndarray] = None,
+                    classificador: Optional[ClassificadorVerbas] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]:
+    """
+    Entradas de ModeloDescNovo a partir das fichas financeiras: os valores
+    pagos de cada categoria de verba somados por mês, os percentuais sobre o
+    vencimento pago e o vencimento devido (coluna D): o valor de
+    tabela_correta na referência em que o vencimento pago foi encontrado em
+    tabela_paga, ou o próprio vencimento pago quando não foi.
+    Retorna (meses, entradas, niveis).
+    """
+    meses = np.arange(mes_numero(data_inicio), mes_numero(data_fim) + 1)
+    categorias = table.categorias(classificador)
+    pagos = {
+        categoria: table.monthly_totals(data_inicio, data_fim, categorias == categoria)
+        for categoria in ('vencimentos', 'gam', 'titulacao', 'gcet', 'adic_tem_serv', 'ferias')
+    }
+    venc_pago = pagos['vencimentos']
+
+    def percentual(valores):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(venc_pago != 0, valores / venc_pago, 0.0)
+
+    niveis = tabela_paga.nivel(meses, venc_pago)
+    devido = tabela_correta.valor(meses, niveis)
+    # Sem nível identificado não há diferença a apurar no mês
+    venc_devido = np.where(np.isnan(devido), venc_pago, devido)
+
+    entradas = {
+        'venc_pago': venc_pago,
+        'venc_devido': venc_devido,
+        'gam_pago': pagos['gam'],
+        'titulacao_pct': percentual(pagos['titulacao']),
+        'gcet_pct': percentual(pagos['gcet']),
+        'adic_pct': percentual(pagos['adic_tem_serv']),
+        'ferias_pct': percentual(pagos['ferias']),
+        'indice': np.ones(len(meses)) if indices is None else np.asarray(indices, dtype=np.float64),
+        'juros_pct': np.zeros(len(meses)) if juros_pct is None else np.asarray(juros_pct, dtype=np.float64),
+    }
+    return meses, entradas, niveis
+
+
+def indices_atualizacao(fatores, meses: np.ndarray,
+                         para: Optional[date] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coluna S (índice de atualização) a partir dos fatores acumulados do JEBR
+    (jebr.get_fatores()): o fator que leva o valor de cada mês até `para`,
+    por padrão o último mês com índice importado. A correção é mês a mês:
+    meses sem índice ficam com 1,0 (sem correção). Retorna (indices,
+    sem_indice), sendo sem_indice a máscara desses meses. ValueError se não
+    houver índice importado ou se o próprio mês `para` não tiver índice.
+    """
+    para = para or fatores.ultimo_mes
+    if para is None:
+        raise ValueError('Nenhum índice JEBR importado')
+    cobertos = fatores.cobertos(meses)
+    indices = np.ones(len(meses))
+    if cobertos.any():
+        indices[cobertos] = fatores.corrigir_serie(indices[cobertos], np.asarray(meses)[cobertos], para)
+    else:
+        fatores.fator(para)  # valida `para` mesmo sem nenhum mês a corrigir
+    return indices, ~cobertos
+
+
+_tabelas: Dict[Tuple[str, float], Tuple[TabelaSalarial, TabelaSalarial]] = {}
+_tabelas_lock = threading.Lock()
+
+
+def get_tabelas(caminho: Optional[str] = None) -> Tuple[TabelaSalarial, TabelaSalarial]:
+    """
+    (EvolSalarial, EvolSalarialCorreta) lidas da planilha uma vez por processo
+    (recarregadas se o arquivo mudar). A tabela correta é recalculada pelas
+    fórmulas a partir da Ref 1, e não lida dos valores salvos.
+    """
+    caminho = caminho or api_config.get('planilha_descompressao', PLANILHA_PADRAO)
+    chave = (caminho, os.path.getmtime(caminho))
+    if chave not in _tabelas:
+        with _tabelas_lock:
+            if chave not in _tabelas:
+                paga = TabelaSalarial.carregar(caminho, 'EvolSalarial')
+                correta = TabelaSalarial.carregar(caminho, 'EvolSalarialCorreta').descomprimida()
+                _tabelas.clear()
+                _tabelas[chave] = (paga, correta)
+    return _tabelas[chave]
+
+
+def conferir_planilha(caminho: Optional[str] = None, tolerancia: float = 1e-6) -> Dict[str, Any]:
+    """
+    Confere o motor contra os resultados salvos na planilha: recalcula as
+    células com fórmula de EvolSalarialCorreta e de ModeloDescNovo a partir
+    das entradas da própria planilha e lista as divergências. A coluna D é
+    entrada na planilha e não é conferida aqui. Na planilha distribuída as
+    entradas de ModeloDescNovo são zero: a conferência dessa aba só é
+    significativa com uma cópia preenchida e recalculada no Excel (caminho).
+    """
+    caminho = caminho or api_config.get('planilha_descompressao', PLANILHA_PADRAO)
+    divergencias = []
+    conferidas = 0
+
+    def conferir(aba, referencia, calculado, salvo):
+        nonlocal conferidas
+        conferidas += 1
+        if not np.isclose(calculado, salvo, rtol=tolerancia, atol=tolerancia):
+            divergencias.append({'aba': aba, 'celula': referencia, 'calculado': calculado, 'planilha': salvo})
+
+    # EvolSalarialCorreta: cada referência é a anterior + 5%, a partir da Ref 1
+    correta = TabelaSalarial.carregar(caminho, 'EvolSalarialCorreta')
+    recalculada = correta.descomprimida()
+    posicao = {mes: i for i, mes in enumerate(correta.meses.tolist())}
+    mes_da_linha = {}
+    for numero, coluna, valor, formula in iter_celulas(caminho, 'EvolSalarialCorreta'):
+        if coluna == 0 and isinstance(valor, float):
+            mes_da_linha[numero] = mes_numero(data_excel(valor))
+        elif formula is not None and isinstance(valor, float) and numero in mes_da_linha:
+            calculado = recalculada.valores[posicao[mes_da_linha[numero]], coluna - 1]
+            conferir('EvolSalarialCorreta', f"{letras_coluna(coluna)}{numero}", float(calculado), valor)
+
+    # ModeloDescNovo: linhas mensais a partir da 10 e totais logo abaixo
+    celulas: Dict[str, Tuple[Any, Optional[str]]] = {
+        f"{letras_coluna(coluna)}{numero}": (valor, formula)
+        for numero, coluna, valor, formula in iter_celulas(caminho, 'ModeloDescNovo')
+    }
+
+    linhas = []
+    numero = 10
+    while isinstance(celulas.get(f"A{numero}", (None,))[0], float):
+        linhas.append(numero)
+        numero += 1
+    if linhas:
+        def coluna(letra, padrao=0.0):
+            return np.array([
+                v if isinstance(v, float) else padrao
+                for v in (celulas.get(f"{letra}{n}", (None, None))[0] for n in linhas)
+            ])
+
+        meses = np.array([mes_numero(data_excel(celulas[f"A{n}"][0])) for n in linhas])
+        entradas = {nome: coluna(COLUNAS[nome]) for nome in ENTRADAS}
+        honorarios = celulas.get('J2', (HONORARIOS_SUCUMBENCIA, None))[0]
+        resultado = calcular_descompressao(meses, entradas, honorarios=float(honorarios or 0))
+        for nome, letra in COLUNAS.items():
+            for i, n in enumerate(linhas):
+                valor, formula = celulas.get(f"{letra}{n}", (None, None))
+                if formula is not None and isinstance(valor, float):
+                    conferir('ModeloDescNovo', f"{letra}{n}", float(resultado.colunas[nome][i]), valor)
+        ultima = linhas[-1] + 1
+        for letra, total in (('T', resultado.total_corrigido), ('V', resultado.total_juros),
+                             ('W', resultado.total_atualizado)):
+            valor, formula = celulas.get(f"{letra}{ultima}", (None, None))
+            if formula is not None and isinstance(valor, float):
+                conferir('ModeloDescNovo', f"{letra}{ultima}", total, valor)
+        for linha, total in ((ultima + 1, resultado.honorarios), (ultima + 2, resultado.total_devido)):
+            valor, formula = celulas.get(f"W{linha}", (None, None))
+            if formula is not None and isinstance(valor, float):
+                conferir('ModeloDescNovo', f"W{linha}", total, valor)
+
+    return {'celulas_conferidas': conferidas, 'divergencias': divergencias}
@@ -1,113 +1,308 @@
 import requests
 from requests.auth import HTTPBasicAuth
 from fichas_api_config import api_config
+import logging
 import urllib3
 import sys
 from datetime import datetime, date
-from typing import Optional, Dict, List, Any
+from typing import Optional, Callable, Dict, Iterable, List, Any
+from fichas_auth import FichasTokenManager
+from fichas_http import api_base_url, get_session, get_timeout
+from fichas_cache import FichasCache, build_backend
+from fichas_verbas import get_classificador
+from fichas_stream import carregar_resposta
+from vencimento_metrics import count_api_call, stage
 
 # Disable SSL warnings for sandbox
 urllib3.disable_warnings()
 
+logger = logging.getLogger(__name__)
+
+# Chaves de 'valores_mensais' nos pagamentos de extrair_pagamentos_periodo
+MESES = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+
+
+def _solicitar_token() -> str:
+    """Realiza o login na API de Fichas e retorna um novo token"""
+    url = f"{api_base_url()}/login"
+    payload = {
+        "email": api_config['email'],
+        "password": api_config['password']
+    }
+    with stage('auth'):
+        response = get_session().post(
+            url,
+            json=payload,
+            timeout=get_timeout()
+        )
+        count_api_call('/login', response.status_code, len(response.content))
+        response.raise_for_status()
+        return response.json()['token']
+
+
+def extrair_pagamentos_periodo(servidor_data: Optional[Dict[str, Any]], data_inicio: date,
+                               data_fim: date) -> Optional[List[Dict[str, Any]]]:
+    """
+    Extrai das fichas financeiras de uma resposta de busca_matricula os
+    pagamentos dos anos do período informado.
+    Usado tanto pelo cliente síncrono quanto pelo assíncrono.
+    """
+    if not servidor_data or 'servidor' not in servidor_data:
+        logger.warning("Servidor não encontrado na resposta de busca_matricula")
+        return None
+    
+    try:
+        fichas_financeiras = servidor_data['servidor'].get('fichasFinanceiras', [])
+        pagamentos = []
+        
+        # Filter financial records by year range
+        year_inicio = data_inicio.year
+        year_fim = data_fim.year
+        
+        for ficha in fichas_financeiras:
+            ano_ref = ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')
+            if ano_ref and year_inicio <= ano_ref <= year_fim:
+                # Extract payment items from this financial record
+                itens = ficha.get('fichasFinanceirasItens', [])
+                for item in itens:
+                    # Convert financial item to payment format
+                    pagamento = {
+                        'ano': ano_ref,
+                        'codrubrica': item.get('FICHA_FINANCEIRA_ITEM_COD_VERBA'),
+                        'nome_verba': item.get('FICHA_FINANCEIRA_ITEM_NOME_VERBA'),
+                        'valor_total': item.get('FICHA_FINANCEIRA_ITEM_TOTAL', 0),
+                        'valores_mensais': {
+                            'jan': item.get('FICHA_FINANCEIRA_ITEM_JAN', 0),
+                            'fev': item.get('FICHA_FINANCEIRA_ITEM_FEV', 0),
+                            'mar': item.get('FICHA_FINANCEIRA_ITEM_MAR', 0),
+                            'abr': item.get('FICHA_FINANCEIRA_ITEM_ABR', 0),
+                            'mai': item.get('FICHA_FINANCEIRA_ITEM_MAI', 0),
+                            'jun': item.get('FICHA_FINANCEIRA_ITEM_JUN', 0),
+                            'jul': item.get('FICHA_FINANCEIRA_ITEM_JUL', 0),
+                            'ago': item.get('FICHA_FINANCEIRA_ITEM_AGO', 0),
+                            'set': item.get('FICHA_FINANCEIRA_ITEM_SET', 0),
+                            'out': item.get('FICHA_FINANCEIRA_ITEM_OUT', 0),
+                            'nov': item.get('FICHA_FINANCEIRA_ITEM_NOV', 0),
+                            'dez': item.get('FICHA_FINANCEIRA_ITEM_DEZ', 0),
+                            'dec_terceiro': item.get('FICHA_FINANCEIRA_ITEM_DEC_TERCEIRO', 0)
+                        }
+                    }
+                    pagamentos.append(pagamento)
+        
+        return pagamentos
+        
+    except Exception:
+        logger.exception("Erro ao processar pagamentos")
+        return None
+
+
+def juntar_respostas(respostas: Iterable[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Junta respostas de busca_matricula de anos diferentes do mesmo servidor em
+    uma só, com as fichas do ano mais recente para o mais antigo, como a API.
+    Retorna None se nenhuma resposta trouxe o servidor.
+    """
+    resultado = None
+    fichas = {}
+    for resposta in respostas:
+        if not resposta or 'servidor' not in resposta:
+            continue
+        if resultado is None:
+            resultado = {**resposta, 'servidor': dict(resposta['servidor'])}
+        for ficha in resposta['servidor'].get('fichasFinanceiras', []):
+            fichas[ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')] = ficha
+    if resultado is not None:
+        resultado['servidor']['fichasFinanceiras'] = [
+            fichas[ano] for ano in sorted(fichas, key=lambda ano: ano or 0, reverse=True)
+        ]
+    return resultado
+
+
+# Token compartilhado por todas as instâncias do processo
+shared_token_manager = FichasTokenManager(
+    _solicitar_token,
+    ttl=api_config.get('token_ttl', 1800),
+    refresh_margin=api_config.get('token_refresh_margin', 60)
+)
+
+# Cache das respostas compartilhado por todas as instâncias do processo
+shared_cache = FichasCache(
+    build_backend(api_config),
+    ttl_current=api_config.get('cache_ttl_current', 900),
+    ttl_closed=api_config.get('cache_ttl_closed', 7 * 24 * 3600),
+    lock_timeout=api_config.get('cache_lock_timeout', 60)
+)
+
+
 class FichasAPI_Manager:
-    def __init__(self):
+    def __init__(self, token_manager: Optional[FichasTokenManager] = None,
+                 cache: Optional[FichasCache] = None):
+        self.token_manager = token_manager or shared_token_manager
+        self.cache = cache or shared_cache
         self.token = None
     
-    def get_auth_token(self, display_token=False):
-        """Authenticates to Fichas API and stores token"""
+    def get_auth_token(self, display_token=False, force=False):
+        """
+        Obtém o token de autenticação compartilhado.
+        Só autentica na API quando o token em cache expirou ou se force=True.
+        """
         try:
-            url = f"https://{api_config['host']}/login"
-            payload = {
-                "email": api_config['email'],
-                "password": api_config['password']
-            }
-            headers = {
-                "Content-Type": "application/json"
-            }
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                verify=False,
-                timeout=10
-            )
-            response.raise_for_status()
-            self.token = response.json()['token']
+            self.token = self.token_manager.get_token(force=force)
             
             if display_token:
-                print("\n🔑 Authentication Token:")
-                print("-"*50)
-                print(self.token)
-                print("-"*50)
+                # Só um prefixo: o token completo nunca vai para a saída nem para os logs
+                logger.info("Token de autenticação obtido: %s... (%d caracteres)", self.token[:4], len(self.token))
             return True
             
-        except Exception as e:
-            print(f"❌ Authentication failed: {str(e)}")
+        except Exception:
+            logger.exception("Falha na autenticação")
             return False
         
-    def busca_cpf(self, cpf):
+    def _post_autenticado(self, path: str, payload: Dict[str, Any],
+                          leitor: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Envia um POST autenticado para a API.
+        Em caso de 401 o token é descartado e a requisição é repetida uma única vez.
+        Com `leitor`, o corpo da resposta não é decodificado com response.json():
+        ele é entregue ao leitor como fluxo (response.raw), à medida que chega.
+        """
+        url = f"{api_base_url()}{path}"
+        for tentativa in range(2):
+            token = self.token_manager.get_token()
+            self.token = token
+            headers = {
+                "X-Auth-Token": f"{token}"
+            }
+            with stage('fetch'):
+                response = get_session().post(
+                    url,
+                    json=payload,
+                    headers=headers,
+                    timeout=get_timeout(),
+                    stream=leitor is not None
+                )
+                with response:
+                    if response.status_code == 401 and tentativa == 0:
+                        count_api_call(path, response.status_code)
+                        self.token_manager.invalidate(token)
+                        continue
+                    if response.status_code >= 400:
+                        count_api_call(path, response.status_code)
+                    response.raise_for_status()
+                    with stage('parse'):
+                        if leitor is None:
+                            dados = response.json()
+                        else:
+                            response.raw.decode_content = True
+                            dados = leitor(response.raw)
+                    # Bytes recebidos (no fluxo, os lidos do corpo, antes da descompressão)
+                    count_api_call(path, response.status_code,
+                                   len(response.content) if leitor is None else response.raw.tell())
+                    return dados
+
+    def busca_cpf(self, cpf, force_refresh: bool = False):
         """
         Busca servidores pelo CPF informado.
         Retorna os dados dos servidores encontrados.
+        Usa o cache local, exceto se force_refresh=True.
         """
+        return self.cache.get_or_fetch(
+            FichasCache.key_cpf(cpf),
+            lambda: self._busca_cpf_api(cpf),
+            force_refresh=force_refresh
+        )
+
+    def _busca_cpf_api(self, cpf):
+        """Consulta a API por CPF, sem passar pelo cache"""
         # Autentica antes de buscar
         if not self.get_auth_token():
-            print("❌ Não foi possível autenticar na API.")
+            logger.error("Não foi possível autenticar na API")
             return None
         try:
-            url = f"https://{api_config['host']}/servidor/busca/cpf"
-            payload = {
-                "cpf": cpf
-            }
-            headers = {
-                "Content-Type": "application/json",
-                "X-Auth-Token": f"{self.token}"
-            }
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                verify=False,
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"❌ Erro na busca por CPF: {str(e)}")
+            return self._post_autenticado('/servidor/busca/cpf', {"cpf": cpf})
+        except Exception:
+            logger.exception("Erro na busca por CPF")
             return None
 
-    def busca_matricula(self, matricula) -> Optional[Dict[str, Any]]:
+    def busca_matricula(self, matricula, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
         """
         Busca servidor pela matrícula informada.
         Aceita tanto int quanto string para flexibilidade.
         Retorna os dados do servidor encontrado.
+        Usa o cache local, exceto se force_refresh=True.
+        """
+        return self.cache.get_or_fetch(
+            FichasCache.key_matricula(matricula),
+            lambda: self._busca_matricula_api(matricula),
+            force_refresh=force_refresh
+        )
+
+    def _busca_matricula_api(self, matricula, ano: Optional[int] = None, anos: Optional[Iterable[int]] = None,
+                             verbas: Optional[Iterable] = None) -> Optional[Dict[str, Any]]:
+        """
+        Consulta a API por matrícula, sem passar pelo cache.
+        A resposta é lida em fluxo (fichas_stream): só os campos usados no cálculo
+        e as fichas dos `anos` e itens das `verbas` informados são mantidos.
+        Com `ano`, a própria API é consultada só por aquele ano.
         """
         if not self.get_auth_token():
-            print("❌ Não foi possível autenticar na API.")
+            logger.error("Não foi possível autenticar na API")
             return None
+        payload = {"matricula": matricula}
+        if ano is not None:
+            payload[api_config['busca_matricula_campo_ano']] = ano
         try:
-            url = f"https://{api_config['host']}/servidor/busca/matricula"
-            payload = {
-                "matricula": matricula
-            }
-            headers = {
-                "Content-Type": "application/json",
-                "X-Auth-Token": f"{self.token}"
-            }
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                verify=False,
-                timeout=10
+            return self._post_autenticado(
+                '/servidor/busca/matricula',
+                payload,
+                leitor=lambda fluxo: carregar_resposta(fluxo, anos=anos, verbas=verbas)
             )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"❌ Erro na busca por matrícula: {str(e)}")
+        except Exception:
+            logger.exception("Erro na busca por matrícula %s", matricula)
             return None
 
-    def busca_pagamentos_periodo(self, matricula, data_inicio: date, data_fim: date) -> Optional[List[Dict[str, Any]]]:
+    def busca_matricula_anos(self, matricula, anos: Iterable[int], force_refresh: bool = False,
+                             verbas: Optional[Iterable] = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca servidor pela matrícula trazendo apenas as fichas dos anos
+        informados (e, se `verbas` for informado, só os itens dessas verbas).
+
+        Se a API aceita o filtro por ano (api_config['busca_matricula_campo_ano']
+        com o nome do campo), cada ano é uma consulta própria, com cache próprio.
+        Caso contrário a resposta completa é filtrada enquanto é lida.
+        """
+        anos = sorted(set(anos))
+        campo_ano = api_config.get('busca_matricula_campo_ano')
+        if not campo_ano:
+            return self.cache.get_or_fetch(
+                FichasCache.key_matricula_anos(matricula, anos, verbas),
+                lambda: self._busca_matricula_api(matricula, anos=anos, verbas=verbas),
+                force_refresh=force_refresh
+            )
+        
+        # Se a API ignorar o filtro, as fichas de outros anos são descartadas na leitura
+        respostas = [
+            self.cache.get_or_fetch(
+                FichasCache.key_matricula_anos(matricula, [ano], verbas),
+                lambda ano=ano: self._busca_matricula_api(matricula, ano, anos=[ano], verbas=verbas),
+                force_refresh=force_refresh
+            )
+            for ano in anos
+        ]
+        return juntar_respostas(respostas)
+
+    def invalidar_cache(self, matricula=None, cpf=None):
+        """
+        Remove do cache local os dados de uma matrícula (a resposta completa e
+        as consultas por ano e verba) e/ou de um CPF
+        """
+        if matricula is not None:
+            self.cache.invalidate_matricula(matricula)
+        if cpf is not None:
+            self.cache.invalidate(FichasCache.key_cpf(cpf))
+
+    def busca_pagamentos_periodo(self, matricula, data_inicio: date, data_fim: date,
+                                 servidor_data: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
         """
         Busca pagamentos de um servidor em um período específico.
         Extrai os dados das fichas financeiras do servidor.
@@ -116,59 +311,15 @@ class FichasAPI_Manager:
             matricula: Matrícula do servidor (int ou string)
             data_inicio: Data de início do período (YYYY-MM-DD)
             data_fim: Data de fim do período (YYYY-MM-DD)
+            servidor_data: Resposta de busca_matricula já obtida (evita nova consulta)
             
         Returns:
             Lista de pagamentos ou None em caso de erro
         """
-        # First get the server data which includes financial records
-        servidor_data = self.busca_matricula(matricula)
-        if not servidor_data or 'servidor' not in servidor_data:
-            print("❌ Servidor não encontrado.")
-            return None
-        
-        try:
-            fichas_financeiras = servidor_data['servidor'].get('fichasFinanceiras', [])
-            pagamentos = []
-            
-            # Filter financial records by year range
-            year_inicio = data_inicio.year
-            year_fim = data_fim.year
-            
-            for ficha in fichas_financeiras:
-                ano_ref = ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')
-                if ano_ref and year_inicio <= ano_ref <= year_fim:
-                    # Extract payment items from this financial record
-                    itens = ficha.get('fichasFinanceirasItens', [])
-                    for item in itens:
-                        # Convert financial item to payment format
-                        pagamento = {
-                            'ano': ano_ref,
-                            'codrubrica': item.get('FICHA_FINANCEIRA_ITEM_COD_VERBA'),
-                            'nome_verba': item.get('FICHA_FINANCEIRA_ITEM_NOME_VERBA'),
-                            'valor_total': item.get('FICHA_FINANCEIRA_ITEM_TOTAL', 0),
-                            'valores_mensais': {
-                                'jan': item.get('FICHA_FINANCEIRA_ITEM_JAN', 0),
-                                'fev': item.get('FICHA_FINANCEIRA_ITEM_FEV', 0),
-                                'mar': item.get('FICHA_FINANCEIRA_ITEM_MAR', 0),
-                                'abr': item.get('FICHA_FINANCEIRA_ITEM_ABR', 0),
-                                'mai': item.get('FICHA_FINANCEIRA_ITEM_MAI', 0),
-                                'jun': item.get('FICHA_FINANCEIRA_ITEM_JUN', 0),
-                                'jul': item.get('FICHA_FINANCEIRA_ITEM_JUL', 0),
-                                'ago': item.get('FICHA_FINANCEIRA_ITEM_AGO', 0),
-                                'set': item.get('FICHA_FINANCEIRA_ITEM_SET', 0),
-                                'out': item.get('FICHA_FINANCEIRA_ITEM_OUT', 0),
-                                'nov': item.get('FICHA_FINANCEIRA_ITEM_NOV', 0),
-                                'dez': item.get('FICHA_FINANCEIRA_ITEM_DEZ', 0),
-                                'dec_terceiro': item.get('FICHA_FINANCEIRA_ITEM_DEC_TERCEIRO', 0)
-                            }
-                        }
-                        pagamentos.append(pagamento)
-            
-            return pagamentos
-            
-        except Exception as e:
-            print(f"❌ Erro ao processar pagamentos: {str(e)}")
-            return None
+        # Only the years of the period are requested (see busca_matricula_anos)
+        if servidor_data is None:
+            servidor_data = self.busca_matricula_anos(matricula, range(data_inicio.year, data_fim.year + 1))
+        return extrair_pagamentos_periodo(servidor_data, data_inicio, data_fim)
 
     def processar_pagamentos_para_calculo(self, pagamentos: List[Dict[str, Any]]) -> Dict[str, List]:
         """
@@ -181,29 +332,14 @@ class FichasAPI_Manager:
         Returns:
             Dicionário organizado por categorias de verbas
         """
-        # Mapeamento de códigos de rubrica para categorias
-        rubricas_map = {
-            101: 'vencimentos',
-            150: 'gam',
-            126: 'titulacao',
-            175: 'titulacao',
-            141: 'gcet',
-            156: 'gcet',
-            235: 'gcet',
-            136: 'adic_tem_serv',
-            212: 'ferias'
-        }
+        # Regras de classificação compartilhadas (código de rubrica -> categoria)
+        classificador = get_classificador()
         
         # Inicializar categorias
         resultado = {
             'nome': '',
             'matricula': 0,
-            'vencimentos': [],
-            'gam': [],
-            'titulacao': [],
-            'gcet': [],
-            'adic_tem_serv': [],
-            'ferias': []
+            **classificador.resultado_vazio()
         }
         
         # Processar cada pagamento
@@ -214,17 +350,17 @@ class FichasAPI_Manager:
             if not resultado['matricula'] and 'matricula' in pagamento:
                 resultado['matricula'] = pagamento['matricula']
             
-            # Categorizar por código de rubrica
+            # Categorizar pelo código de rubrica e, se não houver regra para ele, pelo nome
             cod_rubrica = pagamento.get('codrubrica', 0)
-            if cod_rubrica in rubricas_map:
-                categoria = rubricas_map[cod_rubrica]
-                # Formatear dados para compatibilidade com função existente
-                verba_formatada = (
-                    pagamento.get('referencia', ''),
-                    cod_rubrica,
-                    float(pagamento.get('valor', 0))
-                )
-                resultado[categoria].append(verba_formatada)
+            categoria = classificador.classificar(cod_rubrica, pagamento.get('nome_verba'))
+            if categoria is None:
+                continue
+            # Uma entrada (referência MM/AAAA, código, valor) por mês pago
+            valores_mensais = pagamento.get('valores_mensais') or {}
+            for mes, chave in enumerate(MESES, 1):
+                valor = float(valores_mensais.get(chave) or 0)
+                if valor:
+                    resultado[categoria].append((f"{mes:02d}/{pagamento.get('ano')}", cod_rubrica, valor))
         
         return resultado
 
@@ -241,45 +377,48 @@ class FichasAPI_Manager:
             Dados organizados para o cálculo ou None em caso de erro
         """
         try:
-            # Buscar dados do servidor
-            servidor = self.busca_matricula(matricula)
+            # Buscar dados do servidor: só os anos do período e as verbas classificadas
+            # (regras por nome podem reconhecer qualquer código, então não filtram)
+            classificador = get_classificador()
+            verbas = None
+            if not classificador.tem_padroes:
+                verbas = [codigo for codigo in classificador.codigos if isinstance(codigo, int)]
+            servidor = self.busca_matricula_anos(matricula, range(data_inicio.year, data_fim.year + 1), verbas=verbas)
             if not servidor:
-                print(f"❌ Servidor com matrícula {matricula} não encontrado.")
+                logger.warning("Servidor com matrícula %s não encontrado", matricula)
                 return None
             
             # Buscar pagamentos do período
-            pagamentos = self.busca_pagamentos_periodo(matricula, data_inicio, data_fim)
+            pagamentos = self.busca_pagamentos_periodo(matricula, data_inicio, data_fim, servidor_data=servidor)
             if not pagamentos:
-                print(f"❌ Nenhum pagamento encontrado para o período.")
+                logger.warning("Nenhum pagamento encontrado para %s no período", matricula)
                 return None
             
             # Processar pagamentos para formato compatível
             dados_processados = self.processar_pagamentos_para_calculo(pagamentos)
             
             # Adicionar informações do servidor
-            dados_processados['nome'] = servidor.get('nome', '')
+            dados_processados['nome'] = servidor['servidor'].get('SERVIDOR_NOME', '')
             dados_processados['matricula'] = matricula
             
-            print(f"✅ Dados obtidos com sucesso:")
-            print(f"   - Servidor: {dados_processados['nome']}")
-            print(f"   - Matrícula: {matricula}")
-            print(f"   - Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}")
-            print(f"   - Total de pagamentos: {len(pagamentos)}")
-            print(f"   - Vencimentos: {len(dados_processados['vencimentos'])}")
-            print(f"   - GAM: {len(dados_processados['gam'])}")
-            print(f"   - Titulação: {len(dados_processados['titulacao'])}")
-            print(f"   - GCET: {len(dados_processados['gcet'])}")
-            print(f"   - Adic. Tempo Serviço: {len(dados_processados['adic_tem_serv'])}")
-            print(f"   - Férias: {len(dados_processados['ferias'])}")
+            logger.info(
+                "Dados para cálculo obtidos: matrícula %s, %s a %s, %d pagamentos",
+                matricula, data_inicio.strftime('%d/%m/%Y'), data_fim.strftime('%d/%m/%Y'), len(pagamentos),
+                extra={'categorias': {
+                    categoria: len(dados_processados[categoria])
+                    for categoria in ('vencimentos', 'gam', 'titulacao', 'gcet', 'adic_tem_serv', 'ferias')
+                }}
+            )
             
             return dados_processados
             
-        except Exception as e:
-            print(f"❌ Erro ao obter dados para cálculo: {str(e)}")
+        except Exception:
+            logger.exception("Erro ao obter dados para cálculo de %s", matricula)
             return None
 
 def main():
     """Main program execution"""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     print("\n" + "="*50)
     print("Tentativa da conexão com a API de fichas financeiras")
     print("Henrique Teixeira Advogados Associados")
@@ -299,7 +438,7 @@ def main():
         choice = input("Select option (1-6): ").strip()
         
         if choice == "1":
-            if fichas_api.get_auth_token(display_token=True):
+            if fichas_api.get_auth_token(display_token=True, force=True):
                 print("✅ Authentication successful!")
 
         elif choice == "2":
@@ -0,0 +1,166 @@
+"""
+Cliente assíncrono (asyncio + httpx) da API de Fichas Financeiras.
+
+Oferece os mesmos métodos de FichasAPI_Manager, mas permite buscar várias
+matrículas ao mesmo tempo. Um semáforo limita o número de requisições
+simultâneas, e o token e o cache são os mesmos do cliente síncrono.
+
+Uso:
+    async with FichasAPIAsync() as api:
+        resultados = await api.busca_matriculas(['00292553-03', '00123456-01'])
+"""
+
+import asyncio
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from fichas_api_config import api_config
+from fichas_api import (
+    extrair_pagamentos_periodo, juntar_respostas, shared_cache, shared_token_manager
+)
+from fichas_stream import reduzir_resposta
+from fichas_auth import FichasTokenManager
+from fichas_cache import FichasCache
+from fichas_http import api_base_url, get_timeout
+from vencimento_metrics import count_api_call, stage
+
+logger = logging.getLogger(__name__)
+
+
+class FichasAPIAsync:
+    """Cliente assíncrono com concorrência limitada"""
+
+    def __init__(self, max_concurrency: Optional[int] = None,
+                 token_manager: Optional[FichasTokenManager] = None,
+                 cache: Optional[FichasCache] = None):
+        self.max_concurrency = max_concurrency or api_config.get('async_max_concurrency', 8)
+        self.token_manager = token_manager or shared_token_manager
+        self.cache = cache or shared_cache
+        self._semaphore = None
+        self._client = None
+
+    async def __aenter__(self):
+        connect_timeout, read_timeout = get_timeout()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=api_base_url(),
+            headers={"Content-Type": "application/json"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # Novas tentativas do httpx cobrem apenas falhas de conexão
+            transport=httpx.AsyncHTTPTransport(
+                retries=api_config.get('max_retries', 3),
+                verify=api_config.get('verify_ssl', False),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+
+    async def _get_token(self) -> str:
+        # O login é síncrono e protegido por lock; roda fora do event loop
+        return await asyncio.to_thread(self.token_manager.get_token)
+
+    async def _post_autenticado(self, path: str, payload: Dict[str, Any]) -> Any:
+        """
+        POST autenticado limitado pelo semáforo.
+        Em caso de 401 o token é descartado e a requisição é repetida uma única vez.
+        """
+        async with self._semaphore:
+            for tentativa in range(2):
+                token = await self._get_token()
+                with stage('fetch'):
+                    response = await self._client.post(
+                        path,
+                        json=payload,
+                        headers={"X-Auth-Token": f"{token}"}
+                    )
+                count_api_call(path, response.status_code, len(response.content))
+                if response.status_code == 401 and tentativa == 0:
+                    self.token_manager.invalidate(token)
+                    continue
+                response.raise_for_status()
+                with stage('parse'):
+                    return response.json()
+
+    async def busca_cpf(self, cpf, force_refresh: bool = False):
+        """Busca servidores pelo CPF informado"""
+        async def fetch():
+            try:
+                return await self._post_autenticado('/servidor/busca/cpf', {"cpf": cpf})
+            except Exception:
+                logger.exception("Erro na busca por CPF")
+                return None
+
+        return await self.cache.aget_or_fetch(FichasCache.key_cpf(cpf), fetch, force_refresh=force_refresh)
+
+    async def busca_matricula(self, matricula, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Busca servidor pela matrícula informada. A resposta é reduzida como no
+        cliente síncrono, que grava a mesma chave de cache no mesmo formato.
+        """
+        async def fetch():
+            try:
+                resposta = await self._post_autenticado('/servidor/busca/matricula', {"matricula": matricula})
+                return reduzir_resposta(resposta)
+            except Exception:
+                logger.exception("Erro na busca por matrícula %s", matricula)
+                return None
+
+        return await self.cache.aget_or_fetch(
+            FichasCache.key_matricula(matricula), fetch, force_refresh=force_refresh
+        )
+
+    async def busca_matricula_anos(self, matricula, anos: Iterable[int], force_refresh: bool = False,
+                                   verbas: Optional[Iterable] = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca servidor pela matrícula só com as fichas dos anos (e verbas)
+        informados, no mesmo formato reduzido de FichasAPI_Manager.busca_matricula_anos
+        """
+        anos = sorted(set(anos))
+        campo_ano = api_config.get('busca_matricula_campo_ano')
+
+        async def busca(anos_consulta, payload):
+            async def fetch():
+                try:
+                    resposta = await self._post_autenticado('/servidor/busca/matricula', payload)
+                    return reduzir_resposta(resposta, anos_consulta, verbas)
+                except Exception:
+                    logger.exception("Erro na busca por matrícula %s", matricula)
+                    return None
+
+            return await self.cache.aget_or_fetch(
+                FichasCache.key_matricula_anos(matricula, anos_consulta, verbas), fetch, force_refresh=force_refresh
+            )
+
+        if not campo_ano:
+            return await busca(anos, {"matricula": matricula})
+        respostas = await asyncio.gather(
+            *(busca([ano], {"matricula": matricula, campo_ano: ano}) for ano in anos)
+        )
+        return juntar_respostas(respostas)
+
+    async def busca_pagamentos_periodo(self, matricula, data_inicio: date, data_fim: date,
+                                       servidor_data: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Busca pagamentos de um servidor em um período específico"""
+        if servidor_data is None:
+            servidor_data = await self.busca_matricula_anos(matricula, range(data_inicio.year, data_fim.year + 1))
+        return extrair_pagamentos_periodo(servidor_data, data_inicio, data_fim)
+
+    async def busca_matriculas(self, matriculas: Iterable, force_refresh: bool = False) -> Dict[Any, Optional[Dict[str, Any]]]:
+        """
+        Busca várias matrículas em paralelo (limitado por max_concurrency).
+        Retorna um dicionário matrícula -> resposta (None em caso de erro).
+        """
+        matriculas = list(dict.fromkeys(matriculas))
+        resultados = await asyncio.gather(
+            *(self.busca_matricula(matricula, force_refresh=force_refresh) for matricula in matriculas)
+        )
+        return dict(zip(matriculas, resultados))
@@ -0,0 +1,76 @@
+"""
+Gerenciamento do token de autenticação da API de Fichas Financeiras.
+
+O token é compartilhado por todo o processo: cada instância de
+FichasAPI_Manager consulta o mesmo gerenciador, de modo que o login só é
+refeito quando o token está perto de expirar ou quando a API responde 401.
+"""
+
+import base64
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+
+class FichasTokenManager:
+    """Cache thread-safe do token de autenticação com expiração"""
+
+    def __init__(self, login: Callable[[], str], ttl: float = 1800, refresh_margin: float = 60):
+        """
+        Args:
+            login: Função que autentica na API e retorna o token
+            ttl: Validade assumida do token (segundos) quando ele não informa 'exp'
+            refresh_margin: Antecedência (segundos) para renovar antes de expirar
+        """
+        self._login = login
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.logins = 0
+
+    def _is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at - self.refresh_margin
+
+    def get_token(self, force: bool = False) -> str:
+        """
+        Retorna um token válido, autenticando apenas se necessário.
+        Chamadas concorrentes aguardam o mesmo login em andamento.
+        """
+        if not force and self._is_valid():
+            return self._token
+
+        stale = self._token
+        with self._lock:
+            # Outra thread pode ter renovado o token enquanto esperávamos
+            if self._is_valid() and (not force or self._token != stale):
+                return self._token
+
+            token = self._login()
+            self._token = token
+            self._expires_at = time.monotonic() + self._token_lifetime(token)
+            self.logins += 1
+            return token
+
+    def invalidate(self, token: Optional[str] = None):
+        """
+        Descarta o token atual (ex.: após um 401).
+        Se 'token' for informado, só descarta se ainda for o token em uso,
+        evitando que vários 401 simultâneos disparem vários logins.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _token_lifetime(self, token: str) -> float:
+        """Usa o campo 'exp' quando o token é um JWT; caso contrário, o TTL padrão"""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload))['exp']
+            return max(float(exp) - time.time(), 0.0)
+        except (IndexError, KeyError, TypeError, ValueError):
+            return self.ttl
@@ -0,0 +1,649 @@
+"""
+Cache local das respostas da API de Fichas Financeiras.
+
+A resposta de busca_matricula traz todas as fichas financeiras do servidor
+(cerca de 1 MB para uma carreira longa), então ela é guardada localmente e
+reaproveitada enquanto o mesmo caso é preparado. O backend é plugável:
+
+    - MemoryLRUCache: em memória, LRU limitado pelo tamanho em bytes (padrão)
+    - FileCacheBackend: arquivos JSON em um diretório privado, LRU limitado em bytes
+    - DjangoCacheBackend: framework de cache do Django (CACHES)
+
+Fichas de anos encerrados não mudam mais; uma resposta que não contém o ano
+corrente recebe o TTL longo (ttl_closed), as demais o TTL curto (ttl_current).
+
+Consultas idênticas simultâneas são agrupadas (single-flight): enquanto uma
+chave está sendo buscada, as demais chamadas com a mesma chave esperam e
+recebem o mesmo resultado, em vez de baixar a mesma resposta de novo. Entre
+threads do processo isso vale para qualquer backend; entre os processos
+(workers) da mesma máquina, FileCacheBackend (opcional, cache_backend='file')
+oferece uma trava por chave, e
+quem esperou por ela encontra a resposta já no cache. DjangoCacheBackend
+também trava entre processos, e entre máquinas, quando o alias é um cache
+compartilhado (banco de dados, Redis ou Memcached).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from vencimento_metrics import count_cache, count_coalesced
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_POLL_INTERVAL = 0.05
+LOCK_POLL_MAX_INTERVAL = 0.5
+
+
+def _estimate_size(value: Any) -> int:
+    """Tamanho aproximado do valor serializado, em bytes"""
+    try:
+        return len(json.dumps(value, default=str, ensure_ascii=False).encode('utf-8'))
+    except (TypeError, ValueError):
+        return len(pickle.dumps(value))
+
+
+class CacheBackend:
+    """Interface mínima de um backend de cache"""
+
+    # Backends vistos por vários processos oferecem try_lock/unlock por chave
+    shared_lock = False
+    # Backends que fazem I/O (disco, rede) são chamados fora do event loop
+    blocking = False
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def try_lock(self, key: str, ttl: float) -> Optional[Any]:
+        """
+        Tenta obter, sem esperar, a trava entre processos da chave. Retorna o
+        identificador a passar para unlock, ou None se outro processo a detém.
+        """
+        raise NotImplementedError
+
+    def unlock(self, key: str, handle: Any):
+        raise NotImplementedError
+
+
+class MemoryLRUCache(CacheBackend):
+    """Cache em memória do processo, com despejo LRU limitado por bytes"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+class DjangoCacheBackend(CacheBackend):
+    """
+    Usa um alias de settings.CACHES do Django. A trava é uma entrada criada
+    com cache.add que expira sozinha se o processo que a detém morrer; só é
+    usada nos backends em que add é atômico e visto por todos os processos
+    (banco, Redis e Memcached), e não no LocMemCache, que é de cada processo.
+
+    As chaves ficam em um namespace próprio ('<prefix>:<namespace>:'), para
+    que clear descarte só as entradas deste cache, e não as demais entradas
+    do alias (como os relatórios renderizados): clear troca o namespace, e as
+    entradas antigas expiram pelo TTL.
+    """
+
+    SHARED_LOCK_MODULES = (
+        'django.core.cache.backends.db',
+        'django.core.cache.backends.redis',
+        'django.core.cache.backends.memcached',
+    )
+
+    def __init__(self, alias: str = 'default', prefix: str = 'fichas'):
+        from django.core.cache import caches
+        self._cache = caches[alias]
+        self.prefix = prefix
+        self.shared_lock = type(self._cache).__module__ in self.SHARED_LOCK_MODULES
+        self.blocking = not type(self._cache).__module__.endswith('.locmem')
+
+    @property
+    def _namespace_key(self) -> str:
+        return f"{self.prefix}:namespace"
+
+    def _namespace(self) -> str:
+        namespace = self._cache.get(self._namespace_key)
+        if namespace is None:
+            # Sem namespace (primeiro uso ou entrada despejada): começa um novo, vazio
+            self._cache.add(self._namespace_key, uuid.uuid4().hex[:12], timeout=None)
+            namespace = self._cache.get(self._namespace_key)
+        return namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{self._namespace()}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(self._key(key))
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._cache.set(self._key(key), value, timeout=ttl)
+
+    def delete(self, key: str):
+        self._cache.delete(self._key(key))
+
+    def clear(self):
+        self._cache.set(self._namespace_key, uuid.uuid4().hex[:12], timeout=None)
+
+    def try_lock(self, key: str, ttl: float) -> Optional[Any]:
+        lock_key = self._key(f"lock:{key}")
+        token = uuid.uuid4().hex
+        if self._cache.add(lock_key, token, timeout=max(int(ttl), 1)):
+            return lock_key, token
+        return None
+
+    def unlock(self, key: str, handle: Any):
+        # Só remove a trava se ela ainda for desta chamada (pode ter expirado)
+        lock_key, token = handle
+        if self._cache.get(lock_key) == token:
+            self._cache.delete(lock_key)
+
+
+def default_cache_dir() -> str:
+    """Diretório do usuário para caches ($XDG_CACHE_HOME ou ~/.cache)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'htcalculus', 'fichas')
+
+
+class FileCacheBackend(CacheBackend):
+    """
+    Um arquivo JSON por chave em um diretório local, compartilhado pelos
+    processos do mesmo usuário na máquina. Com max_bytes, os arquivos usados
+    há mais tempo (mtime, atualizado a cada leitura) são removidos quando o
+    total passa do limite. A trava é um flock no arquivo .lock da chave,
+    liberado pelo sistema se o processo morrer (só em POSIX).
+
+    O diretório é criado com modo 0o700 e recusado se for de outro usuário ou
+    se outros usuários puderem escrever nele: as respostas trazem dados
+    pessoais dos servidores, e o conteúdo é lido de volta pela aplicação.
+    Os valores são gravados em JSON, nunca em pickle.
+    """
+
+    shared_lock = fcntl is not None
+    blocking = True
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._check_private(directory)
+
+    @staticmethod
+    def _check_private(directory: str):
+        """Garante que o diretório é do usuário do processo e só dele"""
+        stat = os.stat(directory)
+        if not os.path.isdir(directory):
+            raise PermissionError(f"Diretório de cache inválido: {directory}")
+        if not hasattr(os, 'getuid'):
+            return
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f"Diretório de cache pertence a outro usuário: {directory}")
+        if stat.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+
+    def _path(self, key: str, suffix: str = '.cache') -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}{suffix}")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                entry = json.loads(cache_file.read())
+            expires_at, value = entry['expires_at'], entry['value']
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        if time.time() >= expires_at:
+            self.delete(key)
+            return None
+        if self.max_bytes is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        data = json.dumps({'expires_at': time.time() + ttl, 'value': value},
+                          separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        # Escrita atômica: arquivo temporário (modo 0o600) + rename
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                cache_file.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_bytes is not None:
+            self._evict()
+
+    def _evict(self):
+        """Remove os arquivos menos usados até o total caber em max_bytes"""
+        arquivos = []
+        for entrada in os.scandir(self.directory):
+            if entrada.name.endswith('.cache'):
+                try:
+                    stat = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                arquivos.append((stat.st_mtime, stat.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            self.evictions += 1
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                os.remove(os.path.join(self.directory, name))
+
+    def try_lock(self, key: str, ttl: float) -> Optional[Any]:
+        fd = os.open(self._path(key, '.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        return fd
+
+    def unlock(self, key: str, handle: Any):
+        try:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            os.close(handle)
+
+
+def build_backend(config: Dict[str, Any]) -> Optional[CacheBackend]:
+    """
+    Cria o backend a partir de api_config['cache_backend']: 'memory', 'file',
+    'django' ou 'none'. O padrão é 'memory', de cada processo. 'file' é
+    visto por todos os workers do mesmo usuário na máquina (e portanto agrupa
+    as consultas entre eles); fica em cache_dir ou, sem ele, no diretório de
+    cache do usuário (default_cache_dir), nunca em um diretório temporário
+    compartilhado.
+    """
+    kind = config.get('cache_backend', 'memory')
+    if kind == 'memory':
+        return MemoryLRUCache(config.get('cache_max_bytes', 64 * 1024 * 1024))
+    if kind == 'django':
+        return DjangoCacheBackend(config.get('cache_alias', 'default'))
+    if kind == 'file':
+        directory = config.get('cache_dir') or default_cache_dir()
+        return FileCacheBackend(directory, config.get('cache_file_max_bytes', 1024 * 1024 * 1024))
+    if kind in (None, 'none'):
+        return None
+    raise ValueError(f"cache_backend desconhecido: {kind}")
+
+
+class _Flight:
+    """Uma busca em andamento; as chamadas agrupadas esperam por 'done'"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class FichasCache:
+    """
+    Cache das consultas à API, com contadores de acertos, falhas e chamadas
+    agrupadas. lock_timeout limita a espera pela trava entre processos; depois
+    dele a consulta é feita mesmo assim.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl_current: float = 900,
+                 ttl_closed: float = 7 * 24 * 3600, lock_timeout: float = 60):
+        self.backend = backend
+        self.ttl_current = ttl_current
+        self.ttl_closed = ttl_closed
+        self.lock_timeout = lock_timeout
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[Tuple[Any, str], asyncio.Future] = {}
+
+    @staticmethod
+    def key_matricula(matricula) -> str:
+        return f"matricula:{str(matricula).strip()}"
+
+    @staticmethod
+    def key_matricula_anos(matricula, anos, verbas=None) -> str:
+        """Chave de uma consulta restrita a alguns anos (e opcionalmente a algumas verbas)"""
+        key = f"matricula:{str(matricula).strip()}:anos:{','.join(str(ano) for ano in sorted(anos))}"
+        if verbas is not None:
+            key += f":verbas:{','.join(sorted(str(verba) for verba in verbas))}"
+        return key
+
+    @staticmethod
+    def key_cpf(cpf) -> str:
+        return f"cpf:{str(cpf).strip()}"
+
+    @staticmethod
+    def _matricula_of(key: str) -> Optional[str]:
+        """Matrícula de uma chave key_matricula ou key_matricula_anos"""
+        if key.startswith('matricula:'):
+            return key.split(':', 2)[1]
+        return None
+
+    def _generation_key(self, matricula) -> str:
+        return f"geracao:{FichasCache.key_matricula(matricula)}"
+
+    def _scoped(self, key: str) -> str:
+        """
+        Chave gravada no backend. As chaves de uma matrícula (a resposta
+        completa e as consultas por ano e verba) levam a geração atual dela,
+        guardada no próprio backend e portanto vista por todos os processos:
+        invalidate_matricula troca a geração e descarta todas de uma vez.
+        Sem geração (primeiro uso ou entrada despejada) uma nova é criada, e o
+        que estava em cache deixa de ser lido.
+        """
+        matricula = self._matricula_of(key)
+        if matricula is None or self.backend is None:
+            return key
+        generation = self.backend.get(self._generation_key(matricula))
+        if generation is None:
+            generation = uuid.uuid4().hex[:12]
+            self.backend.set(self._generation_key(matricula), generation, self.ttl_closed)
+        return f"{key}@{generation}"
+
+    def ttl_for(self, value: Any) -> float:
+        """TTL longo quando nenhuma ficha é do ano corrente"""
+        current_year = date.today().year
+        servidores = []
+        if isinstance(value, dict):
+            if isinstance(value.get('servidor'), dict):
+                servidores = [value['servidor']]
+            elif isinstance(value.get('servidores'), list):
+                servidores = value['servidores']
+        elif isinstance(value, list):
+            servidores = value
+
+        anos = [
+            ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA') or 0
+            for servidor in servidores if isinstance(servidor, dict)
+            for ficha in servidor.get('fichasFinanceiras', [])
+        ]
+        if anos and max(anos) < current_year:
+            return self.ttl_closed
+        return self.ttl_current
+
+    def _cached(self, key: str) -> Optional[Any]:
+        value = self.backend.get(key) if self.backend is not None else None
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            count_cache('fichas_api', hit=True)
+        return value
+
+    def _store(self, key: str, value: Any):
+        if value and self.backend is not None:
+            self.backend.set(key, value, self.ttl_for(value))
+
+    def _count_miss(self):
+        if self.backend is None:
+            return
+        with self._lock:
+            self.misses += 1
+        count_cache('fichas_api', hit=False)
+
+    def _count_coalesced(self):
+        with self._lock:
+            self.coalesced += 1
+        count_coalesced('fichas_api')
+
+    async def _aio(self, func: Callable[..., Any], *args) -> Any:
+        """Chama func (que usa o backend) em uma thread se o backend faz I/O"""
+        if self.backend is not None and self.backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def _uses_process_lock(self) -> bool:
+        return self.backend is not None and self.backend.shared_lock and self.lock_timeout > 0
+
+    def _acquire_process_lock(self, key: str) -> Tuple[Optional[Any], bool]:
+        """(identificador da trava ou None se o prazo acabou, se foi preciso esperar)"""
+        deadline = time.monotonic() + self.lock_timeout
+        interval = LOCK_POLL_INTERVAL
+        waited = False
+        while True:
+            handle = self.backend.try_lock(key, self.lock_timeout)
+            if handle is not None or time.monotonic() >= deadline:
+                return handle, waited
+            waited = True
+            time.sleep(interval)
+            interval = min(interval * 2, LOCK_POLL_MAX_INTERVAL)
+
+    async def _aacquire_process_lock(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Versão assíncrona de _acquire_process_lock (espera sem bloquear o loop)"""
+        deadline = time.monotonic() + self.lock_timeout
+        interval = LOCK_POLL_INTERVAL
+        waited = False
+        while True:
+            handle = await self._aio(self.backend.try_lock, key, self.lock_timeout)
+            if handle is not None or time.monotonic() >= deadline:
+                return handle, waited
+            waited = True
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, LOCK_POLL_MAX_INTERVAL)
+
+    def _fetch_once(self, key: str, fetch: Callable[[], Any], force_refresh: bool) -> Any:
+        """Busca de quem lidera o grupo: trava entre processos, cache de novo e fetch"""
+        handle, waited = None, False
+        if self._uses_process_lock():
+            handle, waited = self._acquire_process_lock(key)
+        try:
+            # Outro processo pode ter acabado de buscar a mesma chave
+            if waited or not force_refresh:
+                value = self._cached(key)
+                if value is not None:
+                    return value
+            self._count_miss()
+            value = fetch()
+            self._store(key, value)
+            return value
+        finally:
+            if handle is not None:
+                self.backend.unlock(key, handle)
+
+    async def _afetch_once(self, key: str, fetch: Callable[[], Awaitable[Any]], force_refresh: bool) -> Any:
+        handle, waited = None, False
+        if self._uses_process_lock():
+            handle, waited = await self._aacquire_process_lock(key)
+        try:
+            if waited or not force_refresh:
+                value = await self._aio(self._cached, key)
+                if value is not None:
+                    return value
+            self._count_miss()
+            value = await fetch()
+            await self._aio(self._store, key, value)
+            return value
+        finally:
+            if handle is not None:
+                await self._aio(self.backend.unlock, key, handle)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], force_refresh: bool = False) -> Any:
+        """
+        Retorna o valor em cache ou chama 'fetch' e guarda o resultado.
+        Resultados vazios (None, {}) não são guardados. Chamadas simultâneas
+        com a mesma chave compartilham um único 'fetch' (e o seu erro, se houver).
+        """
+        key = self._scoped(key)
+        if not force_refresh:
+            value = self._cached(key)
+            if value is not None:
+                return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count_coalesced()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._fetch_once(key, fetch, force_refresh)
+            return flight.value
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def aget_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]],
+                            force_refresh: bool = False) -> Any:
+        """
+        Versão assíncrona de get_or_fetch, para o cliente FichasAPIAsync.
+        O agrupamento vale entre as tarefas do mesmo event loop. Com backends
+        que fazem I/O (arquivo, banco, Redis) as chamadas a ele rodam em uma
+        thread (asyncio.to_thread), sem bloquear o loop.
+        """
+        key = await self._aio(self._scoped, key)
+        if not force_refresh:
+            value = await self._aio(self._cached, key)
+            if value is not None:
+                return value
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._async_flights.get((loop, key))
+            leader = flight is None
+            if leader:
+                flight = self._async_flights[(loop, key)] = loop.create_future()
+        if not leader:
+            self._count_coalesced()
+            # shield: o cancelamento de quem espera não cancela a busca dos outros
+            return await asyncio.shield(flight)
+
+        try:
+            value = await self._afetch_once(key, fetch, force_refresh)
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(error)
+                # Marca a exceção como lida caso ninguém esteja esperando
+                flight.exception()
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._async_flights[(loop, key)]
+
+    def invalidate(self, key: str):
+        if self.backend is not None:
+            self.backend.delete(self._scoped(key))
+
+    def invalidate_matricula(self, matricula):
+        """Descarta todas as consultas em cache da matrícula (completa, por ano e por verba)"""
+        if self.backend is not None:
+            self.backend.set(self._generation_key(matricula), uuid.uuid4().hex[:12], self.ttl_closed)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'coalesced': self.coalesced,
+            'evictions': getattr(self.backend, 'evictions', None),
+            'bytes': getattr(self.backend, 'current_bytes', None)
+        }
@@ -0,0 +1,362 @@
+"""
+API de Fichas Financeiras falsa, para desenvolvimento e testes de carga.
+
+Serve localmente os mesmos contratos usados por FichasAPI_Manager e
+FichasAPIAsync, sem depender do sandbox:
+
+    POST /login                      {"email", "password"} -> {"token"}
+    POST /servidor/busca/matricula   {"matricula"[, campo_ano]} -> {"servidor": {...}}
+    POST /servidor/busca/cpf         {"cpf"} -> {"servidores": [{...}]}
+    GET  /_estatisticas              contadores de requisições e bytes enviados
+
+Os servidores são gerados a partir da estrutura de um vencimento_data_*.json
+salvo (campos, listas das fichas e catálogo de verbas), de forma determinística
+por matrícula. Latência, taxa de erros, 401 forçados, anos de carreira e verbas
+por ano são configuráveis (ConfiguracaoFake). Matrículas iniciadas por
+99999999 respondem 404.
+
+Para apontar a aplicação para esta API, use em api_config:
+    {'host': 'localhost:8765', 'scheme': 'http', ...}
+"""
+
+import glob
+import hashlib
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+MESES = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+SUBLISTAS_FICHA = ('adicionaisFerias', 'adicionaisTemposServicos', 'titulacao', 'vencimentos')
+PREFIXO_INEXISTENTE = '99999999'
+
+
+def arquivo_modelo_padrao() -> Optional[str]:
+    """Primeiro vencimento_data_*.json salvo na pasta do app"""
+    pasta = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    arquivos = sorted(glob.glob(os.path.join(pasta, 'vencimento_data_*.json')))
+    return arquivos[0] if arquivos else None
+
+
+def carregar_modelo(caminho: Optional[str] = None) -> Dict[str, Any]:
+    """Servidor (dados completos da API) de um vencimento_data_*.json salvo"""
+    caminho = caminho or arquivo_modelo_padrao()
+    if not caminho:
+        raise FileNotFoundError("Nenhum vencimento_data_*.json encontrado para servir de modelo")
+    with open(caminho, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    servidor = dados.get('professor_complete_data', {}).get('data') or dados.get('servidor')
+    if not isinstance(servidor, dict):
+        raise ValueError(f"{caminho} não contém os dados completos do servidor")
+    return servidor
+
+
+class GeradorServidores:
+    """
+    Gera servidores sintéticos com a estrutura do modelo.
+
+    O catálogo de verbas é o do modelo, da mais frequente para a menos
+    frequente (verbas sintéticas completam o que faltar); cada verba mantém o
+    valor médio e a proporção de meses pagos que tinha no modelo.
+    """
+
+    def __init__(self, modelo: Dict[str, Any]):
+        self.modelo = modelo
+        fichas = modelo.get('fichasFinanceiras') or []
+        self.campos_servidor = {
+            chave: valor for chave, valor in modelo.items() if not isinstance(valor, (dict, list))
+        }
+        self.historicos = modelo.get('historicos') or []
+        self.sublistas = {
+            chave: valor for chave, valor in (fichas[0] if fichas else {}).items()
+            if chave in SUBLISTAS_FICHA and isinstance(valor, list)
+        }
+        self.catalogo = self._catalogo(fichas)
+
+    @staticmethod
+    def _catalogo(fichas: List[Dict[str, Any]]) -> List[Tuple[Any, str, float, float]]:
+        """(código, nome, valor médio pago, proporção de meses pagos) por verba"""
+        frequencia = Counter()
+        nomes = {}
+        pagos = {}
+        for ficha in fichas:
+            for item in ficha.get('fichasFinanceirasItens') or []:
+                codigo = item.get('FICHA_FINANCEIRA_ITEM_COD_VERBA')
+                frequencia[codigo] += 1
+                nomes.setdefault(codigo, item.get('FICHA_FINANCEIRA_ITEM_NOME_VERBA') or '')
+                valores = [item.get(f'FICHA_FINANCEIRA_ITEM_{mes}') or 0 for mes in MESES]
+                pagos.setdefault(codigo, []).extend(valores)
+        catalogo = []
+        for codigo, _ in frequencia.most_common():
+            valores = pagos[codigo]
+            positivos = [valor for valor in valores if valor > 0]
+            media = sum(positivos) / len(positivos) if positivos else 100.0
+            catalogo.append((codigo, nomes[codigo], media, len(positivos) / len(valores)))
+        return catalogo
+
+    def verbas(self, quantidade: int) -> List[Tuple[Any, str, float, float]]:
+        verbas = self.catalogo[:quantidade]
+        for indice in range(len(verbas), quantidade):
+            verbas.append((900000 + indice, f'VERBA SINTÉTICA {indice}', 250.0, 0.5))
+        return verbas
+
+    def gerar(self, matricula: str, anos: int = 18, verbas_por_ano: int = 33,
+              ano_final: Optional[int] = None, somente_ano: Optional[int] = None) -> Dict[str, Any]:
+        """Servidor sintético com `anos` fichas (até ano_final) de `verbas_por_ano` itens cada"""
+        semente = int(hashlib.sha256(str(matricula).encode('utf-8')).hexdigest()[:12], 16)
+        ano_final = ano_final or date.today().year
+        servidor_id = semente % 10_000_000
+        ano_inicial = ano_final - anos + 1
+
+        servidor = dict(self.campos_servidor)
+        servidor.update({
+            'SERVIDOR_ID': servidor_id,
+            'SERVIDOR_MATRICULA': str(matricula),
+            'SERVIDOR_NOME': f'SERVIDOR SINTÉTICO {servidor_id}',
+            'SERVIDOR_CPF': f'{semente % 1_000_000_000:09d}{semente % 97:02d}',
+            'SERVIDOR_DT_ADMISSAO': f'{ano_inicial}-01-01',
+        })
+
+        verbas = self.verbas(verbas_por_ano)
+        fichas = []
+        for ano in range(ano_final, ano_inicial - 1, -1):
+            if somente_ano is not None and ano != somente_ano:
+                continue
+            ficha_id = servidor_id * 100 + (ano - ano_inicial)
+            # Uma sequência por ano: a consulta de um só ano traz a mesma ficha da carreira completa
+            aleatorio = random.Random(f'{semente}:{ano}')
+            # Reajuste anual de 5% sobre o valor do modelo
+            fator = 1.05 ** (ano - ano_final)
+            itens = []
+            for indice, (codigo, nome, media, proporcao) in enumerate(verbas):
+                item = {
+                    'FICHA_FINANCEIRA_ID': ficha_id,
+                    'FICHA_FINANCEIRA_ITEM_ID': ficha_id * 1000 + indice,
+                    'FICHA_FINANCEIRA_ITEM_COD_VERBA': codigo,
+                    'FICHA_FINANCEIRA_ITEM_NOME_VERBA': nome,
+                    'FICHA_FINANCEIRA_ITEM_DEC_TERCEIRO': 0,
+                }
+                total = 0.0
+                for mes in MESES:
+                    pago = aleatorio.random() < proporcao
+                    valor = round(media * fator * aleatorio.uniform(0.95, 1.05), 2) if pago else 0
+                    item[f'FICHA_FINANCEIRA_ITEM_{mes}'] = valor
+                    total += valor
+                item['FICHA_FINANCEIRA_ITEM_TOTAL'] = round(total, 2)
+                itens.append(item)
+            ficha = {
+                'FICHA_FINANCEIRA_ANO_REFERENCIA': ano,
+                'FICHA_FINANCEIRA_ID': ficha_id,
+                'SERVIDOR_ID': servidor_id,
+                'fichasFinanceirasItens': itens,
+            }
+            for chave, lista in self.sublistas.items():
+                ficha[chave] = [{**item, 'FICHA_FINANCEIRA_ID': ficha_id} for item in lista]
+            fichas.append(ficha)
+
+        servidor['fichasFinanceiras'] = fichas
+        servidor['historicos'] = [{**historico, 'SERVIDOR_ID': servidor_id} for historico in self.historicos]
+        return servidor
+
+
+class ConfiguracaoFake:
+    """Parâmetros de comportamento da API falsa (podem ser alterados com o servidor no ar)"""
+
+    def __init__(self, latencia_ms: float = 0.0, variacao_ms: float = 0.0, taxa_erro: float = 0.0,
+                 taxa_401: float = 0.0, anos: int = 18, verbas_por_ano: int = 33,
+                 ano_final: Optional[int] = None, campo_ano: str = 'ano', semente: Optional[int] = None):
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_401 = taxa_401
+        self.anos = anos
+        self.verbas_por_ano = verbas_por_ano
+        self.ano_final = ano_final
+        self.campo_ano = campo_ano
+        self.aleatorio = random.Random(semente)
+
+
+class _ManipuladorFichas(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'ServidorFichasFake'
+
+    def log_message(self, formato, *args):
+        if self.server.verbose:
+            super().log_message(formato, *args)
+
+    def _responder(self, status: int, corpo: Any):
+        dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        # Contada antes do envio (end_headers já envia o status): quem recebe a
+        # resposta, mesmo sem ler o corpo, já a vê em /_estatisticas
+        self.server.contar(self.path, status, len(dados))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _ler_json(self) -> Dict[str, Any]:
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        try:
+            dados = json.loads(self.rfile.read(tamanho) or b'{}')
+        except ValueError:
+            return {}
+        return dados if isinstance(dados, dict) else {}
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/_estatisticas':
+            self._responder(200, self.server.estatisticas())
+        else:
+            self._responder(404, {'message': 'Rota não encontrada'})
+
+    def do_POST(self):
+        corpo = self._ler_json()
+        configuracao = self.server.configuracao
+        self.server.aguardar_latencia()
+
+        if self.path == '/login':
+            if not corpo.get('email') or not corpo.get('password'):
+                self._responder(401, {'message': 'Credenciais inválidas'})
+                return
+            self._responder(200, {'token': self.server.novo_token()})
+            return
+
+        if self.path not in ('/servidor/busca/matricula', '/servidor/busca/cpf'):
+            self._responder(404, {'message': 'Rota não encontrada'})
+            return
+        if not self.server.token_valido(self.headers.get('X-Auth-Token')):
+            self._responder(401, {'message': 'Token inválido ou expirado'})
+            return
+        if self.server.sortear(configuracao.taxa_401):
+            self.server.revogar_tokens()
+            self._responder(401, {'message': 'Token expirado'})
+            return
+        if self.server.sortear(configuracao.taxa_erro):
+            self._responder(503, {'message': 'Serviço indisponível (erro simulado)'})
+            return
+
+        if self.path == '/servidor/busca/matricula':
+            matricula = str(corpo.get('matricula') or '').strip()
+            ano = corpo.get(configuracao.campo_ano)
+            if not matricula or matricula.startswith(PREFIXO_INEXISTENTE):
+                self._responder(404, {'message': 'Servidor não encontrado'})
+                return
+            self._responder(200, self.server.corpo_matricula(matricula, ano))
+        else:
+            cpf = str(corpo.get('cpf') or '').strip()
+            if not cpf:
+                self._responder(404, {'message': 'Servidor não encontrado'})
+                return
+            self._responder(200, self.server.corpo_cpf(cpf))
+
+
+class ServidorFichasFake(ThreadingHTTPServer):
+    """Servidor HTTP da API falsa; cada requisição é atendida em uma thread"""
+
+    daemon_threads = True
+
+    def __init__(self, endereco: Tuple[str, int] = ('127.0.0.1', 8765),
+                 configuracao: Optional[ConfiguracaoFake] = None,
+                 modelo: Optional[Dict[str, Any]] = None, verbose: bool = False,
+                 max_respostas_em_cache: int = 256):
+        super().__init__(endereco, _ManipuladorFichas)
+        self.configuracao = configuracao or ConfiguracaoFake()
+        self.gerador = GeradorServidores(modelo or carregar_modelo())
+        self.verbose = verbose
+        self.max_respostas_em_cache = max_respostas_em_cache
+        self._respostas = OrderedDict()
+        self._tokens = set()
+        self._contadores = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def sortear(self, taxa: float) -> bool:
+        if taxa <= 0:
+            return False
+        with self._lock:
+            return self.configuracao.aleatorio.random() < taxa
+
+    def aguardar_latencia(self):
+        configuracao = self.configuracao
+        if configuracao.latencia_ms <= 0 and configuracao.variacao_ms <= 0:
+            return
+        with self._lock:
+            variacao = configuracao.aleatorio.uniform(-configuracao.variacao_ms, configuracao.variacao_ms)
+        time.sleep(max(configuracao.latencia_ms + variacao, 0) / 1000)
+
+    def novo_token(self) -> str:
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._tokens.add(token)
+        return token
+
+    def token_valido(self, token: Optional[str]) -> bool:
+        with self._lock:
+            return token in self._tokens
+
+    def revogar_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def _corpo_em_cache(self, chave: Tuple, gerar) -> bytes:
+        with self._lock:
+            corpo = self._respostas.get(chave)
+            if corpo is not None:
+                self._respostas.move_to_end(chave)
+                return corpo
+        corpo = json.dumps(gerar(), ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self._respostas[chave] = corpo
+            while len(self._respostas) > self.max_respostas_em_cache:
+                self._respostas.popitem(last=False)
+        return corpo
+
+    def _servidor(self, matricula: str, ano: Optional[int] = None) -> Dict[str, Any]:
+        configuracao = self.configuracao
+        return self.gerador.gerar(
+            matricula, anos=configuracao.anos, verbas_por_ano=configuracao.verbas_por_ano,
+            ano_final=configuracao.ano_final, somente_ano=ano
+        )
+
+    def corpo_matricula(self, matricula: str, ano: Optional[int] = None) -> bytes:
+        configuracao = self.configuracao
+        chave = ('matricula', matricula, ano, configuracao.anos, configuracao.verbas_por_ano, configuracao.ano_final)
+        return self._corpo_em_cache(chave, lambda: {'servidor': self._servidor(matricula, ano)})
+
+    def corpo_cpf(self, cpf: str) -> bytes:
+        configuracao = self.configuracao
+        chave = ('cpf', cpf, configuracao.anos, configuracao.verbas_por_ano, configuracao.ano_final)
+        # A matrícula sintética do CPF é derivada dele, para respostas estáveis
+        matricula = f"{int(hashlib.sha256(cpf.encode('utf-8')).hexdigest()[:7], 16) % 100_000_000:08d}-01"
+        return self._corpo_em_cache(chave, lambda: {'servidores': [self._servidor(matricula)]})
+
+    def contar(self, caminho: str, status: int, tamanho: int):
+        with self._lock:
+            self._contadores[f'requisicoes {caminho}'] += 1
+            self._contadores[f'status {status}'] += 1
+            self._contadores['bytes_enviados'] += tamanho
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._contadores)
+
+
+def iniciar_em_thread(porta: int = 0, configuracao: Optional[ConfiguracaoFake] = None,
+                      **opcoes) -> ServidorFichasFake:
+    """
+    Sobe a API falsa em uma thread daemon (porta 0 = qualquer porta livre) e
+    retorna o servidor; use servidor.url e, ao final, servidor.shutdown().
+    """
+    servidor = ServidorFichasFake(('127.0.0.1', porta), configuracao, **opcoes)
+    threading.Thread(target=servidor.serve_forever, name='fichas-fake', daemon=True).start()
+    return servidor
@@ -0,0 +1,86 @@
+"""
+Sessão HTTP compartilhada para todo o tráfego da API de Fichas Financeiras.
+
+Uma única requests.Session por processo mantém as conexões TCP/TLS abertas
+(keep-alive) em um pool dimensionado, com novas tentativas automáticas em
+falhas de conexão e respostas 5xx. Como VencimentoServiceFixed e
+FichasAPI_Manager são criados a cada requisição, o pool vive aqui, no nível
+do módulo.
+
+Parâmetros opcionais em api_config:
+    scheme ('https' por padrão; 'http' para a API local de testes, fichas_fake),
+    pool_connections, pool_maxsize, max_retries, retry_backoff,
+    connect_timeout, read_timeout, verify_ssl
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from fichas_api_config import api_config
+
+RETRY_STATUS = (500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def build_session(config: Dict[str, Any]) -> requests.Session:
+    """Cria uma sessão com pool de conexões e política de novas tentativas"""
+    retry = Retry(
+        total=config.get('max_retries', 3),
+        connect=config.get('max_retries', 3),
+        read=config.get('max_retries', 3),
+        status=config.get('max_retries', 3),
+        backoff_factor=config.get('retry_backoff', 0.5),
+        status_forcelist=RETRY_STATUS,
+        # As buscas da API são POSTs sem efeito colateral
+        allowed_methods=frozenset({'GET', 'POST'}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.get('pool_connections', 4),
+        pool_maxsize=config.get('pool_maxsize', 16),
+        max_retries=retry,
+        pool_block=False
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.verify = config.get('verify_ssl', False)
+    session.headers.update({
+        "Content-Type": "application/json",
+        "Connection": "keep-alive"
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Retorna a sessão do processo, criando-a na primeira chamada"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(api_config)
+    return _session
+
+
+def api_base_url() -> str:
+    """URL base da API de Fichas (esquema + host, sem barra final)"""
+    return f"{api_config.get('scheme', 'https')}://{api_config['host']}"
+
+
+def get_timeout() -> Tuple[float, float]:
+    """Timeouts separados de conexão e de leitura (segundos)"""
+    return (api_config.get('connect_timeout', 5), api_config.get('read_timeout', 30))
+
+
+def reset_session():
+    """Fecha a sessão atual; a próxima chamada a get_session cria outra"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -0,0 +1,233 @@
+"""
+Leitura em fluxo das respostas de busca_matricula.
+
+A resposta de uma carreira longa tem vários megabytes, e response.json()
+monta tudo em objetos Python antes de o cálculo olhar o primeiro item. Aqui
+o corpo da resposta é lido em blocos e percorrido incrementalmente: a
+estrutura externa (resposta, servidor, lista de fichas) é lida símbolo a
+símbolo, e cada ficha é decodificada sozinha pelo decodificador JSON da
+biblioteca padrão (em C), filtrada e reduzida antes da próxima ser lida.
+Só o que o cálculo usa é mantido:
+
+    - dados do servidor: apenas os campos simples (nome, CPF, matrícula...)
+    - fichas: o ano e os itens; as demais listas da ficha são descartadas
+    - itens: código, nome da verba e valores (CAMPOS_ITEM)
+
+Os filtros de ano e de verba são aplicados ficha a ficha durante a leitura,
+então a memória usada fica limitada a uma ficha mais o que passa pelos
+filtros, e não cresce com o histórico inteiro.
+"""
+
+import codecs
+import json
+from json.decoder import scanstring
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+MESES = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+CAMPOS_ITEM = frozenset(
+    ['FICHA_FINANCEIRA_ITEM_COD_VERBA', 'FICHA_FINANCEIRA_ITEM_NOME_VERBA',
+     'FICHA_FINANCEIRA_ITEM_DEC_TERCEIRO', 'FICHA_FINANCEIRA_ITEM_TOTAL']
+    + [f'FICHA_FINANCEIRA_ITEM_{mes}' for mes in MESES]
+)
+TAMANHO_LEITURA = 64 * 1024
+
+_ESPACOS = ' \t\n\r'
+_decodificador_json = json.JSONDecoder()
+
+
+class ErroJSON(ValueError):
+    """JSON inválido ou truncado na resposta"""
+
+
+class LeitorJSON:
+    """
+    Leitor incremental de JSON sobre um fluxo de bytes (qualquer objeto com
+    read(n), como response.raw). Só o trecho ainda não consumido fica em memória.
+    """
+
+    def __init__(self, fluxo, tamanho_leitura: int = TAMANHO_LEITURA):
+        self.fluxo = fluxo
+        self.tamanho_leitura = tamanho_leitura
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.texto = ''
+        self.pos = 0
+        self.fim = False
+
+    def _ler(self, minimo: int = 0) -> bool:
+        """Descarta o trecho consumido e lê ao menos mais um bloco (ou `minimo` caracteres)"""
+        if self.fim:
+            return False
+        partes = [self.texto[self.pos:]]
+        lidos = 0
+        while True:
+            bloco = self.fluxo.read(self.tamanho_leitura)
+            if not bloco:
+                self.fim = True
+                partes.append(self._utf8.decode(b'', final=True))
+                break
+            texto = self._utf8.decode(bloco)
+            partes.append(texto)
+            lidos += len(texto)
+            if lidos >= minimo:
+                break
+        self.texto = ''.join(partes)
+        self.pos = 0
+        return True
+
+    def simbolo(self) -> str:
+        """Próximo caractere significativo, sem consumi-lo ('' no fim do fluxo)"""
+        while True:
+            texto, pos = self.texto, self.pos
+            while pos < len(texto) and texto[pos] in _ESPACOS:
+                pos += 1
+            self.pos = pos
+            if pos < len(texto):
+                return texto[pos]
+            if not self._ler():
+                return ''
+
+    def consumir(self, esperado: str):
+        encontrado = self.simbolo()
+        if encontrado != esperado:
+            raise ErroJSON(f"Esperado {esperado!r}, encontrado {encontrado or 'fim da resposta'!r}")
+        self.pos += 1
+
+    def valor(self) -> Any:
+        """Decodifica o próximo valor completo (objeto, lista ou escalar)"""
+        if not self.simbolo():
+            raise ErroJSON("Resposta truncada")
+        while True:
+            try:
+                valor, fim = _decodificador_json.raw_decode(self.texto, self.pos)
+            except json.JSONDecodeError as erro:
+                if self.fim:
+                    raise ErroJSON(f"JSON inválido: {erro}") from None
+                # Valor cortado no fim do bloco: lê ao menos o tamanho já acumulado
+                self._ler(len(self.texto) - self.pos)
+                continue
+            # Um número no fim do bloco pode continuar no próximo ("12" + "34", "1.5" + "e3")
+            if not self.fim and len(self.texto) - fim < 3 and self.texto[self.pos] not in '{["':
+                self._ler()
+                continue
+            self.pos = fim
+            return valor
+
+    def chaves(self) -> Iterator[str]:
+        """Chaves de um objeto; o valor de cada uma deve ser lido pelo chamador"""
+        self.consumir('{')
+        if self.simbolo() == '}':
+            self.pos += 1
+            return
+        while True:
+            self.consumir('"')
+            while True:
+                try:
+                    chave, fim = scanstring(self.texto, self.pos)
+                    break
+                except json.JSONDecodeError:
+                    # Chave cortada no fim do bloco: relê a partir da aspa
+                    self.pos -= 1
+                    if not self._ler():
+                        raise ErroJSON("Chave não terminada") from None
+                    self.pos = 1
+            self.pos = fim
+            self.consumir(':')
+            yield chave
+            if self.simbolo() == ',':
+                self.pos += 1
+            else:
+                self.consumir('}')
+                return
+
+    def elementos(self) -> Iterator[None]:
+        """Percorre uma lista; cada elemento deve ser lido pelo chamador"""
+        self.consumir('[')
+        if self.simbolo() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.simbolo() == ',':
+                self.pos += 1
+            else:
+                self.consumir(']')
+                return
+
+
+def reduzir_ficha(ficha: Dict[str, Any], anos: Optional[Set[int]] = None,
+                  verbas: Optional[Set] = None) -> Optional[Dict[str, Any]]:
+    """Ficha só com o ano e os campos usados dos itens filtrados; None se o ano está fora do filtro"""
+    ano = ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')
+    if anos is not None and ano not in anos:
+        return None
+    itens = []
+    for item in ficha.get('fichasFinanceirasItens') or []:
+        if verbas is not None and item.get('FICHA_FINANCEIRA_ITEM_COD_VERBA') not in verbas:
+            continue
+        itens.append({campo: valor for campo, valor in item.items() if campo in CAMPOS_ITEM})
+    return {'FICHA_FINANCEIRA_ANO_REFERENCIA': ano, 'fichasFinanceirasItens': itens}
+
+
+def reduzir_resposta(resposta: Any, anos: Optional[Iterable[int]] = None,
+                     verbas: Optional[Iterable] = None) -> Any:
+    """
+    Aplica a uma resposta já decodificada (response.json(), cache) a mesma
+    redução e os mesmos filtros de carregar_resposta.
+    """
+    if not isinstance(resposta, dict) or not isinstance(resposta.get('servidor'), dict):
+        return resposta
+    anos = set(anos) if anos is not None else None
+    verbas = set(verbas) if verbas is not None else None
+    servidor = {
+        chave: valor for chave, valor in resposta['servidor'].items()
+        if not isinstance(valor, (dict, list))
+    }
+    fichas = (reduzir_ficha(ficha, anos, verbas) for ficha in resposta['servidor'].get('fichasFinanceiras') or [])
+    servidor['fichasFinanceiras'] = [ficha for ficha in fichas if ficha is not None]
+    return {**resposta, 'servidor': servidor}
+
+
+def _servidor(leitor: LeitorJSON, anos: Optional[Set[int]], verbas: Optional[Set]) -> Dict[str, Any]:
+    servidor: Dict[str, Any] = {}
+    for chave in leitor.chaves():
+        if chave == 'fichasFinanceiras' and leitor.simbolo() == '[':
+            fichas = []
+            for _ in leitor.elementos():
+                # Uma ficha (um ano) por vez em memória
+                ficha = leitor.valor()
+                ficha = reduzir_ficha(ficha, anos, verbas) if isinstance(ficha, dict) else None
+                if ficha is not None:
+                    fichas.append(ficha)
+            servidor[chave] = fichas
+        else:
+            valor = leitor.valor()
+            # Listas e objetos do servidor (históricos etc.) não são usados pelo cálculo
+            if not isinstance(valor, (dict, list)):
+                servidor[chave] = valor
+    return servidor
+
+
+def carregar_resposta(fluxo, anos: Optional[Iterable[int]] = None,
+                      verbas: Optional[Iterable] = None) -> Any:
+    """
+    Lê uma resposta de busca_matricula de um fluxo de bytes, no mesmo formato
+    de response.json(), mas só com os campos usados e os anos/verbas pedidos.
+
+    Args:
+        fluxo: Objeto com read(n) (ex.: response.raw com decode_content=True)
+        anos: Anos de referência mantidos (None = todos)
+        verbas: Códigos de verba mantidos (None = todos)
+    """
+    anos = set(anos) if anos is not None else None
+    verbas = set(verbas) if verbas is not None else None
+    leitor = LeitorJSON(fluxo)
+    if leitor.simbolo() != '{':
+        return leitor.valor()
+
+    resposta: Dict[str, Any] = {}
+    for chave in leitor.chaves():
+        if chave == 'servidor' and leitor.simbolo() == '{':
+            resposta[chave] = _servidor(leitor, anos, verbas)
+        else:
+            resposta[chave] = leitor.valor()
+    return resposta
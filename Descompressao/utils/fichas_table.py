@@ -0,0 +1,200 @@
+"""
+Columnar view of a servidor's fichas financeiras.
+
+All fichasFinanceirasItens of all years are flattened in a single pass into
+NumPy arrays (one row per item, one column per month). Period filtering,
+verba matching and totals are then computed with vectorized masks and
+reductions instead of a Python loop over fichas x itens x months.
+"""
+
+import hashlib
+import logging
+from datetime import date
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from fichas_verbas import ClassificadorVerbas, get_classificador
+from vencimento_records import VencimentoRecord
+
+logger = logging.getLogger(__name__)
+
+MONTH_KEYS = [
+    'FICHA_FINANCEIRA_ITEM_JAN', 'FICHA_FINANCEIRA_ITEM_FEV', 'FICHA_FINANCEIRA_ITEM_MAR',
+    'FICHA_FINANCEIRA_ITEM_ABR', 'FICHA_FINANCEIRA_ITEM_MAI', 'FICHA_FINANCEIRA_ITEM_JUN',
+    'FICHA_FINANCEIRA_ITEM_JUL', 'FICHA_FINANCEIRA_ITEM_AGO', 'FICHA_FINANCEIRA_ITEM_SET',
+    'FICHA_FINANCEIRA_ITEM_OUT', 'FICHA_FINANCEIRA_ITEM_NOV', 'FICHA_FINANCEIRA_ITEM_DEZ'
+]
+
+# C-level lookup of the 12 monthly values of an item
+_month_values = itemgetter(*MONTH_KEYS)
+
+
+def _to_float(valor) -> float:
+    """Cell conversion used only when the fast path finds a non-numeric value"""
+    try:
+        return float(valor) if valor else 0.0
+    except (ValueError, TypeError):
+        logger.warning("Invalid monthly value ignored: %r", valor)
+        return 0.0
+
+
+class FichasTable:
+    """
+    Flattened fichas: one row per item.
+
+    Attributes:
+        anos: year of each item (int32)
+        cod_verba: verba code of each item (object, as returned by the API)
+        nome_verba: upper-cased verba name of each item (object)
+        valores: monthly values, shape (n_items, 12), float64
+    """
+
+    def __init__(self, anos: np.ndarray, cod_verba: np.ndarray, nome_verba: np.ndarray, valores: np.ndarray):
+        self.anos = anos
+        self.cod_verba = cod_verba
+        self.nome_verba = nome_verba
+        self.valores = valores
+
+    def __len__(self):
+        return len(self.anos)
+
+    @classmethod
+    def from_fichas(cls, fichas: List[Dict[str, Any]]) -> 'FichasTable':
+        anos = []
+        codigos = []
+        nomes = []
+        linhas = []
+        for ficha in fichas:
+            ano = ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')
+            if not ano:
+                continue
+            itens = ficha.get('fichasFinanceirasItens') or []
+            anos.extend([ano] * len(itens))
+            codigos.extend([item.get('FICHA_FINANCEIRA_ITEM_COD_VERBA') for item in itens])
+            nomes.extend([(item.get('FICHA_FINANCEIRA_ITEM_NOME_VERBA') or '').upper() for item in itens])
+            try:
+                valores_ficha = list(map(_month_values, itens))
+            except KeyError:
+                # Some item lacks a month: fall back to per-key lookups for this ficha
+                valores_ficha = [[item.get(key, 0) for key in MONTH_KEYS] for item in itens]
+            linhas.extend(valores_ficha)
+
+        try:
+            valores = np.array(linhas, dtype=np.float64).reshape(len(linhas), 12)
+        except (ValueError, TypeError):
+            # Some cell is None or a non-numeric string: convert cell by cell
+            valores = np.array([[_to_float(v) for v in linha] for linha in linhas],
+                               dtype=np.float64).reshape(len(linhas), 12)
+        np.nan_to_num(valores, copy=False, nan=0.0)
+
+        codigos_array = np.empty(len(codigos), dtype=object)
+        codigos_array[:] = codigos
+        nomes_array = np.empty(len(nomes), dtype=object)
+        nomes_array[:] = nomes
+        return cls(np.array(anos, dtype=np.int32), codigos_array, nomes_array, valores)
+
+    @classmethod
+    def from_professor(cls, professor: Dict[str, Any]) -> 'FichasTable':
+        return cls.from_fichas(professor.get('fichasFinanceiras', []))
+
+    def item_mask(self, predicate: Callable[[Any, str], bool]) -> np.ndarray:
+        """
+        Boolean mask of items accepted by predicate(cod_verba, nome_verba).
+        The predicate runs once per distinct (code, name) pair, not per cell.
+        """
+        chaves = list(zip(self.cod_verba.tolist(), self.nome_verba.tolist()))
+        aceitos = {chave: bool(predicate(*chave)) for chave in set(chaves)}
+        return np.fromiter(map(aceitos.__getitem__, chaves), dtype=bool, count=len(chaves))
+
+    def select(self, data_inicio: date, data_fim: date, item_mask: Optional[np.ndarray] = None) -> 'FichasSelection':
+        """Cells with a positive value inside the period (by month) for the masked items"""
+        inicio = data_inicio.year * 12 + data_inicio.month - 1
+        fim = data_fim.year * 12 + data_fim.month - 1
+        meses = self.anos[:, None] * 12 + np.arange(12)[None, :]
+
+        mask = (self.valores > 0) & (meses >= inicio) & (meses <= fim)
+        if item_mask is not None:
+            mask &= item_mask[:, None]
+
+        linhas, colunas = np.nonzero(mask)
+        return FichasSelection(self, linhas, colunas)
+
+    def monthly_totals(self, data_inicio: date, data_fim: date, item_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sum of the selected cells per month of the period (one entry per month
+        from data_inicio to data_fim, zero where nothing was paid)
+        """
+        inicio = data_inicio.year * 12 + data_inicio.month - 1
+        fim = data_fim.year * 12 + data_fim.month - 1
+        selection = self.select(data_inicio, data_fim, item_mask)
+        posicoes = self.anos[selection.linhas].astype(np.int64) * 12 + selection.colunas - inicio
+        return np.bincount(posicoes, weights=selection.valores, minlength=max(fim - inicio + 1, 0))
+
+    def categorias(self, classificador: Optional[ClassificadorVerbas] = None) -> np.ndarray:
+        """Category of each item (None when unclassified), by the verba rules"""
+        classificador = classificador or get_classificador()
+        chaves = list(zip(self.cod_verba.tolist(), self.nome_verba.tolist()))
+        por_chave = {chave: classificador.classificar(*chave) for chave in set(chaves)}
+        categorias = np.empty(len(chaves), dtype=object)
+        categorias[:] = [por_chave[chave] for chave in chaves]
+        return categorias
+
+    def categoria(self, categoria: str, data_inicio: date, data_fim: date,
+                  classificador: Optional[ClassificadorVerbas] = None) -> 'FichasSelection':
+        """Cells of the items classified as `categoria` inside the period"""
+        return self.select(data_inicio, data_fim, self.categorias(classificador) == categoria)
+
+    def vencimentos(self, data_inicio: date, data_fim: date) -> 'FichasSelection':
+        return self.categoria('vencimentos', data_inicio, data_fim)
+
+
+class FichasSelection:
+    """Selected (item, month) cells of a FichasTable, in ficha/item/month order"""
+
+    def __init__(self, table: FichasTable, linhas: np.ndarray, colunas: np.ndarray):
+        self.table = table
+        self.linhas = linhas
+        self.colunas = colunas
+        self.valores = table.valores[linhas, colunas]
+
+    def __len__(self):
+        return len(self.linhas)
+
+    @property
+    def total(self) -> float:
+        return float(self.valores.sum())
+
+    @property
+    def media(self) -> float:
+        return self.total / len(self) if len(self) else 0.0
+
+    def content_hash(self, *extra: Any) -> str:
+        """
+        SHA-256 of the selected cells (year, month, code, name and value) plus
+        `extra`, independent of the order of fichas and items in the payload
+        """
+        celulas = sorted(zip(
+            self.table.anos[self.linhas].tolist(),
+            self.colunas.tolist(),
+            map(str, self.table.cod_verba[self.linhas].tolist()),
+            self.table.nome_verba[self.linhas].tolist(),
+            self.valores.tolist()
+        ))
+        return hashlib.sha256(repr((extra, celulas)).encode('utf-8')).hexdigest()
+
+    def records(self) -> List[VencimentoRecord]:
+        """Materialize the selection as VencimentoRecord objects (one date object per month)"""
+        anos = self.table.anos[self.linhas].tolist()
+        meses = (self.colunas + 1).tolist()
+        valores = self.valores.tolist()
+        nomes = self.table.nome_verba[self.linhas].tolist()
+        codigos = self.table.cod_verba[self.linhas].tolist()
+        datas = {}
+        records = []
+        for ano, mes, valor, nome, codigo in zip(anos, meses, valores, nomes, codigos):
+            record_date = datas.get((ano, mes))
+            if record_date is None:
+                record_date = datas[(ano, mes)] = date(ano, mes, 1)
+            records.append(VencimentoRecord(ano, mes, valor, nome, codigo, record_date))
+        return records
@@ -0,0 +1,134 @@
+"""
+Classificação das verbas das fichas financeiras em categorias de cálculo
+(vencimentos, gam, titulacao, gcet, adic_tem_serv, ferias).
+
+As regras ficam em um arquivo JSON (api_config['verbas_regras'], por padrão
+verbas_regras.json ao lado deste módulo):
+
+    {"categorias": [
+        {"categoria": "vencimentos", "codigos": [101], "padroes": ["VENCIMENTO", "SALARIO"]},
+        {"categoria": "gam", "codigos": [150]}
+    ]}
+
+Os padrões são trechos literais do nome da verba (sem diferenciar maiúsculas
+de minúsculas). As regras são compiladas uma única vez em um dicionário
+código -> categoria e em uma única expressão regular com um grupo nomeado por
+categoria. O classificador compilado é compartilhado pelo processo; o arquivo
+de regras é verificado a cada api_config['verbas_regras_intervalo'] segundos
+(30 por padrão) e recarregado se mudou, ou na hora com recarregar_classificador().
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fichas_api_config import api_config
+
+logger = logging.getLogger(__name__)
+
+REGRAS_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verbas_regras.json')
+
+
+class ClassificadorVerbas:
+    """Regras compiladas: busca O(1) por código e uma única regex para os nomes"""
+
+    def __init__(self, regras: List[Dict[str, Any]]):
+        """
+        Args:
+            regras: Lista de {'categoria': str, 'codigos': [...], 'padroes': [...]}
+                    Em caso de conflito vale a primeira categoria da lista,
+                    tanto para os códigos quanto para os padrões de nome.
+        """
+        self.categorias: List[str] = []
+        self.codigos: Dict[Any, str] = {}
+        grupos = []
+        self._grupos: Dict[str, str] = {}
+
+        for indice, regra in enumerate(regras):
+            categoria = regra['categoria']
+            if categoria not in self.categorias:
+                self.categorias.append(categoria)
+            for codigo in regra.get('codigos', []):
+                # A API devolve os códigos como inteiros; aceita também strings
+                self.codigos.setdefault(str(codigo), categoria)
+                if str(codigo).isdigit():
+                    self.codigos.setdefault(int(codigo), categoria)
+            padroes = regra.get('padroes', [])
+            if padroes:
+                grupo = f"c{indice}"
+                self._grupos[grupo] = categoria
+                # Lookahead ancorado no início: as alternativas são testadas na ordem
+                # das regras (e não pela posição do trecho no nome)
+                grupos.append(f"(?=.*?(?P<{grupo}>{'|'.join(re.escape(padrao) for padrao in padroes)}))")
+
+        self._regex = re.compile('|'.join(grupos), re.IGNORECASE | re.DOTALL) if grupos else None
+        self._por_nome: Dict[str, Optional[str]] = {}
+
+    @property
+    def tem_padroes(self) -> bool:
+        """Se alguma categoria também é reconhecida pelo nome da verba"""
+        return self._regex is not None
+
+    def classificar(self, cod_verba, nome_verba: Optional[str] = None) -> Optional[str]:
+        """
+        Categoria da verba: primeiro pelo código, depois pelo nome (se informado).
+        Retorna None quando a verba não pertence a nenhuma categoria.
+        """
+        categoria = self.codigos.get(cod_verba)
+        if categoria is not None or not nome_verba or self._regex is None:
+            return categoria
+
+        try:
+            return self._por_nome[nome_verba]
+        except KeyError:
+            encontrado = self._regex.match(nome_verba)
+            categoria = self._grupos[encontrado.lastgroup] if encontrado else None
+            # Os nomes de verba se repetem muito; o resultado por nome é memorizado
+            if len(self._por_nome) < 10000:
+                self._por_nome[nome_verba] = categoria
+            return categoria
+
+    def resultado_vazio(self) -> Dict[str, list]:
+        """Dicionário com uma lista vazia por categoria"""
+        return {categoria: [] for categoria in self.categorias}
+
+
+def carregar_regras(caminho: str) -> List[Dict[str, Any]]:
+    """Lê o arquivo JSON de regras"""
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)['categorias']
+
+
+_classificador: Optional[ClassificadorVerbas] = None
+_versao: Optional[Tuple[str, float]] = None
+_proxima_verificacao = 0.0
+_lock = threading.Lock()
+
+
+def get_classificador() -> ClassificadorVerbas:
+    """
+    Classificador compartilhado pelo processo. O arquivo de regras só é
+    consultado (os.path.getmtime) a cada verbas_regras_intervalo segundos;
+    é recompilado quando foi trocado ou modificado.
+    """
+    if _classificador is not None and time.monotonic() < _proxima_verificacao:
+        return _classificador
+    return recarregar_classificador(forcar=False)
+
+
+def recarregar_classificador(forcar: bool = True) -> ClassificadorVerbas:
+    """Relê o arquivo de regras (com forcar=False, só se ele mudou)"""
+    global _classificador, _versao, _proxima_verificacao
+    caminho = api_config.get('verbas_regras', REGRAS_PADRAO)
+    with _lock:
+        versao = (caminho, os.path.getmtime(caminho))
+        if forcar or versao != _versao:
+            _classificador = ClassificadorVerbas(carregar_regras(caminho))
+            _versao = versao
+            logger.info("Regras de verbas carregadas de %s", caminho)
+        _proxima_verificacao = time.monotonic() + api_config.get('verbas_regras_intervalo', 30)
+    return _classificador
@@ -0,0 +1,164 @@
+"""
+Leitura em fluxo de planilhas .xlsx/.xlsm sem dependências externas.
+
+O arquivo é aberto como zip e o XML da planilha é percorrido com iterparse,
+linha a linha; cada linha é descartada depois de lida, então a memória usada
+não cresce com o tamanho da planilha. Apenas as strings compartilhadas
+(sharedStrings.xml) ficam em memória.
+"""
+
+import posixpath
+import re
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse, parse
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_REF = re.compile(r'([A-Z]+)(\d+)')
+# Referência A1 dentro de uma fórmula (não precedida de letra/número e não seguida de "(")
+_REF_FORMULA = re.compile(r'(?<![A-Za-z0-9_.])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![\d(A-Za-z_])')
+_STRING_FORMULA = re.compile(r'("[^"]*")')
+
+
+def indice_coluna(letras: str) -> int:
+    """'A' -> 0, 'B' -> 1, ..., 'AA' -> 26"""
+    indice = 0
+    for letra in letras.upper():
+        indice = indice * 26 + ord(letra) - ord('A') + 1
+    return indice - 1
+
+
+def separar_referencia(referencia: str) -> Tuple[int, int]:
+    """'C12' -> (linha 12, coluna 2)"""
+    letras, linha = _REF.match(referencia).groups()
+    return int(linha), indice_coluna(letras)
+
+
+def letras_coluna(indice: int) -> str:
+    """0 -> 'A', 26 -> 'AA'"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def deslocar_formula(formula: str, linhas: int, colunas: int) -> str:
+    """
+    Fórmula compartilhada vista de outra célula: referências relativas são
+    deslocadas, as absolutas ($) e o conteúdo de strings ficam como estão.
+    """
+    def deslocar(match):
+        coluna_fixa, letras, linha_fixa, linha = match.groups()
+        if not coluna_fixa:
+            letras = letras_coluna(indice_coluna(letras) + colunas)
+        if not linha_fixa:
+            linha = str(int(linha) + linhas)
+        return f"{coluna_fixa}{letras}{linha_fixa}{linha}"
+
+    partes = _STRING_FORMULA.split(formula)
+    return ''.join(
+        parte if parte.startswith('"') else _REF_FORMULA.sub(deslocar, parte)
+        for parte in partes
+    )
+
+
+def _texto(elemento) -> str:
+    """Concatena os <t> de um <si> ou <is> (texto com formatação em partes)"""
+    return ''.join(t.text or '' for t in elemento.iter(f'{{{NS_MAIN}}}t'))
+
+
+def _strings_compartilhadas(arquivo: zipfile.ZipFile) -> List[str]:
+    try:
+        with arquivo.open('xl/sharedStrings.xml') as xml:
+            return [_texto(si) for si in parse(xml).getroot().iter(f'{{{NS_MAIN}}}si')]
+    except KeyError:
+        return []
+
+
+def planilhas(arquivo: zipfile.ZipFile) -> Dict[str, str]:
+    """Nome de cada planilha -> caminho do XML dentro do zip, na ordem do livro"""
+    with arquivo.open('xl/_rels/workbook.xml.rels') as xml:
+        alvos = {
+            rel.get('Id'): rel.get('Target')
+            for rel in parse(xml).getroot().iter(f'{{{NS_PKG_REL}}}Relationship')
+        }
+    with arquivo.open('xl/workbook.xml') as xml:
+        resultado = {}
+        for sheet in parse(xml).getroot().iter(f'{{{NS_MAIN}}}sheet'):
+            alvo = alvos[sheet.get(f'{{{NS_REL}}}id')]
+            caminho = alvo.lstrip('/') if alvo.startswith('/') else posixpath.join('xl', alvo)
+            resultado[sheet.get('name')] = caminho
+        return resultado
+
+
+def _valor(celula, strings: List[str]) -> Any:
+    tipo = celula.get('t', 'n')
+    if tipo == 'inlineStr':
+        elemento = celula.find(f'{{{NS_MAIN}}}is')
+        return _texto(elemento) if elemento is not None else None
+    v = celula.find(f'{{{NS_MAIN}}}v')
+    if v is None or v.text is None:
+        return None
+    if tipo == 's':
+        return strings[int(v.text)]
+    if tipo == 'b':
+        return v.text == '1'
+    if tipo in ('str', 'e'):
+        return v.text
+    return float(v.text)
+
+
+def iter_celulas(caminho: str, planilha: Optional[str] = None) -> Iterator[Tuple[int, int, Any, Optional[str]]]:
+    """
+    Percorre as células preenchidas de uma planilha (a primeira, se não informada).
+    Gera (linha, coluna, valor, fórmula), com linha a partir de 1 e coluna a partir de 0.
+    O valor é o último resultado calculado pelo Excel; fórmulas compartilhadas
+    são expandidas para o texto equivalente em cada célula.
+    """
+    compartilhadas: Dict[str, Tuple[str, int, int]] = {}
+    with zipfile.ZipFile(caminho) as arquivo:
+        caminhos = planilhas(arquivo)
+        caminho_xml = caminhos[planilha] if planilha else next(iter(caminhos.values()))
+        strings = _strings_compartilhadas(arquivo)
+
+        with arquivo.open(caminho_xml) as xml:
+            for _, elemento in iterparse(xml, events=('end',)):
+                if elemento.tag != f'{{{NS_MAIN}}}row':
+                    continue
+                for celula in elemento.iter(f'{{{NS_MAIN}}}c'):
+                    linha, coluna = separar_referencia(celula.get('r'))
+                    f = celula.find(f'{{{NS_MAIN}}}f')
+                    formula = None
+                    if f is not None:
+                        formula = f.text
+                        if f.get('t') == 'shared':
+                            if formula:
+                                compartilhadas[f.get('si')] = (formula, linha, coluna)
+                            elif f.get('si') in compartilhadas:
+                                base, linha_base, coluna_base = compartilhadas[f.get('si')]
+                                formula = deslocar_formula(base, linha - linha_base, coluna - coluna_base)
+                    valor = _valor(celula, strings)
+                    if valor is not None or formula is not None:
+                        yield linha, coluna, valor, formula
+                # Libera a linha já processada
+                elemento.clear()
+
+
+def iter_linhas(caminho: str, planilha: Optional[str] = None) -> Iterator[Tuple[int, List[Any]]]:
+    """Percorre as linhas de uma planilha, gerando (número da linha, lista de valores)"""
+    atual = None
+    valores: List[Any] = []
+    for linha, coluna, valor, _ in iter_celulas(caminho, planilha):
+        if linha != atual:
+            if atual is not None:
+                yield atual, valores
+            atual, valores = linha, []
+        valores.extend([None] * (coluna + 1 - len(valores)))
+        valores[coluna] = valor
+    if atual is not None:
+        yield atual, valores
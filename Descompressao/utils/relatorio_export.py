@@ -0,0 +1,263 @@
+"""
+Exportação em fluxo dos relatórios de vencimentos para XLSX e CSV.
+
+Os dois formatos são geradores de blocos: as linhas são consumidas uma a uma
+e cada bloco é entregue assim que fica pronto, então a memória usada não
+cresce com o número de linhas (lotes com centenas de servidores e décadas de
+meses). Servem diretamente de conteúdo para um StreamingHttpResponse.
+
+O XLSX é escrito sem dependências externas, como a leitura em planilha_xlsx:
+o zip é gravado em uma saída não posicionável (descritores de dados no lugar
+de tamanhos no cabeçalho), os textos vão como inlineStr (sem tabela de
+strings compartilhadas em memória) e o workbook.xml é gravado por último,
+depois que as planilhas já foram escritas.
+"""
+
+import csv
+import io
+import itertools
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from planilha_xlsx import letras_coluna
+from vencimento_records import ServidorVencimentos
+
+EXCEL_EPOCH = date(1899, 12, 30)
+MAX_LINHAS_XLSX = 1048576
+TAMANHO_BLOCO = 64 * 1024
+
+CABECALHO_VENCIMENTOS = ['Matrícula', 'Professor', 'Mês/Ano', 'Código', 'Verba', 'Valor']
+
+# Estilos de célula (índices de cellXfs em styles.xml)
+ESTILO_PADRAO, ESTILO_DATA, ESTILO_VALOR, ESTILO_CABECALHO = 0, 1, 2, 3
+
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{planilhas}'
+    '</Types>'
+)
+_CONTENT_TYPE_PLANILHA = (
+    '<Override PartName="/xl/worksheets/sheet{numero}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="mm/yyyy"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '</styleSheet>'
+)
+
+
+class _SaidaEmBlocos:
+    """Destino do zip: acumula os bytes escritos até serem drenados"""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self.tamanho = 0
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes = []
+        self.tamanho = 0
+        return dados
+
+
+def _escapar(texto: str) -> str:
+    texto = _CARACTERES_INVALIDOS.sub('', texto)
+    return texto.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def _celula(ref: str, valor: Any, estilo: Optional[int] = None) -> str:
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return f'<c r="{ref}" t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (date, datetime)):
+        if isinstance(valor, datetime):
+            valor = valor.date()
+        return f'<c r="{ref}" s="{ESTILO_DATA if estilo is None else estilo}"><v>{(valor - EXCEL_EPOCH).days}</v></c>'
+    if isinstance(valor, int):
+        return f'<c r="{ref}"><v>{valor}</v></c>' if estilo is None else f'<c r="{ref}" s="{estilo}"><v>{valor}</v></c>'
+    if isinstance(valor, float):
+        return f'<c r="{ref}" s="{ESTILO_VALOR if estilo is None else estilo}"><v>{valor!r}</v></c>'
+    estilo = '' if estilo is None else f' s="{estilo}"'
+    return f'<c r="{ref}" t="inlineStr"{estilo}><is><t xml:space="preserve">{_escapar(str(valor))}</t></is></c>'
+
+
+_LETRAS = [letras_coluna(indice) for indice in range(64)]
+
+
+def _linha_xml(numero: int, valores: Sequence[Any], estilo: Optional[int] = None) -> bytes:
+    celulas = ''.join(
+        _celula(f"{_LETRAS[coluna] if coluna < 64 else letras_coluna(coluna)}{numero}", valor, estilo)
+        for coluna, valor in enumerate(valores)
+    )
+    return f'<row r="{numero}">{celulas}</row>'.encode('utf-8')
+
+
+def iter_xlsx(planilhas: Iterable[Tuple[str, Sequence[str], Iterable[Sequence[Any]]]],
+              tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[bytes]:
+    """
+    Gera o arquivo XLSX em blocos de bytes.
+
+    Args:
+        planilhas: (nome, cabeçalho, linhas) de cada aba. As linhas são lidas
+            só quando a aba é escrita; uma aba que passe do limite de linhas
+            do Excel continua em outra com o mesmo nome numerado.
+        tamanho_bloco: Bytes acumulados antes de entregar um bloco
+
+    Datas viram datas do Excel (mm/aaaa), floats recebem formato de valor
+    (#,##0.00) e os demais valores são gravados como texto.
+    """
+    saida = _SaidaEmBlocos()
+    nomes: List[str] = []
+
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, cabecalho, linhas in planilhas:
+            linhas = iter(linhas)
+            parte = 1
+            while True:
+                nomes.append(nome if parte == 1 else f"{nome} ({parte})")
+                continua = False
+                with arquivo.open(f'xl/worksheets/sheet{len(nomes)}.xml', 'w') as xml:
+                    xml.write(
+                        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b'<sheetData>'
+                    )
+                    xml.write(_linha_xml(1, cabecalho, ESTILO_CABECALHO))
+                    escritas = 1
+                    for valores in linhas:
+                        escritas += 1
+                        xml.write(_linha_xml(escritas, valores))
+                        if saida.tamanho >= tamanho_bloco:
+                            yield saida.drenar()
+                        if escritas == MAX_LINHAS_XLSX:
+                            continua = True
+                            break
+                    xml.write(b'</sheetData></worksheet>')
+                if not continua:
+                    break
+                proxima = next(linhas, None)
+                if proxima is None:
+                    break
+                linhas = itertools.chain([proxima], linhas)
+                parte += 1
+
+        abas = ''.join(
+            f'<sheet name="{_escapar(nome[:31])}" sheetId="{numero}" r:id="rId{numero}"/>'
+            for numero, nome in enumerate(nomes, 1)
+        )
+        arquivo.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{abas}</sheets></workbook>'
+        ))
+        relacoes = ''.join(
+            f'<Relationship Id="rId{numero}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{numero}.xml"/>'
+            for numero in range(1, len(nomes) + 1)
+        )
+        arquivo.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relacoes}'
+            f'<Relationship Id="rId{len(nomes) + 1}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        arquivo.writestr('xl/styles.xml', _STYLES)
+        arquivo.writestr('_rels/.rels', _RELS)
+        arquivo.writestr('[Content_Types].xml', _CONTENT_TYPES.format(planilhas=''.join(
+            _CONTENT_TYPE_PLANILHA.format(numero=numero) for numero in range(1, len(nomes) + 1)
+        )))
+
+    # Diretório central, escrito ao fechar o zip
+    yield saida.drenar()
+
+
+def _valor_csv(valor: Any) -> Any:
+    if isinstance(valor, (date, datetime)):
+        return valor.strftime('%m/%Y')
+    if isinstance(valor, float):
+        # Mesmo formato do Excel em português (separador ";" e vírgula decimal)
+        return f"{valor:.2f}".replace('.', ',')
+    return valor
+
+
+def iter_csv(cabecalho: Sequence[str], linhas: Iterable[Sequence[Any]],
+             tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[str]:
+    """
+    Gera o CSV em blocos de texto, separado por ";" e com BOM UTF-8 para
+    que o Excel reconheça a codificação.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+    buffer.write('\ufeff')
+    escritor.writerow(cabecalho)
+    for valores in linhas:
+        escritor.writerow([_valor_csv(valor) for valor in valores])
+        if buffer.tell() >= tamanho_bloco:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def linhas_vencimentos(dados: ServidorVencimentos) -> Iterator[List[Any]]:
+    """
+    Linhas do relatório a partir do ServidorVencimentos de _process_vencimento_data
+    (periodos -> registros), uma por verba paga no mês.
+    """
+    for periodo in dados.periodos:
+        for registro in periodo.registros:
+            yield [
+                dados.matricula,
+                dados.professor_name,
+                periodo.mes,
+                registro.cod_verba,
+                registro.nome_verba,
+                float(registro.valor),
+            ]
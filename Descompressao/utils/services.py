@@ -2,39 +2,267 @@
 Fixed vencimento service with better error handling and isolation
 """
 
+import asyncio
+import contextvars
+import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date
-from typing import Optional, Dict, List, Any
+from operator import attrgetter
+from typing import Optional, Dict, List, Any, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
 
 # Since we're now in the utils directory, we can import fichas_api directly
 try:
     from fichas_api import FichasAPI_Manager
+    from fichas_table import FichasSelection, FichasTable
+    from calculo_descompressao import (
+        calcular_descompressao, data_do_mes, get_tabelas, indices_atualizacao, montar_entradas
+    )
+    from vencimento_records import ServidorVencimentos, VencimentoRecord
+    from vencimento_metrics import count_cache, stage
 except ImportError as e:
-    print(f"Import error: {e}")
+    logger.error("Import error: %s", e)
     raise
 
 
 class VencimentoServiceFixed:
     """Fixed service class for handling vencimento data operations"""
     
-    def __init__(self):
+    def __init__(self, store=None):
+        """
+        store: optional local fichas store (load(matricula, ano_inicio, ano_fim),
+        ingest(matricula, response, anos=None) and open_years(matricula)). When
+        given, periods it can answer are served from it, stale servidores only
+        refetch their open years, and every API response is ingested into it.
+        """
         try:
             self.api_manager = FichasAPI_Manager()
-        except Exception as e:
-            print(f"Error initializing API manager: {e}")
+            self.store = store
+        except Exception:
+            logger.exception("Error initializing API manager")
             raise
     
-    def calculate_vencimento_data(self, matricula: str, data_inicio: date, data_fim: date) -> Dict[str, Any]:
+    def calculate_vencimento_data(self, matricula: str, data_inicio: date, data_fim: date,
+                                  force_refresh: bool = False, include_payload: bool = False) -> Dict[str, Any]:
         """
         Calculate vencimento data for the specified period and return structured data.
+        With force_refresh=True the professor data is fetched from the API even if cached.
+        'data' is a ServidorVencimentos and 'raw_data' a list of VencimentoRecord;
+        serialize them with vencimento_records.as_dict() before encoding.
+        With include_payload=True the servidor payload the result was computed
+        from is returned as 'professor_full_data' (for the archive); it is left
+        out by default so batch results do not keep it alive.
         """
         try:
-            print(f"Starting vencimento calculation for {matricula}")
+            logger.info("Starting vencimento calculation for %s", matricula)
             
             # Step 1: Validate professor exists
-            print("Step 1: Validating professor...")
-            result = self.api_manager.busca_matricula(matricula)
+            logger.debug("Step 1: Validating professor...")
+            result = self._fetch_professor(matricula, data_inicio, data_fim, force_refresh)
+            return self._build_vencimento_result(result, matricula, data_inicio, data_fim, include_payload)
+            
+        except Exception as e:
+            logger.exception("Error in calculate_vencimento_data")
+            return {
+                'success': False,
+                'message': f'Erro ao calcular dados: {str(e)}',
+                'data': None
+            }
+    
+    async def acalculate_vencimento_data(self, matricula: str, data_inicio: date, data_fim: date,
+                                         force_refresh: bool = False, api_client=None,
+                                         include_payload: bool = False) -> Dict[str, Any]:
+        """
+        Async variant of calculate_vencimento_data: the professor data is fetched
+        through FichasAPIAsync, so several calculations can await the API concurrently.
+        An open FichasAPIAsync may be passed in to share its connection pool.
+        """
+        from fichas_async import FichasAPIAsync
+        
+        try:
+            logger.info("Starting async vencimento calculation for %s", matricula)
+            result = None
+            if not force_refresh and self.store is not None:
+                result = await asyncio.to_thread(self._load_from_store, matricula, data_inicio, data_fim)
+            if result is None:
+                if api_client is None:
+                    async with FichasAPIAsync() as api_client:
+                        result = await self._afetch(api_client, matricula, data_inicio, data_fim, force_refresh)
+                else:
+                    result = await self._afetch(api_client, matricula, data_inicio, data_fim, force_refresh)
+            return self._build_vencimento_result(result, matricula, data_inicio, data_fim, include_payload)
+            
+        except Exception as e:
+            logger.exception("Error in acalculate_vencimento_data")
+            return {
+                'success': False,
+                'message': f'Erro ao calcular dados: {str(e)}',
+                'data': None
+            }
+    
+    def iter_batch_vencimento_data(self, itens: Iterable[Tuple[str, date, date]], max_workers: int = 8,
+                                   force_refresh: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Calculate vencimento data for many (matricula, data_inicio, data_fim) items
+        on a bounded thread pool, yielding each result as soon as it completes.
+        Every result carries its 'matricula', 'data_inicio' and 'data_fim'.
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vencimento-batch')
+        try:
+            # Each worker runs in a copy of the caller's context (request id, stage timings)
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.calculate_vencimento_data,
+                                matricula, inicio, fim, force_refresh=force_refresh): (matricula, inicio, fim)
+                for matricula, inicio, fim in itens
+            }
+            for future in as_completed(futures):
+                # Drop the future once consumed so large batches do not keep every result alive
+                matricula, inicio, fim = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        'success': False,
+                        'message': f'Erro ao calcular dados: {str(e)}',
+                        'data': None
+                    }
+                result['matricula'] = matricula
+                result['data_inicio'] = inicio
+                result['data_fim'] = fim
+                yield result
+        finally:
+            # If the consumer stops early (e.g. client disconnected) drop pending work
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def consolidate_batch_results(results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build one consolidated result set from batch results.
+        Only 'success', 'message', 'matricula' and 'metadata' are read, so callers
+        may drop the heavy per-servidor data before consolidating.
+        """
+        servidores = []
+        erros = []
+        for result in results:
+            if result.get('success'):
+                servidores.append(result['metadata'])
+            else:
+                erros.append({
+                    'matricula': result.get('matricula'),
+                    'message': result.get('message')
+                })
+        
+        servidores.sort(key=lambda metadata: metadata['matricula'])
+        erros.sort(key=lambda erro: erro['matricula'] or '')
+        total_vencimentos = sum(metadata['total_vencimentos'] for metadata in servidores)
+        total_registros = sum(metadata['total_registros'] for metadata in servidores)
+        
+        return {
+            'total_servidores': len(servidores) + len(erros),
+            'total_sucesso': len(servidores),
+            'total_falhas': len(erros),
+            'total_registros': total_registros,
+            'total_vencimentos': total_vencimentos,
+            'valor_medio': total_vencimentos / total_registros if total_registros > 0 else 0,
+            'servidores': servidores,
+            'erros': erros
+        }
+    
+    def _fetch_professor(self, matricula: str, data_inicio: date, data_fim: date,
+                         force_refresh: bool = False) -> Optional[Dict]:
+        """
+        busca_matricula-shaped payload covering the period: from the local store
+        when fresh, after an incremental sync of the open years when stale, and
+        from a full API download otherwise (or when force_refresh).
+        """
+        result = None
+        if not force_refresh:
+            result = self._load_from_store(matricula, data_inicio, data_fim)
+            if result is None:
+                result = self._sync_open_years(matricula, data_inicio, data_fim)
+        if result is None:
+            result = self.api_manager.busca_matricula(matricula, force_refresh=force_refresh)
+            self._ingest_into_store(matricula, result)
+        return result
+    
+    def _load_from_store(self, matricula: str, data_inicio: date, data_fim: date) -> Optional[Dict]:
+        """Stored busca_matricula-shaped payload for the period, or None"""
+        if self.store is None:
+            return None
+        try:
+            with stage('store'):
+                result = self.store.load(matricula, data_inicio.year, data_fim.year)
+            count_cache('fichas_store', hit=result is not None)
+            if result is not None:
+                logger.debug("Professor data for %s loaded from the local store", matricula)
+            return result
+        except Exception:
+            logger.exception("Error loading %s from the local store", matricula)
+            return None
+    
+    def _ingest_into_store(self, matricula: str, result: Optional[Dict], anos: Optional[List[int]] = None) -> bool:
+        """Keep the local store in sync with a fresh API response (only `anos` when given)"""
+        if self.store is None or not result or 'servidor' not in result:
+            return False
+        try:
+            with stage('store_write'):
+                self.store.ingest(matricula, result, anos=anos)
+            return True
+        except Exception:
+            logger.exception("Error storing %s in the local store", matricula)
+            return False
+    
+    def _open_years(self, matricula: str) -> Optional[List[int]]:
+        """Years to refetch for a stored servidor; None when the full history is needed"""
+        if self.store is None:
+            return None
+        try:
+            return self.store.open_years(matricula)
+        except Exception:
+            logger.exception("Error checking %s in the local store", matricula)
+            return None
+    
+    def _sync_open_years(self, matricula: str, data_inicio: date, data_fim: date) -> Optional[Dict]:
+        """
+        Incremental sync: fetch only the open years of a stored servidor, merge
+        them into the store and answer from it. None when a full fetch is needed.
+        """
+        anos = self._open_years(matricula)
+        if not anos:
+            return None
+        logger.info("Incremental sync of %s: fetching %s", matricula, anos)
+        partial = self.api_manager.busca_matricula_anos(matricula, anos)
+        if not self._ingest_into_store(matricula, partial, anos):
+            return None
+        return self._load_from_store(matricula, data_inicio, data_fim)
+    
+    async def _afetch(self, api_client, matricula: str, data_inicio: date, data_fim: date,
+                      force_refresh: bool) -> Optional[Dict]:
+        """Async counterpart of the API part of calculate_vencimento_data (incremental, then full)"""
+        if not force_refresh:
+            anos = await asyncio.to_thread(self._open_years, matricula)
+            if anos:
+                logger.info("Incremental sync of %s: fetching %s", matricula, anos)
+                partial = await api_client.busca_matricula_anos(matricula, anos)
+                if await asyncio.to_thread(self._ingest_into_store, matricula, partial, anos):
+                    result = await asyncio.to_thread(self._load_from_store, matricula, data_inicio, data_fim)
+                    if result is not None:
+                        return result
+        result = await api_client.busca_matricula(matricula, force_refresh=force_refresh)
+        if self.store is not None:
+            await asyncio.to_thread(self._ingest_into_store, matricula, result)
+        return result
+    
+    def _build_vencimento_result(self, result: Optional[Dict], matricula: str, data_inicio: date, data_fim: date,
+                                 include_payload: bool = False) -> Dict[str, Any]:
+        """
+        Build the calculation result from a busca_matricula response.
+        Shared by the sync and async calculation paths.
+        """
+        try:
             if not result or 'servidor' not in result:
                 return {
                     'success': False,
@@ -44,12 +272,14 @@ class VencimentoServiceFixed:
             
             professor = result['servidor']
             professor_name = professor.get('SERVIDOR_NOME', 'Desconhecido')
-            print(f"Professor found: {professor_name}")
+            logger.debug("Professor found: %s", professor_name)
             
             # Step 2: Extract vencimento data from API
-            print("Step 2: Extracting vencimento data...")
-            vencimento_data = self._extract_vencimento_data_safe(professor, data_inicio, data_fim)
-            print(f"Found {len(vencimento_data)} vencimento records")
+            logger.debug("Step 2: Extracting vencimento data...")
+            with stage('extract'):
+                selection = self._select_vencimentos(professor, data_inicio, data_fim)
+                vencimento_data = selection.records() if selection is not None else []
+            logger.debug("Found %d vencimento records", len(vencimento_data))
             
             if not vencimento_data:
                 return {
@@ -58,209 +288,285 @@ class VencimentoServiceFixed:
                     'data': None
                 }
             
-            # Step 3: Process and structure the data
-            print("Step 3: Processing data...")
+            # Step 3: Process and structure the data (single aggregation pass)
+            logger.debug("Step 3: Processing data...")
             processed_data = self._process_vencimento_data(vencimento_data, professor_name, matricula, data_inicio, data_fim)
             
-            # Step 4: Calculate summary
-            total_vencimentos = sum(record['valor'] for record in vencimento_data)
-            valor_medio = total_vencimentos / len(vencimento_data) if len(vencimento_data) > 0 else 0
+            # Step 4: Summary, from the same aggregation
+            total_vencimentos = processed_data.total
+            valor_medio = processed_data.media
             
-            return {
+            calculation = {
                 'success': True,
                 'message': f'Dados calculados com sucesso! {len(vencimento_data)} registros de vencimento processados.',
                 'data': processed_data,
                 'raw_data': vencimento_data,  # Add raw data for complete view
-                'professor_full_data': professor,  # Add complete professor data
                 'metadata': {
                     'professor_name': professor_name,
                     'matricula': matricula,
+                    # The few servidor fields shown with the report; the full payload
+                    # is served on demand by get_professor_data (/api/servidor/)
+                    'servidor': {
+                        'nome': professor.get('SERVIDOR_NOME'),
+                        'cpf': professor.get('SERVIDOR_CPF'),
+                        'matricula': professor.get('SERVIDOR_MATRICULA'),
+                        'id': professor.get('SERVIDOR_ID'),
+                        'total_fichas': len(professor.get('fichasFinanceiras') or [])
+                    },
                     'periodo_inicio': f"{data_inicio.month:02d}/{data_inicio.year}",
                     'periodo_fim': f"{data_fim.month:02d}/{data_fim.year}",
                     'total_registros': len(vencimento_data),
+                    'total_periodos': len(processed_data.periodos),
                     'total_vencimentos': total_vencimentos,
                     'valor_medio': valor_medio,
+                    # Identifies the report content, for ETags and rendered-report caches
+                    'content_hash': selection.content_hash(professor_name, data_inicio, data_fim),
                     'filename': f'vencimentos_{matricula.replace("-", "_")}_{data_inicio.strftime("%Y%m")}_{data_fim.strftime("%Y%m")}.xlsx'
                 }
             }
+            if include_payload:
+                calculation['professor_full_data'] = professor
+            return calculation
             
         except Exception as e:
-            import traceback
-            error_traceback = traceback.format_exc()
-            print(f"Error in calculate_vencimento_data: {e}")
-            print(f"Full traceback: {error_traceback}")
+            logger.exception("Error in _build_vencimento_result")
             return {
                 'success': False,
                 'message': f'Erro ao calcular dados: {str(e)}',
                 'data': None
             }
     
-    def _extract_vencimento_data_safe(self, professor: Dict, data_inicio: date, data_fim: date) -> List[Dict]:
+    def _select_vencimentos(self, professor: Dict, data_inicio: date, data_fim: date) -> Optional[FichasSelection]:
         """
-        Safe extraction of vencimento data from professor's fichasFinanceiras
+        Vectorized selection of vencimento cells: all fichas are flattened into a
+        FichasTable once, then period and verba filters run as array masks.
         """
-        vencimento_data = []
-        
         try:
             fichas = professor.get('fichasFinanceiras', [])
-            print(f"Processing {len(fichas)} fichas financeiras")
-            
-            for ficha in fichas:
-                ano = ficha.get('FICHA_FINANCEIRA_ANO_REFERENCIA')
-                if not ano:
-                    continue
-                    
-                itens = ficha.get('fichasFinanceirasItens', [])
-                for item in itens:
-                    nome_verba = item.get('FICHA_FINANCEIRA_ITEM_NOME_VERBA', '').upper()
-                    cod_verba = item.get('FICHA_FINANCEIRA_ITEM_COD_VERBA')
-                    
-                    # Look for vencimento/salary entries (code 101 or vencimento-related names)
-                    if (cod_verba == 101 or 
-                        'VENCIMENTO' in nome_verba or 
-                        'SALARIO' in nome_verba or
-                        'SUBSÍDIO' in nome_verba):
-                        
-                        # Extract monthly values
-                        months = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 
-                                 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
-                        
-                        for i, month in enumerate(months, 1):
-                            try:
-                                valor = item.get(f'FICHA_FINANCEIRA_ITEM_{month}', 0)
-                                if valor and float(valor) > 0:
-                                    # Check if this month/year is within the requested period
-                                    record_date = date(ano, i, 1)
-                                    periodo_inicio = date(data_inicio.year, data_inicio.month, 1)
-                                    periodo_fim = date(data_fim.year, data_fim.month, 1)
-                                    
-                                    if periodo_inicio <= record_date <= periodo_fim:
-                                        vencimento_data.append({
-                                            'year': ano,
-                                            'month': i,
-                                            'valor': float(valor),
-                                            'nome_verba': nome_verba,
-                                            'cod_verba': cod_verba,
-                                            'date': record_date
-                                        })
-                            except (ValueError, TypeError) as e:
-                                print(f"Error processing month {month} for year {ano}: {e}")
-                                continue
-        
-        except Exception as e:
-            print(f"Error in _extract_vencimento_data_safe: {e}")
+            logger.debug("Processing %d fichas financeiras", len(fichas))
+            return FichasTable.from_fichas(fichas).vencimentos(data_inicio, data_fim)
+        except Exception:
+            logger.exception("Error in _select_vencimentos")
+            return None
+    
+    def _extract_vencimento_data_safe(self, professor: Dict, data_inicio: date, data_fim: date) -> List[VencimentoRecord]:
+        """
+        Safe extraction of vencimento data from professor's fichasFinanceiras
+        """
+        with stage('extract'):
+            selection = self._select_vencimentos(professor, data_inicio, data_fim)
+            return selection.records() if selection is not None else []
+    
+    def _process_vencimento_data(self, vencimento_data: List[VencimentoRecord], professor_name: str, matricula: str,
+                                 data_inicio: date, data_fim: date) -> ServidorVencimentos:
+        """
+        Aggregate vencimento records in a single pass (monthly periods, per-year and
+        per-verba totals, overall total and mean). The periods reference the same
+        record objects as vencimento_data; call to_dict() to serialize.
+        """
+        try:
+            with stage('aggregate'):
+                return ServidorVencimentos.from_records(vencimento_data, professor_name, matricula, data_inicio, data_fim)
             
-        return vencimento_data
+        except Exception:
+            logger.exception("Error in _process_vencimento_data")
+            return ServidorVencimentos(professor_name, matricula, data_inicio, data_fim)
     
-    def _process_vencimento_data(self, vencimento_data: List[Dict], professor_name: str, matricula: str, data_inicio: date, data_fim: date) -> Dict[str, Any]:
+    def get_vencimento_summary(self, matricula: str, data_inicio: date, data_fim: date,
+                               force_refresh: bool = False) -> Dict[str, Any]:
         """
-        Process vencimento data into a structured format for display
+        Get a preview/summary of vencimento data without generating Excel.
+        Only aggregates are returned; the records themselves are paged through
+        get_vencimento_records.
         """
         try:
-            # Structure for storing processed results
-            processed = {
-                'professor_name': professor_name,
-                'matricula': matricula,
-                'relatorio_titulo': f"Relatório de Vencimentos - {professor_name} - Matrícula {matricula}",
-                'periodo_inicio': f"{data_inicio.month:02d}/{data_inicio.year}",
-                'periodo_fim': f"{data_fim.month:02d}/{data_fim.year}",
-                'periodos': []
-            }
+            logger.info("Getting vencimento summary for %s", matricula)
             
-            # Group data by month/year
-            monthly_data = {}
-            for record in vencimento_data:
-                key = (record['year'], record['month'])
-                if key not in monthly_data:
-                    monthly_data[key] = {
-                        'year': record['year'],
-                        'month': record['month'],
-                        'valores': [],
-                        'total': 0.0
-                    }
-                monthly_data[key]['valores'].append(record)
-                monthly_data[key]['total'] += record['valor']
+            # Get professor data (local store / cache first, like the full calculation)
+            result = self._fetch_professor(matricula, data_inicio, data_fim, force_refresh)
+            if not result or 'servidor' not in result:
+                return {
+                    'success': False,
+                    'message': 'Professor não encontrado'
+                }
             
-            # Sort by date and create periods
-            sorted_periods = sorted(monthly_data.keys())
-            for year, month in sorted_periods:
-                period_data = monthly_data[(year, month)]
-                period_date = date(year, month, 1)
-                
-                periodo = {
-                    'mes': period_date,
-                    'mes_formatado': period_date.strftime('%b/%Y'),
-                    'ano': year,
-                    'mes_numero': month,
-                    'total_vencimentos': period_data['total'],
-                    'registros': period_data['valores'],
-                    'quantidade_registros': len(period_data['valores'])
+            professor = result['servidor']
+            vencimento_data = self._extract_vencimento_data_safe(professor, data_inicio, data_fim)
+            
+            if not vencimento_data:
+                return {
+                    'success': False,
+                    'message': 'Nenhum dado de vencimento encontrado para o período'
                 }
-                
-                processed['periodos'].append(periodo)
             
-            return processed
+            # Calculate summary (same single-pass aggregation as calculate_vencimento_data)
+            resumo = self._process_vencimento_data(
+                vencimento_data, professor.get('SERVIDOR_NOME'), matricula, data_inicio, data_fim
+            )
             
-        except Exception as e:
-            print(f"Error in _process_vencimento_data: {e}")
             return {
-                'professor_name': professor_name,
+                'success': True,
+                'professor_name': resumo.professor_name,
                 'matricula': matricula,
-                'periodos': []
+                'total_registros': resumo.quantidade,
+                'total_periodos': len(resumo.periodos),
+                'total_valor': resumo.total,
+                'valor_medio': resumo.media,
+                'periodo_inicio': resumo.periodo_inicio,
+                'periodo_fim': resumo.periodo_fim,
+                'monthly_summary': {
+                    f"{periodo.mes_numero:02d}/{periodo.ano}": periodo.total_vencimentos
+                    for periodo in resumo.periodos
+                },
+                'yearly_summary': {ano: grupo.total for ano, grupo in resumo.por_ano.items()},
+                'verba_summary': [
+                    {'cod_verba': cod_verba, 'nome_verba': grupo.nome_verba, 'total': grupo.total,
+                     'quantidade': grupo.quantidade}
+                    for cod_verba, grupo in resumo.por_verba.items()
+                ]
             }
+            
+        except Exception as e:
+            logger.exception("Error in get_vencimento_summary")
+            return {
+                'success': False,
+                'message': f'Erro ao obter resumo: {str(e)}'
+            }
+    
+    def get_professor_data(self, matricula: str, data_inicio: date, data_fim: date,
+                           force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """The servidor part of the busca_matricula payload covering the period, or None"""
+        result = self._fetch_professor(matricula, data_inicio, data_fim, force_refresh)
+        if not result or 'servidor' not in result:
+            return None
+        return result['servidor']
     
-    def get_vencimento_summary(self, matricula: str, data_inicio: date, data_fim: date) -> Dict[str, Any]:
+    def get_vencimento_records(self, matricula: str, data_inicio: date, data_fim: date,
+                               cursor: int = 0, limit: int = 100, ano: Optional[int] = None,
+                               mes: Optional[int] = None, force_refresh: bool = False) -> Dict[str, Any]:
         """
-        Get a preview/summary of vencimento data without generating Excel
+        One page of vencimento records in chronological order, optionally
+        restricted to one year and/or month. `cursor` is the position of the
+        first record of the page; 'next_cursor' is None on the last page.
+        The records are VencimentoRecord objects, serialized by the caller.
         """
         try:
-            print(f"Getting vencimento summary for {matricula}")
-            
-            # Get professor data
-            result = self.api_manager.busca_matricula(matricula)
+            result = self._fetch_professor(matricula, data_inicio, data_fim, force_refresh)
             if not result or 'servidor' not in result:
                 return {
                     'success': False,
                     'message': 'Professor não encontrado'
                 }
             
-            professor = result['servidor']
-            vencimento_data = self._extract_vencimento_data_safe(professor, data_inicio, data_fim)
+            records = self._extract_vencimento_data_safe(result['servidor'], data_inicio, data_fim)
+            if ano is not None or mes is not None:
+                records = [
+                    record for record in records
+                    if (ano is None or record.year == ano) and (mes is None or record.month == mes)
+                ]
+            # Stable sort: records of the same month keep the ficha order
+            records.sort(key=attrgetter('date'))
             
-            if not vencimento_data:
+            fim = cursor + limit
+            return {
+                'success': True,
+                'total_registros': len(records),
+                'cursor': cursor,
+                'next_cursor': fim if fim < len(records) else None,
+                'registros': records[cursor:fim]
+            }
+            
+        except Exception as e:
+            logger.exception("Error in get_vencimento_records")
+            return {
+                'success': False,
+                'message': f'Erro ao obter registros: {str(e)}'
+            }
+    
+    def calculate_descompressao_data(self, matricula: str, data_inicio: date, data_fim: date,
+                                     indices=None, juros_pct=None, force_refresh: bool = False,
+                                     fatores=None, atualizar_ate: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Run the descompressão workbook (ModeloDescNovo) over the professor's fichas.
+        indices and juros_pct are optional per-month arrays (columns S and U) for
+        the months from data_inicio to data_fim; without juros_pct no interest
+        is applied. Without indices, column S comes from the JEBR factors
+        (fatores, by default jebr.get_fatores()), correcting each month to
+        atualizar_ate (default: last imported month). Months without an
+        imported index keep index 1.0 and are listed in
+        metadata['meses_sem_indice'] (every month when no correction could
+        be applied at all, e.g. no JEBR import yet).
+        """
+        try:
+            logger.info("Starting descompressão calculation for %s", matricula)
+            result = self._fetch_professor(matricula, data_inicio, data_fim, force_refresh)
+            if not result or 'servidor' not in result:
                 return {
                     'success': False,
-                    'message': 'Nenhum dado de vencimento encontrado para o período'
+                    'message': f'Professor com matrícula {matricula} não encontrado',
+                    'data': None
                 }
             
-            # Calculate summary
-            total_valor = sum(record['valor'] for record in vencimento_data)
-            total_registros = len(vencimento_data)
-            
-            # Group by year/month for details
-            monthly_summary = {}
-            for record in vencimento_data:
-                key = f"{record['month']:02d}/{record['year']}"
-                if key not in monthly_summary:
-                    monthly_summary[key] = 0
-                monthly_summary[key] += record['valor']
-            
+            professor = result['servidor']
+            table = FichasTable.from_fichas(professor.get('fichasFinanceiras', []))
+            tabela_paga, tabela_correta = get_tabelas()
+            meses, entradas, niveis = montar_entradas(
+                table, data_inicio, data_fim, tabela_paga, tabela_correta,
+                indices=indices, juros_pct=juros_pct
+            )
+            atualizado_ate = None
+            sem_indice = meses[:0]
+            if indices is None:
+                sem_indice = meses
+                fatores = fatores if fatores is not None else self._correction_factors()
+                if fatores is not None:
+                    try:
+                        entradas['indice'], sem_correcao = indices_atualizacao(fatores, meses, atualizar_ate)
+                        sem_indice = meses[sem_correcao]
+                        atualizado_ate = atualizar_ate or fatores.ultimo_mes
+                    except ValueError as e:
+                        logger.warning("No monetary correction for %s: %s", matricula, e)
+                if len(sem_indice):
+                    logger.warning("%d of %d months of %s without JEBR index",
+                                   len(sem_indice), len(meses), matricula)
+            calculo = calcular_descompressao(meses, entradas, niveis)
+            meses_sem_indice = [
+                f"{mes.month:02d}/{mes.year}" for mes in map(data_do_mes, sem_indice.tolist())
+            ]
+            message = f'Descompressão calculada para {len(calculo)} meses.'
+            if meses_sem_indice:
+                message += f' {len(meses_sem_indice)} meses sem índice JEBR não foram corrigidos.'
+
             return {
                 'success': True,
-                'professor_name': professor.get('SERVIDOR_NOME'),
-                'total_registros': total_registros,
-                'total_valor': total_valor,
-                'valor_medio': total_valor / total_registros if total_registros > 0 else 0,
-                'periodo_inicio': f"{data_inicio.month:02d}/{data_inicio.year}",
-                'periodo_fim': f"{data_fim.month:02d}/{data_fim.year}",
-                'monthly_summary': monthly_summary
+                'message': message,
+                'data': calculo.to_records(),
+                'metadata': {
+                    'professor_name': professor.get('SERVIDOR_NOME', 'Desconhecido'),
+                    'matricula': matricula,
+                    'periodo_inicio': f"{data_inicio.month:02d}/{data_inicio.year}",
+                    'periodo_fim': f"{data_fim.month:02d}/{data_fim.year}",
+                    'atualizado_ate': (
+                        f"{atualizado_ate.month:02d}/{atualizado_ate.year}" if atualizado_ate else None
+                    ),
+                    'meses_sem_indice': meses_sem_indice,
+                    **calculo.totais()
+                }
             }
             
         except Exception as e:
-            import traceback
-            print(f"Error in get_vencimento_summary: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error in calculate_descompressao_data")
             return {
                 'success': False,
-                'message': f'Erro ao obter resumo: {str(e)}'
+                'message': f'Erro ao calcular descompressão: {str(e)}',
+                'data': None
             }
+
+    def _correction_factors(self):
+        """JEBR factor array of this process; None outside the Django app"""
+        try:
+            from Descompressao.jebr import get_fatores
+            return get_fatores()
+        except Exception:
+            logger.exception("JEBR factors unavailable")
+            return None
@@ -0,0 +1,225 @@
+"""
+Lightweight in-process metrics for the vencimento pipeline.
+
+Stages of a calculation are timed with stage():
+
+    auth           login on the Fichas API
+    fetch          POST to the Fichas API, including the response body
+    parse          JSON decoding of a response (streamed, so it overlaps fetch)
+    store          lookup in the local fichas store
+    store_write    ingestion of an API response into the local fichas store
+    extract        selection of the vencimento cells of the fichas
+    aggregate      monthly / yearly / per-verba aggregation
+    archive        building and queueing the archive document
+    archive_write  writing the archive document (writer thread)
+    render         template rendering of the report
+
+Durations go to the vencimento_stage_seconds histogram and, inside a request
+wrapped by start_request()/finish_request() (the metrics middleware), to that
+request's timings, which become its Server-Timing header. Counters track the
+upstream API calls and bytes and the hits, misses and coalesced lookups of
+each cache; render_prometheus() produces the text exposition served at
+/metrics.
+
+Metrics live in the memory of each process: every worker exposes its own.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+FAMILIES = {
+    'vencimento_stage_seconds': ('histogram', 'Duration of each vencimento pipeline stage'),
+    'vencimento_request_seconds': ('histogram', 'Duration of the HTTP requests served, by view'),
+    'fichas_api_requests_total': ('counter', 'Requests sent to the Fichas API, by endpoint and HTTP status'),
+    'fichas_api_response_bytes_total': ('counter', 'Response bytes received from the Fichas API, by endpoint'),
+    'vencimento_cache_requests_total': ('counter', 'Cache lookups, by cache and result (hit or miss)'),
+    'vencimento_cache_coalesced_total': ('counter', 'Cache misses served by an identical lookup already in flight'),
+    'vencimento_cache_hit_ratio': ('gauge', 'Hits over lookups of each cache since the process started'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            family[key] = family.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        # Index of the first bucket whose upper bound holds the value (len = +Inf only)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            histogram = family.get(key)
+            if histogram is None:
+                histogram = family[key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.total += value
+            histogram.count += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _cache_ratios(self) -> Dict[Labels, float]:
+        lookups: Dict[str, List[float]] = {}
+        for labels, value in self._counters.get('vencimento_cache_requests_total', {}).items():
+            label_map = dict(labels)
+            totals = lookups.setdefault(label_map.get('cache', ''), [0.0, 0.0])
+            totals[1] += value
+            if label_map.get('result') == 'hit':
+                totals[0] += value
+        return {
+            (('cache', cache),): hits / total
+            for cache, (hits, total) in lookups.items() if total
+        }
+
+    def render_prometheus(self) -> str:
+        """Text exposition format (version 0.0.4) of every metric"""
+        with self._lock:
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            histograms = {
+                name: {labels: (list(h.counts), h.total, h.count) for labels, h in family.items()}
+                for name, family in self._histograms.items()
+            }
+            gauges = {'vencimento_cache_hit_ratio': self._cache_ratios()}
+
+        lines = []
+
+        def header(name, default_kind):
+            kind, description = FAMILIES.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted(counters):
+            header(name, 'counter')
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name in sorted(gauges):
+            if not gauges[name]:
+                continue
+            header(name, 'gauge')
+            for labels, value in sorted(gauges[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name in sorted(histograms):
+            header(name, 'histogram')
+            for labels, (counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Timings of the current request: a list shared by the threads and tasks the
+# request hands work to (contextvars are copied, the list is the same object)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('vencimento_request_timings',
+                                                                             default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage (also usable as a decorator)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe('vencimento_stage_seconds', elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def count_api_call(endpoint: str, status: Any, response_bytes: int = 0):
+    """One request to the Fichas API and the size of its response body"""
+    REGISTRY.inc('fichas_api_requests_total', endpoint=endpoint, status=status)
+    if response_bytes:
+        REGISTRY.inc('fichas_api_response_bytes_total', response_bytes, endpoint=endpoint)
+
+
+def count_cache(cache: str, hit: bool):
+    REGISTRY.inc('vencimento_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def count_coalesced(cache: str):
+    REGISTRY.inc('vencimento_cache_coalesced_total', cache=cache)
+
+
+def start_request():
+    """Start collecting the stage timings of a request; returns the token for finish_request"""
+    return _request_timings.set([])
+
+
+def finish_request(token) -> List[Tuple[str, float]]:
+    """Stop collecting and return the (stage, seconds) timings of the request"""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings: Iterable[Tuple[str, float]]) -> str:
+    """
+    Server-Timing value with the total duration of each stage, in the order
+    the stages first ran; repeated stages say how many times they ran.
+    """
+    totals: Dict[str, List[float]] = {}
+    for name, elapsed in timings:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+    return ', '.join(
+        f'{name};dur={total * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else '')
+        for name, (total, count) in totals.items()
+    )
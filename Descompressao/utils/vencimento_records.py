@@ -0,0 +1,222 @@
+"""
+Compact record types for vencimento results.
+
+A long career yields thousands of (month, verba) values per servidor, and
+batch runs keep hundreds of servidores' results alive at once. These classes
+use __slots__ instead of one dict per record, share a single date object per
+month, and reference the same record objects from both the flat list and the
+monthly periods.
+
+ServidorVencimentos.from_records is the single aggregation pass over the
+records: monthly periods, per-year and per-verba totals, the overall total
+and mean are all computed there once and shared by the view, the template,
+the archive and the summary API.
+
+Serialization is explicit: templates read the attributes directly, and only
+the edges (JSON responses, job results, the archive, spreadsheets) call
+to_dict() / as_dict().
+"""
+
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class VencimentoRecord:
+    """One verba paid in one month"""
+
+    __slots__ = ('year', 'month', 'valor', 'nome_verba', 'cod_verba', 'date')
+
+    def __init__(self, year: int, month: int, valor: float, nome_verba: str, cod_verba: Any,
+                 record_date: Optional[date] = None):
+        self.year = year
+        self.month = month
+        self.valor = valor
+        self.nome_verba = nome_verba
+        self.cod_verba = cod_verba
+        self.date = record_date or date(year, month, 1)
+
+    def __repr__(self):
+        return f"VencimentoRecord({self.month:02d}/{self.year}, {self.cod_verba!r}, {self.valor!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, VencimentoRecord):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(other, campo) for campo in self.__slots__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'year': self.year,
+            'month': self.month,
+            'valor': self.valor,
+            'nome_verba': self.nome_verba,
+            'cod_verba': self.cod_verba,
+            'date': self.date
+        }
+
+
+class VencimentoPeriodo:
+    """Records of one month and their total"""
+
+    __slots__ = ('mes', 'registros', 'total_vencimentos')
+
+    def __init__(self, mes: date, registros: Optional[List[VencimentoRecord]] = None,
+                 total_vencimentos: float = 0.0):
+        self.mes = mes
+        self.registros = registros if registros is not None else []
+        self.total_vencimentos = total_vencimentos
+
+    @property
+    def ano(self) -> int:
+        return self.mes.year
+
+    @property
+    def mes_numero(self) -> int:
+        return self.mes.month
+
+    @property
+    def mes_formatado(self) -> str:
+        return self.mes.strftime('%b/%Y')
+
+    @property
+    def quantidade_registros(self) -> int:
+        return len(self.registros)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'mes': self.mes,
+            'mes_formatado': self.mes_formatado,
+            'ano': self.ano,
+            'mes_numero': self.mes_numero,
+            'total_vencimentos': self.total_vencimentos,
+            'registros': [registro.to_dict() for registro in self.registros],
+            'quantidade_registros': self.quantidade_registros
+        }
+
+
+class VencimentoTotal:
+    """Running total of a group of records (a year or a verba)"""
+
+    __slots__ = ('total', 'quantidade', 'nome_verba')
+
+    def __init__(self, nome_verba: Optional[str] = None):
+        self.total = 0.0
+        self.quantidade = 0
+        self.nome_verba = nome_verba
+
+    @property
+    def media(self) -> float:
+        return self.total / self.quantidade if self.quantidade else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'total': self.total, 'quantidade': self.quantidade, 'media': self.media}
+
+
+class ServidorVencimentos:
+    """Vencimento report of one servidor over a period, grouped by month"""
+
+    __slots__ = ('professor_name', 'matricula', 'data_inicio', 'data_fim', 'periodos',
+                 'por_ano', 'por_verba', 'total', 'quantidade')
+
+    def __init__(self, professor_name: str, matricula: str, data_inicio: date, data_fim: date,
+                 periodos: Optional[List[VencimentoPeriodo]] = None,
+                 por_ano: Optional[Dict[int, VencimentoTotal]] = None,
+                 por_verba: Optional[Dict[Any, VencimentoTotal]] = None,
+                 total: float = 0.0, quantidade: int = 0):
+        self.professor_name = professor_name
+        self.matricula = matricula
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.periodos = periodos if periodos is not None else []
+        self.por_ano = por_ano if por_ano is not None else {}
+        self.por_verba = por_verba if por_verba is not None else {}
+        self.total = total
+        self.quantidade = quantidade
+
+    @classmethod
+    def from_records(cls, records: List[VencimentoRecord], professor_name: str, matricula: str,
+                     data_inicio: date, data_fim: date) -> 'ServidorVencimentos':
+        """
+        Aggregate the records in one pass: chronological monthly periods,
+        per-year and per-verba totals (both sorted by key) and the overall total.
+        """
+        por_mes: Dict[date, VencimentoPeriodo] = {}
+        por_ano: Dict[int, VencimentoTotal] = {}
+        por_verba: Dict[Any, VencimentoTotal] = {}
+        total = 0.0
+        for record in records:
+            valor = record.valor
+            total += valor
+
+            periodo = por_mes.get(record.date)
+            if periodo is None:
+                periodo = por_mes[record.date] = VencimentoPeriodo(record.date)
+            periodo.registros.append(record)
+            periodo.total_vencimentos += valor
+
+            ano = por_ano.get(record.year)
+            if ano is None:
+                ano = por_ano[record.year] = VencimentoTotal()
+            ano.total += valor
+            ano.quantidade += 1
+
+            verba = por_verba.get(record.cod_verba)
+            if verba is None:
+                verba = por_verba[record.cod_verba] = VencimentoTotal(record.nome_verba)
+            verba.total += valor
+            verba.quantidade += 1
+
+        return cls(
+            professor_name, matricula, data_inicio, data_fim,
+            periodos=[por_mes[mes] for mes in sorted(por_mes)],
+            por_ano=dict(sorted(por_ano.items())),
+            por_verba=dict(sorted(por_verba.items(), key=lambda item: str(item[0]))),
+            total=total,
+            quantidade=len(records)
+        )
+
+    @property
+    def media(self) -> float:
+        return self.total / self.quantidade if self.quantidade else 0.0
+
+    @property
+    def periodo_inicio(self) -> str:
+        return f"{self.data_inicio.month:02d}/{self.data_inicio.year}"
+
+    @property
+    def periodo_fim(self) -> str:
+        return f"{self.data_fim.month:02d}/{self.data_fim.year}"
+
+    @property
+    def relatorio_titulo(self) -> str:
+        return f"Relatório de Vencimentos - {self.professor_name} - Matrícula {self.matricula}"
+
+    def registros(self) -> Iterator[VencimentoRecord]:
+        for periodo in self.periodos:
+            yield from periodo.registros
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'professor_name': self.professor_name,
+            'matricula': self.matricula,
+            'relatorio_titulo': self.relatorio_titulo,
+            'periodo_inicio': self.periodo_inicio,
+            'periodo_fim': self.periodo_fim,
+            'total': self.total,
+            'quantidade': self.quantidade,
+            'media': self.media,
+            'periodos': [periodo.to_dict() for periodo in self.periodos],
+            'por_ano': [{'ano': ano, **grupo.to_dict()} for ano, grupo in self.por_ano.items()],
+            'por_verba': [
+                {'cod_verba': cod_verba, 'nome_verba': grupo.nome_verba, **grupo.to_dict()}
+                for cod_verba, grupo in self.por_verba.items()
+            ]
+        }
+
+
+def as_dict(value: Any) -> Any:
+    """Plain dict/list form of a record type (lists are converted item by item); other values unchanged"""
+    if isinstance(value, (VencimentoRecord, VencimentoPeriodo, VencimentoTotal, ServidorVencimentos)):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [as_dict(item) for item in value]
+    return value
@@ -1,6 +1,19 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
-from .forms import VencimentoForm
+from .forms import VencimentoForm, VencimentoBatchForm, VencimentoRegistrosForm
+from .models import CalculoJob
+import hashlib
 import json
 from datetime import datetime
 
@@ -13,23 +26,62 @@ if utils_dir not in sys.path:
     sys.path.insert(0, utils_dir)
 
 from services import VencimentoServiceFixed
+from relatorio_export import CABECALHO_VENCIMENTOS, iter_csv, iter_xlsx, linhas_vencimentos
+from vencimento_records import as_dict
+from vencimento_metrics import REGISTRY, count_cache, stage
+from .archive import archive_document, get_archive
+from .fichas_store import get_fichas_store
+from .jobs import job_status, recover_stale_job, submit_batch_job, submit_vencimento_job
 
 # Create your views here.
 
-def save_raw_data_to_json(raw_data, professor_data, metadata, matricula, data_inicio, data_fim):
+MONTH_NAMES = [None, 'January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+
+@stage('archive')
+def save_raw_data_to_json(dados, professor_data, metadata, matricula, data_inicio, data_fim, archive=None):
     """
-    Save raw data to a readable JSON file with proper formatting
+    Archive the consultation (summary, records and the full professor payload)
+    through the configured result archive. `dados` is the aggregated
+    ServidorVencimentos of the calculation, so the monthly summary is read from
+    its periods instead of regrouping the records. `professor_data` is the
+    servidor payload the calculation was computed from (or None), archived as is.
+    The write is deferred, so this only builds the document and returns immediately,
+    unless an explicit `archive` backend is given (written synchronously).
     """
     try:
-        # Create a comprehensive data structure
-        json_data = {
+        timestamp = datetime.now()
+        consulta_id = f"{matricula}_{timestamp.strftime('%Y%m%d_%H%M%S_%f')}"
+        
+        records = [
+            {
+                "year": record.year,
+                "month": record.month,
+                "nome_verba": record.nome_verba,
+                "cod_verba": record.cod_verba,
+                "valor": float(record.valor)
+            }
+            for record in dados.registros()
+        ]
+        monthly_summary = {
+            f"{periodo.ano}-{periodo.mes_numero:02d}": {
+                "year": periodo.ano,
+                "month": periodo.mes_numero,
+                "month_name": MONTH_NAMES[periodo.mes_numero],
+                "total_valor": periodo.total_vencimentos,
+                "record_count": periodo.quantidade_registros
+            }
+            for periodo in dados.periodos
+        }
+        
+        document = {
+            "consulta_id": consulta_id,
             "consultation_info": {
                 "matricula": matricula,
                 "data_inicio": data_inicio.strftime("%Y-%m-%d") if data_inicio else None,
                 "data_fim": data_fim.strftime("%Y-%m-%d") if data_fim else None,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "total_records": len(raw_data) if raw_data else 0,
-                "description": "Dados completos de vencimentos extraídos da API"
+                "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "total_records": len(records)
             },
             "summary_metadata": {
                 "professor_name": metadata.get('professor_name', ''),
@@ -40,137 +92,484 @@ def save_raw_data_to_json(raw_data, professor_data, metadata, matricula, data_in
                 "total_periodos": metadata.get('total_periodos', 0),
                 "total_registros": metadata.get('total_registros', 0)
             },
-            "professor_complete_data": {
-                "description": "Dados completos do professor retornados pela API",
-                "data": professor_data
-            },
-            "vencimento_records": {
-                "description": "Registros individuais de vencimento organizados por data",
-                "records": []
-            },
-            "monthly_summary": {
-                "description": "Resumo mensal dos vencimentos",
-                "data": {}
-            }
+            "vencimento_records": records,
+            "monthly_summary": monthly_summary,
+            # Stored separately, once per content hash
+            "professor_complete_data": professor_data
         }
         
-        # Format raw data for better readability and organize by month/year
-        monthly_totals = {}
-        if raw_data:
-            for i, record in enumerate(raw_data, 1):
-                # Handle date serialization
-                record_date = record.get('date')
-                if hasattr(record_date, 'strftime'):
-                    date_str = record_date.strftime("%Y-%m-%d")
-                else:
-                    date_str = str(record_date) if record_date else None
-                
-                formatted_record = {
-                    "record_id": i,
-                    "year": record.get('year'),
-                    "month": record.get('month'),
-                    "month_name": datetime(2000, record.get('month', 1), 1).strftime("%B") if record.get('month') else None,
-                    "date": date_str,
-                    "vencimento_details": {
-                        "nome_verba": record.get('nome_verba'),
-                        "cod_verba": record.get('cod_verba'),
-                        "valor": float(record.get('valor', 0))
-                    },
-                    "original_record": record  # Include all original fields for completeness
-                }
-                json_data["vencimento_records"]["records"].append(formatted_record)
-                
-                # Calculate monthly totals
-                month_key = f"{record.get('year', 0)}-{record.get('month', 0):02d}"
-                if month_key not in monthly_totals:
-                    monthly_totals[month_key] = {
-                        "year": record.get('year'),
-                        "month": record.get('month'),
-                        "month_name": datetime(2000, record.get('month', 1), 1).strftime("%B") if record.get('month') else None,
-                        "total_valor": 0,
-                        "record_count": 0
-                    }
-                monthly_totals[month_key]["total_valor"] += float(record.get('valor', 0))
-                monthly_totals[month_key]["record_count"] += 1
-        
-        # Add monthly summary to JSON
-        json_data["monthly_summary"]["data"] = dict(sorted(monthly_totals.items()))
-        
-        # Create filename with timestamp and matricula
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"vencimento_data_{matricula}_{timestamp}.json"
-        
-        # Save to the Descompressao directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(current_dir, filename)
-        
-        # Write JSON with proper indentation for readability
-        with open(file_path, 'w', encoding='utf-8') as json_file:
-            json.dump(json_data, json_file, indent=4, ensure_ascii=False, sort_keys=True, default=str)
+        archive_document(document, archive)
         
         return {
             'success': True,
-            'filename': filename,
-            'file_path': file_path,
-            'message': f'Dados salvos em: {filename}',
-            'record_count': len(raw_data) if raw_data else 0
+            'filename': consulta_id,
+            'file_path': str(getattr(archive or get_archive(), 'directory', '')),
+            'message': f'Consulta arquivada: {consulta_id}',
+            'record_count': len(records)
         }
         
     except Exception as e:
         return {
             'success': False,
-            'message': f'Erro ao salvar JSON: {str(e)}'
+            'message': f'Erro ao arquivar consulta: {str(e)}'
         }
 
+def _report_context(result, matricula, data_inicio, data_fim):
+    """Template context of a successful calculation (vencimento_resultados.html)"""
+    return {
+        'resultados': result['data'],
+        'metadata': result['metadata'],
+        'matricula': matricula,
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'report_cache_alias': getattr(settings, 'VENCIMENTO_REPORT_CACHE', 'default'),
+        'report_cache_timeout': getattr(settings, 'VENCIMENTO_REPORT_CACHE_TIMEOUT', 24 * 3600)
+    }
+
+def _render_vencimento_result(request, form, result):
+    """Render the vencimento page for a calculation result (shared by sync and async views)"""
+    matricula = form.cleaned_data['matricula']
+    data_inicio = form.cleaned_data['data_inicio']
+    data_fim = form.cleaned_data['data_fim']
+    
+    if result['success']:
+        resultados = result['data']
+        metadata = result['metadata']
+        
+        # Archive the aggregated result for external analysis, with the exact
+        # payload the calculation was computed from
+        json_result = save_raw_data_to_json(
+            resultados, result.get('professor_full_data'), metadata, 
+            matricula, data_inicio, data_fim
+        )
+        
+        # Add JSON save status to messages
+        if json_result['success']:
+            messages.success(request, f"✅ {json_result['message']}")
+        else:
+            messages.warning(request, f"⚠️ {json_result['message']}")
+        
+        # Return the results to be displayed in the template
+        context = _report_context(result, matricula, data_inicio, data_fim)
+        context.update({
+            'form': form,
+            'json_file_info': json_result  # Pass JSON file info
+        })
+        with stage('render'):
+            return render(request, 'vencimento.html', context)
+    
+    messages.error(request, result['message'])
+    return render(request, 'vencimento.html', {'form': form})
+
 def vencimento_view(request):
     """View for generating vencimento data"""
     
     if request.method == 'POST':
         form = VencimentoForm(request.POST)
         if form.is_valid():
-            matricula = form.cleaned_data['matricula']
-            data_inicio = form.cleaned_data['data_inicio']
-            data_fim = form.cleaned_data['data_fim']
-            
             # Initialize vencimento service
-            vencimento_service = VencimentoServiceFixed()
+            vencimento_service = VencimentoServiceFixed(store=get_fichas_store())
             
             # Get vencimento data instead of generating Excel
-            result = vencimento_service.calculate_vencimento_data(matricula, data_inicio, data_fim)
-            
-            if result['success']:
-                resultados = result['data']
-                metadata = result['metadata']
-                raw_data = result.get('raw_data', [])  # Get raw data
-                professor_data = result.get('professor_full_data', {})  # Get complete professor data
-                
-                # Save raw data to JSON file for external analysis
-                json_result = save_raw_data_to_json(
-                    raw_data, professor_data, metadata, 
-                    matricula, data_inicio, data_fim
-                )
-                
-                # Add JSON save status to messages
-                if json_result['success']:
-                    messages.success(request, f"✅ {json_result['message']}")
-                else:
-                    messages.warning(request, f"⚠️ {json_result['message']}")
-                
-                # Return the results to be displayed in the template
-                return render(request, 'vencimento.html', {
-                    'form': form,
-                    'resultados': resultados,
-                    'metadata': metadata,
-                    'raw_data': raw_data,  # Pass raw data to template
-                    'professor_data': professor_data,  # Pass complete professor data
-                    'matricula': matricula,
-                    'data_inicio': data_inicio,
-                    'data_fim': data_fim,
-                    'json_file_info': json_result  # Pass JSON file info
-                })
-            else:
-                messages.error(request, result['message'])
+            result = vencimento_service.calculate_vencimento_data(
+                form.cleaned_data['matricula'],
+                form.cleaned_data['data_inicio'],
+                form.cleaned_data['data_fim'],
+                force_refresh=form.cleaned_data.get('force_refresh', False),
+                include_payload=True
+            )
+            return _render_vencimento_result(request, form, result)
     else:
         form = VencimentoForm()
     
-    return render(request, 'vencimento.html', {'form': form})
\ No newline at end of file
+    return render(request, 'vencimento.html', {'form': form})
+
+async def vencimento_async_view(request):
+    """
+    Async version of vencimento_view: the API lookup is awaited through
+    FichasAPIAsync instead of blocking a worker thread.
+    """
+    if request.method == 'POST':
+        form = VencimentoForm(request.POST)
+        if form.is_valid():
+            vencimento_service = VencimentoServiceFixed(store=get_fichas_store())
+            result = await vencimento_service.acalculate_vencimento_data(
+                form.cleaned_data['matricula'],
+                form.cleaned_data['data_inicio'],
+                form.cleaned_data['data_fim'],
+                force_refresh=form.cleaned_data.get('force_refresh', False),
+                include_payload=True
+            )
+            # Session-backed messages, file writes and rendering are synchronous
+            return await sync_to_async(_render_vencimento_result)(request, form, result)
+    else:
+        form = VencimentoForm()
+    
+    return await sync_to_async(render)(request, 'vencimento.html', {'form': form})
+
+def _report_version(matricula, data_inicio, data_fim, data_hash):
+    """ETag of a report: the data behind it, its period and VENCIMENTO_REPORT_VERSION"""
+    chave = [matricula, data_inicio.isoformat(), data_fim.isoformat(), data_hash,
+             getattr(settings, 'VENCIMENTO_REPORT_VERSION', 1)]
+    return hashlib.sha256(json.dumps(chave).encode('utf-8')).hexdigest()
+
+def _report_response(request, etag, last_modified, html=None):
+    """304 when the client already has this version of the report, otherwise `html`"""
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if html is None:
+            return None
+        response = HttpResponse(html)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Salary data: browsers may keep it but must revalidate; shared proxies must not store it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@require_GET
+def vencimento_report_view(request):
+    """
+    GET permalink of a vencimento report:
+    ?matricula=...&data_inicio=YYYY-MM-DD&data_fim=YYYY-MM-DD
+    The ETag is derived from the stored fichas of the period (FichasStore.version),
+    so while the local store can serve them a revalidation is answered with
+    304 Not Modified, or a cached page, before anything is fetched or recalculated.
+    Without the store, the content hash of the calculated cells is used instead.
+    """
+    form = VencimentoForm(request.GET)
+    if not form.is_valid():
+        return render(request, 'vencimento.html', {'form': form}, status=400)
+    
+    matricula = form.cleaned_data['matricula']
+    data_inicio = form.cleaned_data['data_inicio']
+    data_fim = form.cleaned_data['data_fim']
+    store = get_fichas_store()
+    cache = caches[getattr(settings, 'VENCIMENTO_REPORT_CACHE', 'default')]
+    
+    version = store.version(matricula, data_inicio.year, data_fim.year) if store is not None else None
+    if version is not None:
+        etag = _report_version(matricula, data_inicio, data_fim, version[0])
+        last_modified = int(version[1].timestamp())
+        response = _report_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        cached = cache.get(f"vencimento:relatorio:{etag}")
+        count_cache('report', hit=cached is not None)
+        if cached is not None:
+            return _report_response(request, etag, last_modified, cached)
+    
+    result = VencimentoServiceFixed(store=store).calculate_vencimento_data(matricula, data_inicio, data_fim)
+    if not result['success']:
+        messages.error(request, result['message'])
+        return render(request, 'vencimento.html', {'form': form}, status=404)
+    
+    # The calculation may have synced the store; otherwise fall back to the cells' hash
+    version = store.version(matricula, data_inicio.year, data_fim.year) if store is not None else None
+    gerado_em = timezone.now()
+    if version is not None:
+        etag = _report_version(matricula, data_inicio, data_fim, version[0])
+        last_modified = int(version[1].timestamp())
+    else:
+        etag = _report_version(matricula, data_inicio, data_fim, result['metadata']['content_hash'])
+        last_modified = int(gerado_em.timestamp())
+    
+    context = _report_context(result, matricula, data_inicio, data_fim)
+    context['gerado_em'] = gerado_em
+    # Rendered without the request: the page holds no per-user data and can be shared
+    with stage('render'):
+        html = render_to_string('vencimento_relatorio.html', context)
+    cache.set(f"vencimento:relatorio:{etag}", html, getattr(settings, 'VENCIMENTO_REPORT_CACHE_TIMEOUT', 24 * 3600))
+    return _report_response(request, etag, last_modified, html)
+
+
+def _stream_batch_results(itens, force_refresh):
+    """
+    Yield one JSON line per servidor as soon as it is calculated, followed by
+    a final line with the consolidated result set.
+    """
+    vencimento_service = VencimentoServiceFixed(store=get_fichas_store())
+    resumos = []
+    
+    results = vencimento_service.iter_batch_vencimento_data(
+        itens,
+        max_workers=getattr(settings, 'VENCIMENTO_BATCH_MAX_WORKERS', 8),
+        force_refresh=force_refresh
+    )
+    for result in results:
+        linha = {
+            'tipo': 'servidor',
+            'matricula': result['matricula'],
+            'data_inicio': result['data_inicio'],
+            'data_fim': result['data_fim'],
+            'success': result['success'],
+            'message': result['message'],
+            'metadata': result.get('metadata'),
+            'data': as_dict(result.get('data'))
+        }
+        yield json.dumps(linha, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        
+        # Keep only the lightweight part for the consolidated result
+        resumos.append({
+            'success': result['success'],
+            'message': result['message'],
+            'matricula': result['matricula'],
+            'metadata': result.get('metadata')
+        })
+    
+    consolidado = {'tipo': 'consolidado'}
+    consolidado.update(vencimento_service.consolidate_batch_results(resumos))
+    yield json.dumps(consolidado, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+def vencimento_batch_view(request):
+    """
+    Batch mode: calculate vencimento data for a pasted list or an uploaded CSV
+    of matrículas, streaming results back as JSON Lines while they complete.
+    """
+    if request.method == 'POST':
+        form = VencimentoBatchForm(request.POST, request.FILES)
+        if form.is_valid():
+            response = StreamingHttpResponse(
+                _stream_batch_results(form.cleaned_data['itens'], form.cleaned_data.get('force_refresh', False)),
+                content_type='application/x-ndjson; charset=utf-8'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+    else:
+        form = VencimentoBatchForm()
+    
+    return render(request, 'vencimento_batch.html', {'form': form})
+
+
+EXPORT_CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+def _export_response(formato, nome_arquivo, cabecalho, linhas, planilhas=None):
+    """
+    Stream a report as XLSX or CSV. Rows are pulled from the `linhas` iterator
+    while the response is being sent; extra XLSX sheets may be given as
+    (name, header, rows) tuples and are written after the main one.
+    """
+    if formato == 'csv':
+        conteudo = iter_csv(cabecalho, linhas)
+    else:
+        conteudo = iter_xlsx([('Vencimentos', cabecalho, linhas)] + list(planilhas or []))
+    response = StreamingHttpResponse(conteudo, content_type=EXPORT_CONTENT_TYPES[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _export_format(data):
+    formato = (data.get('formato') or 'xlsx').lower()
+    return formato if formato in EXPORT_CONTENT_TYPES else None
+
+@require_GET
+def vencimento_export_view(request):
+    """
+    Download a single vencimento calculation as XLSX (default) or CSV:
+    ?matricula=...&data_inicio=YYYY-MM-DD&data_fim=YYYY-MM-DD&formato=xlsx|csv
+    """
+    formato = _export_format(request.GET)
+    if formato is None:
+        return HttpResponseBadRequest('Formato de exportação inválido. Use xlsx ou csv.')
+    form = VencimentoForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    
+    vencimento_service = VencimentoServiceFixed(store=get_fichas_store())
+    result = vencimento_service.calculate_vencimento_data(
+        form.cleaned_data['matricula'],
+        form.cleaned_data['data_inicio'],
+        form.cleaned_data['data_fim'],
+        force_refresh=form.cleaned_data.get('force_refresh', False)
+    )
+    if not result['success']:
+        return JsonResponse({'success': False, 'message': result['message']}, status=404)
+    
+    nome_arquivo = result['metadata']['filename'].rsplit('.', 1)[0]
+    return _export_response(formato, nome_arquivo, CABECALHO_VENCIMENTOS, linhas_vencimentos(result['data']))
+
+def _batch_export_rows(itens, force_refresh, erros):
+    """
+    Report rows of every servidor in the batch, produced as each calculation
+    completes; failed servidores are collected into `erros`.
+    """
+    vencimento_service = VencimentoServiceFixed(store=get_fichas_store())
+    results = vencimento_service.iter_batch_vencimento_data(
+        itens,
+        max_workers=getattr(settings, 'VENCIMENTO_BATCH_MAX_WORKERS', 8),
+        force_refresh=force_refresh
+    )
+    for result in results:
+        if result['success']:
+            yield from linhas_vencimentos(result['data'])
+        else:
+            erros.append([result['matricula'], result['data_inicio'], result['data_fim'], result['message']])
+
+@require_POST
+def vencimento_batch_export_view(request):
+    """
+    Batch export: the same input as vencimento_batch_view, streamed as one
+    XLSX (with an Erros sheet) or CSV file with a row per servidor, month and verba.
+    """
+    formato = _export_format(request.POST)
+    if formato is None:
+        return HttpResponseBadRequest('Formato de exportação inválido. Use xlsx ou csv.')
+    form = VencimentoBatchForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return render(request, 'vencimento_batch.html', {'form': form}, status=400)
+    
+    erros = []
+    linhas = _batch_export_rows(form.cleaned_data['itens'], form.cleaned_data.get('force_refresh', False), erros)
+    # The Erros sheet is only read after every servidor has been processed
+    planilha_erros = ('Erros', ['Matrícula', 'Data Início', 'Data Fim', 'Mensagem'], erros)
+    nome_arquivo = f"vencimentos_lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    return _export_response(formato, nome_arquivo, CABECALHO_VENCIMENTOS, linhas, [planilha_erros])
+
+
+def _periodo_query(cleaned_data):
+    """matricula/data_inicio/data_fim query string of a validated VencimentoForm"""
+    return urlencode({
+        'matricula': cleaned_data['matricula'],
+        'data_inicio': cleaned_data['data_inicio'].isoformat(),
+        'data_fim': cleaned_data['data_fim'].isoformat()
+    })
+
+@require_GET
+def vencimento_summary_api_view(request):
+    """
+    Summary-first JSON API: totals and the monthly, yearly and per-verba
+    summaries of a period, without any record. The records are paged through
+    'registros_url' (vencimento_records_api_view).
+    """
+    form = VencimentoForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    
+    summary = VencimentoServiceFixed(store=get_fichas_store()).get_vencimento_summary(
+        form.cleaned_data['matricula'],
+        form.cleaned_data['data_inicio'],
+        form.cleaned_data['data_fim'],
+        force_refresh=form.cleaned_data.get('force_refresh', False)
+    )
+    if not summary['success']:
+        return JsonResponse(summary, status=404)
+    summary['registros_url'] = f"{reverse('vencimento_api_registros')}?{_periodo_query(form.cleaned_data)}"
+    return JsonResponse(summary, encoder=DjangoJSONEncoder)
+
+@require_GET
+def vencimento_records_api_view(request):
+    """
+    Paginated vencimento records of a period, in chronological order:
+    ?matricula=...&data_inicio=...&data_fim=...[&ano=&mes=][&cursor=0&limit=100]
+    [&fields=year,month,valor,nome_verba,cod_verba,date]
+    Follow 'next_url' until it is null to read every record.
+    """
+    form = VencimentoRegistrosForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    
+    dados = form.cleaned_data
+    page = VencimentoServiceFixed(store=get_fichas_store()).get_vencimento_records(
+        dados['matricula'], dados['data_inicio'], dados['data_fim'],
+        cursor=dados['cursor'], limit=dados['limit'], ano=dados.get('ano'), mes=dados.get('mes'),
+        force_refresh=dados.get('force_refresh', False)
+    )
+    if not page['success']:
+        return JsonResponse(page, status=404)
+    
+    campos = dados['fields']
+    page['fields'] = campos
+    page['registros'] = [{campo: getattr(record, campo) for campo in campos} for record in page['registros']]
+    page['next_url'] = None
+    if page['next_cursor'] is not None:
+        query = request.GET.copy()
+        query['cursor'] = page['next_cursor']
+        page['next_url'] = f"{request.path}?{query.urlencode()}"
+    return JsonResponse(page, encoder=DjangoJSONEncoder)
+
+@require_GET
+def vencimento_servidor_api_view(request):
+    """
+    The servidor payload (busca_matricula shape) behind a period's calculation.
+    Served on demand so report pages do not have to embed it.
+    """
+    form = VencimentoForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    
+    servidor = VencimentoServiceFixed(store=get_fichas_store()).get_professor_data(
+        form.cleaned_data['matricula'],
+        form.cleaned_data['data_inicio'],
+        form.cleaned_data['data_fim']
+    )
+    if servidor is None:
+        return JsonResponse({'success': False, 'message': 'Professor não encontrado'}, status=404)
+    return JsonResponse({'success': True, 'servidor': servidor}, encoder=DjangoJSONEncoder)
+
+
+def _job_response(job, created):
+    payload = job_status(job)
+    payload.update({
+        'duplicado': not created,
+        'status_url': reverse('job_status', args=[job.pk]),
+        'resultado_url': reverse('job_resultado', args=[job.pk])
+    })
+    return JsonResponse(payload, encoder=DjangoJSONEncoder, status=202 if created else 200)
+
+@require_POST
+def job_vencimento_submit_view(request):
+    """Queue a single vencimento calculation as a background job"""
+    form = VencimentoForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    
+    job, created = submit_vencimento_job(
+        form.cleaned_data['matricula'],
+        form.cleaned_data['data_inicio'],
+        form.cleaned_data['data_fim'],
+        force_refresh=form.cleaned_data.get('force_refresh', False)
+    )
+    return _job_response(job, created)
+
+@require_POST
+def job_batch_submit_view(request):
+    """Queue a batch of vencimento calculations as a background job"""
+    form = VencimentoBatchForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    
+    job, created = submit_batch_job(
+        form.cleaned_data['itens'],
+        force_refresh=form.cleaned_data.get('force_refresh', False)
+    )
+    return _job_response(job, created)
+
+@require_GET
+def job_status_view(request, job_id):
+    """Status and progress of a background job (requeued first if its worker died)"""
+    job = recover_stale_job(get_object_or_404(CalculoJob, pk=job_id))
+    return JsonResponse(job_status(job), encoder=DjangoJSONEncoder)
+
+@require_GET
+def job_result_view(request, job_id):
+    """Result of a finished background job"""
+    job = recover_stale_job(get_object_or_404(CalculoJob, pk=job_id))
+    if job.status == CalculoJob.STATUS_ERRO:
+        return JsonResponse(job_status(job), encoder=DjangoJSONEncoder, status=500)
+    if job.status != CalculoJob.STATUS_CONCLUIDO:
+        return JsonResponse(job_status(job), encoder=DjangoJSONEncoder, status=409)
+    return JsonResponse(job.resultado, encoder=DjangoJSONEncoder, safe=False)
+
+@require_GET
+def metrics_view(request):
+    """
+    Stage timings, Fichas API calls and bytes and cache hit ratios of this
+    process, in the Prometheus text format (settings.VENCIMENTO_METRICS)
+    """
+    if not getattr(settings, 'VENCIMENTO_METRICS', True):
+        return HttpResponse(status=404)
+    return HttpResponse(REGISTRY.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Descompressao.middleware.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Descompressao.middleware.VencimentoMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'HTcalculus.urls'
@@ -77,6 +80,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Background job workers write progress while requests read it
+            'timeout': 20,
+        },
     }
 }
 
@@ -121,3 +128,141 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Vencimento batch calculations
+# Number of matrículas fetched and calculated in parallel per batch request
+
+VENCIMENTO_BATCH_MAX_WORKERS = 8
+
+
+# Background calculation jobs
+# Jobs are stored in the database; VENCIMENTO_JOB_WORKERS threads run them inside
+# the web process. Set VENCIMENTO_JOBS_IN_PROCESS = False to leave them to
+# `python manage.py processar_jobs` instead. An active job whose worker has not
+# reported progress for VENCIMENTO_JOB_STALE_AFTER seconds (e.g. the process
+# was restarted) is requeued when the same calculation is submitted again.
+
+VENCIMENTO_JOB_WORKERS = 2
+
+VENCIMENTO_JOBS_IN_PROCESS = True
+
+VENCIMENTO_JOB_STALE_AFTER = 900
+
+
+# Local fichas store
+# Every API payload is normalized into the Servidor/FichaFinanceira tables.
+# Calculations are answered from them when possible; data of the year a payload
+# was synced in is trusted for FICHAS_LOCAL_STORE_MAX_AGE seconds.
+
+FICHAS_LOCAL_STORE = True
+
+FICHAS_LOCAL_STORE_MAX_AGE = 900
+
+# When stored data is stale only the open years (the sync year, plus the
+# FICHAS_LOCAL_STORE_RECENT_YEARS - 1 years before it, up to today) are fetched
+# and merged; closed years are kept. Set FICHAS_INCREMENTAL_SYNC = False to
+# always download the full history.
+
+FICHAS_LOCAL_STORE_RECENT_YEARS = 1
+
+FICHAS_INCREMENTAL_SYNC = True
+
+
+# Rendered vencimento reports
+# Report permalinks (vencimento/relatorio/) and the per-período tables of the
+# report page are cached in the VENCIMENTO_REPORT_CACHE alias of CACHES for
+# VENCIMENTO_REPORT_CACHE_TIMEOUT seconds, keyed on matrícula, period and a
+# content hash of the fichas, so a new payload never serves a stale report.
+# Point the alias at a shared backend (Redis, Memcached, database) to share
+# the cache between processes. Increase VENCIMENTO_REPORT_VERSION when a change
+# to the calculation or the templates alters the reports of unchanged fichas.
+
+VENCIMENTO_REPORT_CACHE = 'default'
+
+VENCIMENTO_REPORT_CACHE_TIMEOUT = 24 * 3600
+
+VENCIMENTO_REPORT_VERSION = 1
+
+
+# Result archive
+# Every consultation is archived outside the code tree: payloads are stored once
+# per content hash (gzip-compressed JSON) and consultations as JSON Lines.
+# Writes are deferred to a background thread (ASYNC). Use
+# 'Descompressao.archive.NullArchive' as BACKEND to disable archiving.
+
+RESULT_ARCHIVE = {
+    'BACKEND': 'Descompressao.archive.FileSystemArchive',
+    'DIRECTORY': Path(os.environ.get('HTCALCULUS_ARCHIVE_DIR', Path.home() / '.htcalculus' / 'arquivo')),
+    'COMPRESSION': 'gzip',
+    'RETENTION_DAYS': 180,
+    'MAX_BYTES': 2 * 1024 ** 3,
+    'ASYNC': True,
+}
+
+
+# Metrics
+# Stage timings (auth, fetch, parse, store, extract, aggregate, archive, render...),
+# Fichas API calls and bytes and cache hit ratios are kept in memory by each
+# process and served in the Prometheus text format at /metrics. With
+# VENCIMENTO_SERVER_TIMING the stages of each request are also sent in a
+# Server-Timing response header.
+
+VENCIMENTO_METRICS = True
+
+VENCIMENTO_SERVER_TIMING = DEBUG
+
+
+# Logging
+# Records are queued by QueueLogHandler and written as JSON lines by a
+# background listener thread (stderr, or HTCALCULUS_LOG_FILE), with the request
+# id of the request or job and with credentials and CPFs redacted. The per-step
+# diagnostics are DEBUG records; with HTCALCULUS_LOG_LEVEL=DEBUG each of them
+# is sampled 1 in LOG_SAMPLE_EVERY (1 keeps them all).
+
+LOG_LEVEL = os.environ.get('HTCALCULUS_LOG_LEVEL', 'INFO')
+
+LOG_SAMPLE_EVERY = int(os.environ.get('HTCALCULUS_LOG_SAMPLE_EVERY', 10))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'Descompressao.structured_logging.RequestIdFilter'},
+        'sampling': {
+            '()': 'Descompressao.structured_logging.SamplingFilter',
+            'every': LOG_SAMPLE_EVERY,
+            'max_level': 'DEBUG',
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'Descompressao.structured_logging.QueueLogHandler',
+            'filename': os.environ.get('HTCALCULUS_LOG_FILE') or None,
+            'filters': ['request_id', 'sampling'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'django.server': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Benchmarks
+# `python manage.py benchmark_vencimento` stores one JSON file per commit here
+# and compares each run against a previous one (see Descompressao/benchmarks.py).
+
+VENCIMENTO_BENCHMARK_DIR = BASE_DIR / '.benchmarks'
@@ -18,8 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
 
+from Descompressao.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='vencimento/', permanent=False)),
     path('vencimento/', include('Descompressao.urls')),  # Include URLs from Descompressao app (now vencimento-focused)
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint
 ]